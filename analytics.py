@@ -0,0 +1,211 @@
+import json
+
+import numpy as np
+
+# Written into every columnar file, so later layouts can still read old ones
+columnarVersion = 1
+
+
+def _packStrings(strings):
+    return np.frombuffer(json.dumps(strings).encode(), dtype=np.uint8)
+
+
+def _unpackStrings(array):
+    return json.loads(array.tobytes().decode())
+
+
+def _codes(values, count):
+    # The narrowest unsigned type that holds every code keeps the file small
+    return np.asarray(values, dtype=np.min_scalar_type(max(count - 1, 0)))
+
+
+class ColumnarInventory:
+    """
+    A read-only copy of an inventory as columns, one row per item, for
+    reports that would be slow as loops over item dicts. Drawer and item
+    names are dictionary-encoded: each row holds their codes, which index
+    drawers and names.
+
+    Attributes:
+        drawers (list): Drawer names, by code.
+        names (list): Item names, by code.
+        drawerCodes (np.ndarray): Each item's drawer code.
+        nameCodes (np.ndarray): Each item's name code.
+        quantities (np.ndarray): Each item's quantity, as int64.
+    """
+    def __init__(self, drawers, names, drawerCodes, nameCodes, quantities):
+        self.drawers = drawers
+        self.names = names
+        self.drawerCodes = drawerCodes
+        self.nameCodes = nameCodes
+        self.quantities = quantities
+
+    def __len__(self):
+        return len(self.quantities)
+
+    @classmethod
+    def fromData(cls, data):
+        """
+        Args:
+            data (dict): Drawer name -> sequence of item mappings, as readData() returns.
+
+        Returns:
+            ColumnarInventory: The columns.
+        """
+        sizes = np.fromiter((len(items) for items in data.values()), dtype=np.int64, count=len(data))
+        count = int(sizes.sum())
+        nameIndex = {}
+        nameCodes = np.fromiter((nameIndex.setdefault(item['name'], len(nameIndex))
+                                 for items in data.values() for item in items), dtype=np.int64, count=count)
+        quantities = np.fromiter((item['quantity'] for items in data.values() for item in items),
+                                 dtype=np.int64, count=count)
+        drawerCodes = np.repeat(np.arange(len(data)), sizes)
+        return cls(list(data), list(nameIndex), _codes(drawerCodes, len(data)),
+                   _codes(nameCodes, len(nameIndex)), quantities)
+
+    @classmethod
+    def fromInventory(cls, inventory):
+        """
+        Args:
+            inventory (Inventory or RemoteInventory): The inventory; every
+                drawer is loaded.
+
+        Returns:
+            ColumnarInventory: The columns.
+        """
+        return cls.fromData({drawer: inventory.items(drawer) for drawer in list(inventory.drawerNames())})
+
+    def _groups(self, by):
+        if by == 'name':
+            return self.nameCodes, self.names
+        if by == 'drawer':
+            return self.drawerCodes, self.drawers
+        raise ValueError(f"Cannot group by '{by}'")
+
+    def totals(self, by='name'):
+        """
+        Sum the quantities of each item name or each drawer.
+
+        Args:
+            by (str): 'name' or 'drawer'.
+
+        Returns:
+            np.ndarray: The int64 totals, indexed by name or drawer code.
+        """
+        codes, labels = self._groups(by)
+        # bincount adds in float64, exact for totals below 2 ** 53
+        return np.bincount(codes, weights=self.quantities, minlength=len(labels)).round().astype(np.int64)
+
+    def top(self, by='name', count=None):
+        """
+        Args:
+            by (str): 'name' or 'drawer'.
+            count (int): How many to return, every one by default.
+
+        Returns:
+            list: (name or drawer, total) tuples, largest total first.
+        """
+        _, labels = self._groups(by)
+        totals = self.totals(by)
+        if count is not None and count < len(totals):
+            # Only the largest count totals need sorting
+            positions = np.argpartition(-totals, count - 1)[:count] if count > 0 else np.array([], dtype=np.int64)
+            positions = positions[np.lexsort((positions, -totals[positions]))]
+        else:
+            positions = np.lexsort((np.arange(len(totals)), -totals))
+        return [(labels[position], int(totals[position])) for position in positions.tolist()]
+
+    def histogram(self, bins=10, by='item'):
+        """
+        Count quantities into equal-width bins.
+
+        Args:
+            bins (int): The number of bins.
+            by (str): 'item' for each item's quantity, or 'name' or 'drawer'
+                for their totals.
+
+        Returns:
+            list: (low, high, count) tuples; each bin holds low <= value <
+                high, and the last one high too.
+        """
+        values = self.quantities if by == 'item' else self.totals(by)
+        if not len(values):
+            return []
+        counts, edges = np.histogram(values, bins=bins)
+        return [(float(edges[position]), float(edges[position + 1]), int(counts[position]))
+                for position in range(len(counts))]
+
+    def save(self, path):
+        """
+        Write the columns to a compressed .npz file.
+
+        Args:
+            path (str): The file to write.
+        """
+        with open(path, 'wb') as file:
+            quantities = self.quantities
+            if len(quantities):
+                # Stored in the narrowest type that holds them; loading widens them again
+                quantities = quantities.astype(np.result_type(np.min_scalar_type(int(quantities.min())),
+                                                              np.min_scalar_type(int(quantities.max()))))
+            np.savez_compressed(file, version=np.array([columnarVersion]), drawers=_packStrings(self.drawers),
+                                names=_packStrings(self.names), drawerCodes=self.drawerCodes,
+                                nameCodes=self.nameCodes, quantities=quantities)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Args:
+            path (str): A file written by save().
+
+        Returns:
+            ColumnarInventory: The columns.
+
+        Raises:
+            ValueError: If the file is not a columnar inventory this version can read.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            if 'version' not in data or int(data['version'][0]) > columnarVersion:
+                raise ValueError(f"'{path}' is not a columnar inventory this version can read")
+            return cls(_unpackStrings(data['drawers']), _unpackStrings(data['names']), data['drawerCodes'],
+                       data['nameCodes'], data['quantities'].astype(np.int64))
+
+
+def _pairKeys(columns, drawerIndex, nameIndex):
+    drawerMap = np.array([drawerIndex.setdefault(drawer, len(drawerIndex)) for drawer in columns.drawers], dtype=np.int64)
+    nameMap = np.array([nameIndex.setdefault(name, len(nameIndex)) for name in columns.names], dtype=np.int64)
+    return drawerMap[columns.drawerCodes], nameMap[columns.nameCodes]
+
+
+def diff(old, new):
+    """
+    List the items whose quantity differs between two inventories. Items with
+    the same name in one drawer are counted together.
+
+    Args:
+        old (ColumnarInventory): The earlier inventory.
+        new (ColumnarInventory): The later inventory.
+
+    Returns:
+        list: (drawer, name, quantity before, quantity after) tuples by drawer
+            and name, with None where the item was missing.
+    """
+    drawerIndex = {}
+    nameIndex = {}
+    oldDrawers, oldNames = _pairKeys(old, drawerIndex, nameIndex)
+    newDrawers, newNames = _pairKeys(new, drawerIndex, nameIndex)
+    keys = np.concatenate([oldDrawers * len(nameIndex) + oldNames, newDrawers * len(nameIndex) + newNames])
+    uniqueKeys, inverse = np.unique(keys, return_inverse=True)
+    sides = [inverse[:len(old)], inverse[len(old):]]
+    before, after = (np.bincount(side, weights=columns.quantities, minlength=len(uniqueKeys)).round().astype(np.int64)
+                     for side, columns in zip(sides, (old, new)))
+    inBefore, inAfter = (np.bincount(side, minlength=len(uniqueKeys)) > 0 for side in sides)
+    changed = np.flatnonzero((before != after) | (inBefore != inAfter))
+    drawers = list(drawerIndex)
+    names = list(nameIndex)
+    rows = []
+    for position in changed.tolist():
+        drawer, name = divmod(int(uniqueKeys[position]), len(nameIndex))
+        rows.append((drawers[drawer], names[name], int(before[position]) if inBefore[position] else None,
+                     int(after[position]) if inAfter[position] else None))
+    return sorted(rows)
@@ -0,0 +1,112 @@
+import queue
+import threading
+
+import stats
+from journal import journalCompactBytes
+
+# Seconds without an edit after which a snapshot is written
+autosaveDelay = 2.0
+
+_stop = object()
+
+
+class Autosaver:
+    """
+    Saves the inventory on a worker thread so the GUI never waits on
+    encryption or disk I/O.
+
+    The GUI thread only numbers each synced edit and queues it. The worker
+    journals the queued edits and, once no edit has arrived for `delay`
+    seconds or the journal has grown past journalCompactBytes, writes a
+    snapshot: it moves the journal aside, captures the state while holding
+    the inventory lock, writes the snapshot and only then drops the old
+    journal. If the write fails, the old journal is kept, and the next
+    snapshot adds the new one to it and must hold every edit in both.
+
+    Attributes:
+        journal (Journal): The edit journal.
+        capture (callable): Called with the last sequence number contained in
+            the store, while the inventory lock is held. Returns a function
+            that writes the captured snapshot. If that function raises, the
+            next capture must include what it failed to write.
+        lock (threading.Lock): The lock the inventory holds while editing its store.
+        delay (float): The debounce window in seconds.
+        seq (int): The sequence number of the last edit queued.
+        error (Exception): The last error raised while saving, if any.
+    """
+    def __init__(self, journal, capture, lock, seq=0, delay=autosaveDelay):
+        self.journal = journal
+        self.capture = capture
+        self.lock = lock
+        self.delay = delay
+        self.seq = seq
+        self.error = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def edit(self, edit):
+        """
+        Queue an edit synced by the inventory. Called with the inventory lock held.
+
+        Args:
+            edit (list): A store method name followed by its arguments.
+        """
+        self.seq += 1
+        self.queue.put((self.seq, edit))
+
+    @stats.timed("Autosaver checkpoint")
+    def _checkpoint(self):
+        # Every journaled edit is in the store already, so the capture holds them all
+        self.journal.rotate()
+        with self.lock:
+            write = self.capture(self.seq)
+        write()
+        self.journal.dropRotated()
+
+    def _run(self):
+        pending = False
+        while True:
+            try:
+                item = self.queue.get(timeout=self.delay if pending else None)
+            except queue.Empty:
+                item = None
+            if item is _stop:
+                break
+            if isinstance(item, threading.Event):
+                item.set()  # Everything queued before it has been journaled
+                continue
+            try:
+                if item is not None:
+                    self.journal.append(*item)
+                    pending = True
+                if pending and (item is None or self.journal.size() > journalCompactBytes):
+                    self._checkpoint()
+                    pending = False
+            except Exception as e:
+                self.error = e
+        try:
+            self._checkpoint()
+            self.journal.close()
+            self.journal.clear()  # Everything journaled is in the snapshot now
+        except Exception as e:
+            self.error = e
+
+    def flush(self):
+        """
+        Wait until every edit queued so far is in the journal on disk.
+        """
+        if self.thread.is_alive():
+            journaled = threading.Event()
+            self.queue.put(journaled)
+            journaled.wait()
+
+    def close(self):
+        """
+        Journal what is still queued, write a final snapshot and wait for the
+        worker to finish. Does nothing if the worker has already finished.
+        """
+        if not self.thread.is_alive():
+            return
+        self.queue.put(_stop)
+        self.thread.join()
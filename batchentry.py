@@ -0,0 +1,67 @@
+import csv
+
+# Errors listed before the batch form stops checking
+maxErrors = 20
+
+
+def parseQuantity(text):
+    """
+    Args:
+        text (str): A whole number, or one with a + or - sign for a change.
+
+    Returns:
+        Tuple[int, bool]: The quantity and whether it is a change.
+
+    Raises:
+        ValueError: If the text is not a whole number.
+    """
+    text = text.strip()
+    digits = text[1:] if text[:1] in '+-' else text
+    if not digits.isdigit():
+        raise ValueError(f"quantity must be a whole number, got '{text}'")
+    return int(text), digits != text
+
+
+def parseBatch(text, drawer=""):
+    """
+    Read the rows of the batch entry form. Each line is "drawer, name,
+    quantity", or "name, quantity" for the drawer picked in the form; a name
+    holding a comma is put in double quotes. A plain quantity sets the
+    item's quantity and a signed one, like +5 or -2, changes it. Blank lines
+    are skipped.
+
+    Args:
+        text (str): The lines typed or pasted into the form.
+        drawer (str): The drawer for lines that do not name one.
+
+    Returns:
+        Tuple[list, list, list]: The (drawer, name, quantity, relative) rows
+            for Inventory.applyBatch(), the line number of each row, and
+            "line N: message" errors for the lines that could not be read.
+    """
+    rows = []
+    lineNumbers = []
+    errors = []
+    for lineNumber, fields in enumerate(csv.reader(text.splitlines(), skipinitialspace=True), 1):
+        fields = [field.strip() for field in fields]
+        if not any(fields):
+            continue
+        try:
+            if len(fields) == 2:
+                if not drawer:
+                    raise ValueError("no drawer given, and none picked for the batch")
+                fields.insert(0, drawer)
+            elif len(fields) != 3:
+                raise ValueError("expected drawer, name, quantity or name, quantity")
+            if not fields[0]:
+                raise ValueError("drawer is missing")
+            if not fields[1]:
+                raise ValueError("name is missing")
+            rows.append((fields[0], fields[1], *parseQuantity(fields[2])))
+            lineNumbers.append(lineNumber)
+        except ValueError as e:
+            errors.append(f"line {lineNumber}: {e}")
+            if len(errors) >= maxErrors:
+                errors.append("too many errors, stopping")
+                break
+    return rows, lineNumbers, errors
@@ -0,0 +1,112 @@
+"""
+Check the columnar reports in analytics.py against plain Python loops over
+readData()-shaped data, then time both on a large closet.
+
+Usage:
+    python benchmarks/analyticsbench.py [drawers, default 1000] [items per drawer, default 1000]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from synthetic import makeCloset
+from analytics import ColumnarInventory, diff
+
+
+def loopTotals(data, by):
+    totals = {}
+    for drawer, items in data.items():
+        for item in items:
+            key = item['name'] if by == 'name' else drawer
+            totals[key] = totals.get(key, 0) + item['quantity']
+    return totals
+
+
+def loopDiff(old, new):
+    sides = []
+    for data in (old, new):
+        totals = {}
+        for drawer, items in data.items():
+            for item in items:
+                totals[drawer, item['name']] = totals.get((drawer, item['name']), 0) + item['quantity']
+        sides.append(totals)
+    return sorted((drawer, name, sides[0].get((drawer, name)), sides[1].get((drawer, name)))
+                  for drawer, name in sides[0].keys() | sides[1].keys()
+                  if sides[0].get((drawer, name)) != sides[1].get((drawer, name)))
+
+
+def edited(data, seed):
+    rng = random.Random(seed)
+    data = {drawer: [dict(item) for item in items] for drawer, items in data.items()}
+    drawers = list(data)
+    for number in range(1000):
+        items = data[rng.choice(drawers)]
+        if items and rng.random() < 0.6:
+            rng.choice(items)['quantity'] += rng.randint(-5, 5)
+        elif items and rng.random() < 0.5:
+            items.pop(rng.randrange(len(items)))
+        else:
+            items.append({'name': f"audit part {number}", 'quantity': rng.randint(1, 9)})
+    del data[drawers[0]]
+    data["New drawer"] = [{'name': "audit part", 'quantity': 1}]
+    return data
+
+
+def check():
+    data = makeCloset(50, 40, names='zipf', namePool=300)
+    columns = ColumnarInventory.fromData(data)
+    for by in ('name', 'drawer'):
+        expected = loopTotals(data, by)
+        top = columns.top(by)
+        assert dict(top) == expected, f"totals by {by} differ"
+        assert [total for _, total in top] == sorted(expected.values(), reverse=True), f"top by {by} out of order"
+        assert columns.top(by, 5) == top[:5], f"top 5 by {by} differs"
+    counts = [count for _, _, count in columns.histogram(7)]
+    assert counts == np.histogram([item['quantity'] for items in data.values() for item in items], 7)[0].tolist()
+    new = edited(data, 1)
+    assert diff(columns, ColumnarInventory.fromData(new)) == loopDiff(data, new), "diff differs"
+    path = os.path.join(tempfile.mkdtemp(), "closet.npz")
+    columns.save(path)
+    loaded = ColumnarInventory.load(path)
+    assert all(loaded.top(by) == columns.top(by) for by in ('name', 'drawer')), "file round trip differs"
+    assert diff(columns, loaded) == [], "file round trip differs"
+    os.remove(path)
+    print("Columnar totals, top-N, histogram, diff and file round trip match plain Python")
+
+
+def timed(label, run):
+    start = time.perf_counter()
+    result = run()
+    print(f"  {label:<32} {(time.perf_counter() - start) * 1e3:9.1f} ms")
+    return result
+
+
+def main():
+    drawers = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    itemsPerDrawer = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    check()
+    data = makeCloset(drawers, itemsPerDrawer, names='zipf', namePool=20000)
+    new = edited(data, 2)
+    print(f"{drawers * itemsPerDrawer} items:")
+    timed("loop: totals by name", lambda: loopTotals(data, 'name'))
+    timed("loop: diff", lambda: loopDiff(data, new))
+    columns = timed("build columns", lambda: ColumnarInventory.fromData(data))
+    newColumns = ColumnarInventory.fromData(new)
+    timed("totals by name", lambda: columns.totals('name'))
+    timed("totals by drawer", lambda: columns.totals('drawer'))
+    timed("top 20 names", lambda: columns.top('name', 20))
+    timed("histogram of quantities", lambda: columns.histogram(20))
+    timed("diff", lambda: diff(columns, newColumns))
+    path = os.path.join(tempfile.mkdtemp(), "closet.npz")
+    timed("save", lambda: columns.save(path))
+    print(f"  {'file size':<32} {os.path.getsize(path) / 1024:9.0f} KiB")
+    timed("load", lambda: ColumnarInventory.load(path))
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
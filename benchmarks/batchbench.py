@@ -0,0 +1,134 @@
+"""
+Check the batch entry form's all-or-nothing edits in every storage format,
+then time stocking a drawer item by item against doing it as one batch.
+
+A batch holding a bad row must leave the inventory and its queued edits
+untouched. A good batch must give the same closet as making its edits one
+at a time, queue one edit per item changed (one per new drawer), and be
+taken back by a single undo.
+
+The timing stocks a new drawer with many items, first the way the GUI used
+to, one item per action with a save after each, then as one batch and one
+save.
+
+Usage:
+    python benchmarks/batchbench.py [items, default 200]
+"""
+import copy
+import shutil
+import sys
+import tempfile
+import time
+
+from synthetic import makeCloset
+import closetcore
+from batchentry import parseBatch
+from closetcore import Closet
+
+password = "benchmark"
+
+
+def stored(closet):
+    return copy.deepcopy(closet.store.readAll())  # Stores may hand out the lists they keep
+
+
+def oneByOne(inventory, rows):
+    for drawer, name, quantity, relative in rows:
+        current = None
+        if drawer in inventory:
+            current = next((item['quantity'] for item in inventory.items(drawer) if item['name'] == name), None)
+        if relative:
+            inventory.setQuantity(drawer, name, current + quantity)
+        elif current is not None:
+            inventory.setQuantity(drawer, name, quantity)
+        elif drawer in inventory:
+            inventory.addItem(drawer, name, quantity)
+        else:
+            inventory.newDrawer(drawer, [{'name': name, 'quantity': quantity}])
+
+
+def openWith(username, storage, data):
+    closet = Closet(username, password, autosave=False, storage=storage)
+    closet.writeData(data)
+    closet.save()
+    closet.close()
+    return Closet(username, password, autosave=False, storage=storage)
+
+
+def checkFormat(storage, data):
+    closet = openWith(f"batch{storage}", storage, data)
+    inventory = closet.inventory
+    inventory.enableHistory()
+    first = data["Drawer 0"][0]['name']
+    text = "\n".join([
+        f"Drawer 0, {first}, +5",
+        f"Drawer 0, {first}, -2",
+        "Drawer 1, brand new part, 7",
+        "",
+        '"Drawer 1", "part, with a comma", 3',
+        "Fresh drawer, washer, 100",
+        "Fresh drawer, washer, +1",
+        "Fresh drawer, nut, 40",
+    ])
+    rows, lineNumbers, errors = parseBatch(text)
+    assert not errors and lineNumbers == [1, 2, 3, 5, 6, 7, 8], "the batch did not parse"
+    before = stored(closet)
+
+    bad = rows + [("Drawer 2", "missing part", 1, True), ("Drawer 0", first, -10 ** 6, True)]
+    errors = inventory.applyBatch(bad)
+    assert [position for position, _ in errors] == [len(rows), len(rows) + 1], f"wrong errors {errors}"
+    assert not inventory.dirty and stored(closet) == before, "a rejected batch changed something"
+
+    assert inventory.checkBatch(rows) == [] and not inventory.dirty, "checking changed something"
+    assert inventory.applyBatch(rows) == []
+    assert len(inventory.pending) == 4, f"expected 4 edits, queued {len(inventory.pending)}"
+    inventory.sync()
+    batched = stored(closet)
+    inventory.undo()
+    assert stored(closet) == before, "one undo did not take the batch back"
+
+    oneByOne(inventory, rows)
+    inventory.sync()
+    assert stored(closet) == batched, "the batch differs from its edits made one at a time"
+    closet.close()
+
+
+def stock(storage, count, batched):
+    closet = openWith(f"stock{storage}{batched}", storage, makeCloset(50, 50))
+    inventory = closet.inventory
+    rows = [("Parts bin", f"part {number}", number % 50 + 1, False) for number in range(count)]
+    start = time.perf_counter()
+    if batched:
+        inventory.applyBatch(rows)
+        inventory.sync()
+        closet.save()
+    else:
+        inventory.newDrawer("Parts bin", [])
+        for _, name, quantity, _ in rows:
+            inventory.addItem("Parts bin", name, quantity)
+            inventory.sync()
+            closet.save()
+    elapsed = time.perf_counter() - start
+    closet.close()
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    folder = tempfile.mkdtemp()
+    closetcore.dataFolder = folder
+    try:
+        for storage in closetcore.storageFormats:
+            checkFormat(storage, makeCloset(5, 10))
+            print(f"{storage}: batches are all or nothing and match their edits one at a time")
+        print(f"Stocking a drawer with {count} items:")
+        for storage in closetcore.storageFormats:
+            oneAtATime = stock(storage, count, False)
+            batch = stock(storage, count, True)
+            print(f"  {storage:<9} one at a time {oneAtATime * 1e3:9.1f} ms, one batch {batch * 1e3:7.1f} ms")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
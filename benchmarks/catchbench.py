@@ -0,0 +1,101 @@
+"""
+Compare the spatial hash catch.py finds collisions with against the
+pygame.sprite.spritecollide scan it used before, as the number of falling
+sprites grows.
+
+Sprites fall and respawn as in the game while a randomly moving player
+looks for the ones it touches, and every way of finding them must agree at
+every step. For each count the script prints the microseconds a step spends
+finding collisions with:
+    spritecollide  testing every sprite's rect in a Python loop, as catch.py used to
+    collidelist    testing every hitbox in one Rect.collidelistall() call
+    grid           the game's grid of columns, which needs no upkeep between respawns
+    square grid    a grid of 50 x 50 cells, including refiling every sprite each step
+and the microseconds moving the sprites takes, for scale.
+
+Run the whole game headless with "python catch.py --headless FRAMES".
+
+Usage:
+    python benchmarks/catchbench.py [steps, default 300]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pygame
+
+import catch
+
+counts = [20, 200, 2000, 8000, 32000]
+
+
+def run(count, steps):
+    """
+    Returns:
+        dict: Method -> mean microseconds per step.
+    """
+    random.seed(count)
+    grid = catch.SpatialHash(catch.gridCellSize, catch.gridOrigin)
+    sprites = [catch.Object(grid) for _ in range(count)]
+    for sprite in sprites:
+        # spritecollide tests rects, so let them be the hitboxes
+        sprite.rect = sprite.hitbox
+    hitboxes = [sprite.hitbox for sprite in sprites]
+    square = catch.SpatialHash((50, 50))
+    for sprite in sprites:
+        square.move(sprite)
+    player = catch.Player(catch.RandomInput(random.Random(count)))
+    player.rect = player.hitbox
+
+    totals = dict.fromkeys(('move', 'spritecollide', 'collidelist', 'grid', 'square grid'), 0.0)
+    for _ in range(steps):
+        start = time.perf_counter()
+        player.update()
+        for sprite in sprites:
+            sprite.update()
+        totals['move'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = pygame.sprite.spritecollide(player, sprites, False)
+        totals['spritecollide'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = [sprites[position] for position in player.hitbox.collidelistall(hitboxes)]
+        totals['collidelist'] += time.perf_counter() - start
+        assert found == expected, "collidelistall differs"
+
+        start = time.perf_counter()
+        found = grid.query(player.hitbox)
+        totals['grid'] += time.perf_counter() - start
+        assert set(found) == set(expected), "the grid differs"
+
+        start = time.perf_counter()
+        for sprite in sprites:
+            square.move(sprite)
+        found = square.query(player.hitbox)
+        totals['square grid'] += time.perf_counter() - start
+        assert set(found) == set(expected), "the square grid differs"
+
+        # Recycle what was touched, as the game does, so the grids see respawns
+        for sprite in expected:
+            sprite.respawn()
+    return {method: total / steps * 1e6 for method, total in totals.items()}
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    # The sprites need images for their size, but never draw them
+    catch.playerImage = pygame.Surface((50, 50))
+    catch.Object.image = pygame.Surface((25, 25))
+    print(f"Microseconds per step over {steps} steps; every method found the same sprites")
+    print(f"{'sprites':>8} {'move':>9} {'spritecollide':>14} {'collidelist':>12} {'grid':>8} {'square grid':>12}")
+    for count in counts:
+        times = run(count, steps)
+        print(f"{count:>8} {times['move']:>9.0f} {times['spritecollide']:>14.1f} {times['collidelist']:>12.1f} "
+              f"{times['grid']:>8.1f} {times['square grid']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
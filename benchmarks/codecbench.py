@@ -0,0 +1,60 @@
+"""
+File size and save/load time of each payload codec on synthetic closets.
+
+"legacy" is the format older versions wrote: JSON text encrypted with Fernet
+and stored as base64. Every other row stores the raw Fernet token.
+
+Usage:
+    python benchmarks/codecbench.py [largest item count, default 1000000]
+"""
+import base64
+import hashlib
+import json
+import sys
+import time
+
+from cryptography.fernet import Fernet
+
+from synthetic import makeCloset
+from serialization import decodePayload, encodePayload, fileToToken, tokenToFile
+
+fernet = Fernet(base64.urlsafe_b64encode(hashlib.sha256(b"benchmark").digest()))
+codecs = [(serializer, compressor) for serializer in ('json', 'binary') for compressor in ('none', 'zlib', 'lzma')]
+
+
+def tinydbShape(data):
+    return {'drawers': {str(number + 1): {'drawer': drawer, 'items': items}
+                        for number, (drawer, items) in enumerate(data.items())}}
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(f"{'items':>9} {'codec':>12} {'bytes':>12} {'ratio':>6} {'save ms':>9} {'load ms':>9}")
+    for drawerCount, itemsPerDrawer in [(10, 100), (100, 100), (100, 1000), (1000, 1000)]:
+        if drawerCount * itemsPerDrawer > largest:
+            break
+        value = tinydbShape(makeCloset(drawerCount, itemsPerDrawer))
+
+        start = time.perf_counter()
+        legacy = fernet.encrypt(json.dumps(value).encode())
+        legacySave = time.perf_counter() - start
+        start = time.perf_counter()
+        json.loads(fernet.decrypt(legacy).decode())
+        legacyLoad = time.perf_counter() - start
+        print(f"{drawerCount * itemsPerDrawer:>9} {'legacy':>12} {len(legacy):>12} {1:>6.2f} "
+              f"{legacySave * 1e3:>9.1f} {legacyLoad * 1e3:>9.1f}")
+
+        for serializer, compressor in codecs:
+            start = time.perf_counter()
+            stored = tokenToFile(fernet.encrypt(encodePayload(value, serializer, compressor)))
+            saveTime = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded = decodePayload(fernet.decrypt(fileToToken(stored)))
+            loadTime = time.perf_counter() - start
+            assert loaded == value
+            print(f"{'':>9} {serializer + '+' + compressor:>12} {len(stored):>12} {len(stored) / len(legacy):>6.2f} "
+                  f"{saveTime * 1e3:>9.1f} {loadTime * 1e3:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
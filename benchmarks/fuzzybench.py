@@ -0,0 +1,119 @@
+"""
+Check the typo-tolerant "did you mean" search in itemindex.py and time it as
+the number of distinct item names grows.
+
+First random edits are applied to an ItemIndex, and its n-gram index must
+match one built from scratch over the names left. Then queries made by
+deleting, inserting, swapping or replacing a character of a real name, or
+by swapping its words, are run at each size. For each size the script prints
+how often the name meant is among the matches, how often the matches agree
+with comparing the query against every name, and the median and p95 query
+time next to that full scan.
+
+Usage:
+    python benchmarks/fuzzybench.py [largest size, default 200000] [queries, default 300]
+"""
+import heapq
+import random
+import statistics
+import sys
+import time
+
+from synthetic import makeCloset
+from itemindex import ItemIndex, NameGrams, fuzzyGrams, fuzzyLimit, fuzzySimilarity, gramSize, similarity
+
+
+def typo(name, rng):
+    """
+    Returns:
+        str: The name with one random typo, or its words swapped.
+    """
+    position = rng.randrange(len(name))
+    kind = rng.randrange(5)
+    if kind == 0:
+        return name[:position] + name[position + 1:]
+    if kind == 1:
+        return name[:position] + rng.choice("aeioust") + name[position:]
+    if kind == 2 and position < len(name) - 1:
+        return name[:position] + name[position + 1] + name[position] + name[position + 2:]
+    if kind == 3:
+        words = name.split()
+        rng.shuffle(words)
+        return " ".join(words)
+    return name[:position] + rng.choice("aeioust") + name[position + 1:]
+
+
+def scan(names, query):
+    """
+    Compare the query against every name, as fuzzy() would with no budget.
+
+    Returns:
+        list: The similarities of the names fuzzy() should return.
+    """
+    query = query.lower()
+    size = gramSize if len(query) > gramSize else 2
+    grams = fuzzyGrams(query, size)
+    scored = ((similarity(grams, fuzzyGrams(key, size)), key) for key in names)
+    return heapq.nlargest(fuzzyLimit, (score for score, _ in scored if score >= fuzzySimilarity))
+
+
+def checkIncremental():
+    rng = random.Random(1)
+    data = makeCloset(20, 50)
+    index = ItemIndex(data)
+    drawers = {drawer: [item['name'] for item in items] for drawer, items in data.items()}
+    for number in range(5000):
+        drawer = rng.choice(list(drawers))
+        if drawers[drawer] and rng.random() < 0.5:
+            name = drawers[drawer].pop(rng.randrange(len(drawers[drawer])))
+            # ItemIndex forgets the first item with this name, whichever one was popped
+            index.removeItem(drawer, name)
+        else:
+            name = rng.choice([f"Part {number}", f"part {number % 50}", f"{number} USB-C Cable"])
+            drawers[drawer].append(name)
+            index.addItem(drawer, name, 1)
+    rebuilt = NameGrams(name for names in drawers.values() for name in names)
+    assert index.names.folded == rebuilt.folded, "names differ after edits"
+    assert index.names.grams == rebuilt.grams, "grams differ after edits"
+    print("The n-gram index kept up with 5000 edits")
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    queryCount = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    checkIncremental()
+    print(f"{'names':>9} {'build s':>8} {'found %':>8} {'as scan %':>9} {'p50 ms':>7} {'p95 ms':>7} {'scan ms':>8}")
+    for size in sorted({size for size in (1000, 10000, 100000) if size < largest} | {largest}):
+        rng = random.Random(size)
+        data = makeCloset(size // 400 + 1, 500, seed=size)
+        names = rng.sample(sorted({item['name'] for items in data.values() for item in items}), size)
+        start = time.perf_counter()
+        index = NameGrams(names)
+        buildTime = time.perf_counter() - start
+        meant = rng.sample(names, queryCount)
+        queries = [typo(name, rng) for name in meant]
+
+        times = []
+        found = 0
+        for name, query in zip(meant, queries):
+            start = time.perf_counter()
+            matches = index.fuzzy(query)
+            times.append(time.perf_counter() - start)
+            found += any(name in exact for _, exact in matches)
+
+        agree = 0
+        scanTime = 0
+        scanned = queries[:max(30, queryCount * 1000 // size)]
+        for query in scanned:
+            start = time.perf_counter()
+            expected = scan(index.folded, query)
+            scanTime += (time.perf_counter() - start) / len(scanned)
+            # Names as similar as each other may come back in any order, so compare the scores
+            agree += [score for score, _ in index.fuzzy(query)] == expected
+        times.sort()
+        print(f"{len(names):>9} {buildTime:>8.2f} {100 * found / queryCount:>8.1f} {100 * agree / len(scanned):>9.1f} "
+              f"{statistics.median(times) * 1e3:>7.2f} {times[int(len(times) * 0.95)] * 1e3:>7.2f} {scanTime * 1e3:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
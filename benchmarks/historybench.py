@@ -0,0 +1,173 @@
+"""
+Check undo, redo and named snapshots in every storage format, then measure
+what the history costs in memory.
+
+For each format a closet gets a run of random edits, one undo step each. Undoing
+every step must give back the data on disk as it was at the start, redoing
+them the data at the end, and undoing and redoing at random must always match
+the state recorded for that step. A snapshot must list exactly the changes
+made after it, restore them, survive reopening the closet and be undone like
+any other step.
+
+The memory figure is what tracemalloc sees the history grow by over the
+edits, next to what a full copy of the closet per step would take.
+
+Usage:
+    python benchmarks/historybench.py [drawers, default 200] [items per drawer, default 50] [edits, default 500]
+"""
+import copy
+import random
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+from synthetic import makeCloset
+import closetcore
+from closetcore import Closet
+
+password = "benchmark"
+
+
+def randomEdit(inventory, rng, number):
+    drawers = list(inventory.drawerNames())
+    if not drawers:
+        inventory.newDrawer(f"history drawer {number}", [])
+        return
+    drawer = rng.choice(drawers)
+    items = inventory.items(drawer)
+    choice = rng.random()
+    if choice < 0.4 and items:
+        inventory.setQuantity(drawer, rng.choice(items)['name'], rng.randint(0, 500))
+    elif choice < 0.7:
+        inventory.addItem(drawer, f"history part {number}", rng.randint(1, 50))
+    elif choice < 0.85 and items:
+        inventory.removeItem(drawer, rng.choice(items)['name'])
+    elif choice < 0.95:
+        inventory.newDrawer(f"history drawer {number}", [{'name': f"part {number}", 'quantity': 1}])
+    else:
+        inventory.removeDrawer(drawer)
+
+
+def stored(closet):
+    return copy.deepcopy(closet.store.readAll())  # Stores may hand out the lists they keep
+
+
+def checkFormat(storage, data, edits):
+    username = f"history{storage}"
+    closet = Closet(username, password, autosave=False, storage=storage)
+    closet.writeData(data)
+    closet.save()
+    closet.close()
+
+    closet = Closet(username, password, autosave=False, storage=storage)
+    inventory = closet.inventory
+    inventory.enableHistory()
+    rng = random.Random(1)
+    states = [stored(closet)]
+    for number in range(edits):
+        randomEdit(inventory, rng, number)
+        inventory.sync()
+        states.append(stored(closet))
+
+    step = edits
+    for _ in range(edits):
+        assert inventory.undo()
+        step -= 1
+    assert not inventory.undo(), "undid past the start"
+    assert stored(closet) == states[0], "undoing everything did not give back the start"
+    while inventory.redo():
+        step += 1
+    assert step == edits and stored(closet) == states[-1], "redoing everything did not give back the end"
+    for _ in range(edits):
+        if rng.random() < 0.5:
+            step -= inventory.undo()
+        else:
+            step += inventory.redo()
+        assert stored(closet) == states[step], f"undo/redo went astray at step {step}"
+
+    closet.takeSnapshot("Monday")
+    before = stored(closet)
+    for number in range(20):
+        randomEdit(inventory, rng, edits + number)
+        inventory.sync()
+    after = stored(closet)
+    expected = []
+    for drawer in sorted(before.keys() | after.keys()):
+        quantities = []
+        for items in (before.get(drawer, []), after.get(drawer, [])):
+            totals = {}
+            for item in items:
+                totals[item['name']] = totals.get(item['name'], 0) + item['quantity']
+            quantities.append(totals)
+        expected += [(drawer, name, quantities[0].get(name), quantities[1].get(name))
+                     for name in sorted(quantities[0].keys() | quantities[1].keys())
+                     if quantities[0].get(name) != quantities[1].get(name)]
+    assert closet.changesSince("Monday") == expected, "changes since the snapshot differ"
+    closet.save()
+    closet.close()
+
+    closet = Closet(username, password, autosave=False, storage=storage)
+    assert [name for name, _ in closet.snapshotList()] == ["Monday"], "snapshot not kept"
+    assert closet.changesSince("Monday") == expected, "changes differ after reopening"
+    closet.restoreSnapshot("Monday")
+    assert stored(closet) == before, "restoring the snapshot did not give it back"
+    closet.inventory.undo()
+    assert stored(closet) == after, "undoing the restore did not give back the edits"
+    closet.deleteSnapshot("Monday")
+    closet.save()
+    closet.close()
+
+
+def measure(data, edits):
+    folder = tempfile.mkdtemp()
+    closetcore.dataFolder = folder
+    try:
+        closet = Closet("memory", password, autosave=False, storage="segments")
+        closet.writeData(data)
+        closet.save()
+        closet.close()
+        closet = Closet("memory", password, autosave=False, storage="segments")
+        inventory = closet.inventory
+        inventory.loadAll()
+        rng = random.Random(2)
+        tracemalloc.start()
+        inventory.enableHistory()
+        start = tracemalloc.get_traced_memory()[0]
+        for number in range(edits):
+            randomEdit(inventory, rng, number)
+            inventory.sync()
+        # This counts the edits' own data as well, so it overstates the history
+        history = tracemalloc.get_traced_memory()[0] - start
+        tracemalloc.stop()
+        tracemalloc.start()
+        full = copy.deepcopy(data)
+        copySize = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del full
+        closet.close()
+    finally:
+        shutil.rmtree(folder)
+    print(f"{edits} undo steps: history grew by {history / 1024:.0f} KiB "
+          f"({history / edits:.0f} bytes per step); a full copy per step would be "
+          f"{copySize * edits / 1024 / 1024:.0f} MiB ({copySize} bytes per step)")
+
+
+def main():
+    drawers = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    itemsPerDrawer = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    edits = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    data = makeCloset(drawers, itemsPerDrawer)
+    folder = tempfile.mkdtemp()
+    closetcore.dataFolder = folder
+    try:
+        for storage in closetcore.storageFormats:
+            checkFormat(storage, makeCloset(10, 20), 200)
+            print(f"{storage}: undo, redo and snapshots match")
+    finally:
+        shutil.rmtree(folder)
+    measure(data, edits)
+
+
+if __name__ == "__main__":
+    main()
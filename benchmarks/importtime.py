@@ -0,0 +1,125 @@
+"""
+Report where Closetman's start-up goes, from python -X importtime.
+
+Each module set is imported in a fresh interpreter several times and the
+median of its import time is printed. The sets are what closetman.py used to
+import before the login prompt, what it imports before the prompt now, and
+what it loads on a background thread while the user types their
+credentials. Then the heaviest packages behind each target module are
+listed by the time spent importing them.
+
+Modules that are not installed, such as PySimpleGUI on a headless machine,
+are left out and named.
+
+Usage:
+    python benchmarks/importtime.py [--runs 7] [--top 12] [module ...]
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_interpreterModules = None
+
+# Module sets closetman.py imports at each stage of start-up
+stages = [
+    ("before the login prompt, previously", ["PySimpleGUI", "subprocess", "stats", "closetclient", "datalock", "drawerview"]),
+    ("before the login prompt, now", ["PySimpleGUI", "importlib", "threading", "stats", "drawerview"]),
+    ("during credential entry, in the background", ["closetclient", "datalock"]),
+]
+defaultTargets = ["closetclient", "closetcli", "closetserver", "stats"]
+
+
+def importTimes(modules):
+    """
+    Import modules in a fresh interpreter under -X importtime.
+
+    Args:
+        modules (list): The module names; none to see what the interpreter
+            imports on its own.
+
+    Returns:
+        list: (self microseconds, cumulative microseconds, depth, name) per
+            module imported, in the order importtime printed them, leaving
+            out what the interpreter imports on its own.
+    """
+    code = f"import {', '.join(modules)}" if modules else "pass"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=root, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(own), int(cumulative), depth, name.strip()))
+    if not modules:
+        return rows
+    return [row for row in rows if row[3] not in interpreterModules()]
+
+
+def interpreterModules():
+    """
+    Returns:
+        set: The modules a bare interpreter imports at start-up.
+    """
+    global _interpreterModules
+    if _interpreterModules is None:
+        _interpreterModules = {name for _, _, _, name in importTimes([])}
+    return _interpreterModules
+
+
+def totalTime(rows):
+    return sum(cumulative for _, cumulative, depth, _ in rows if depth == 0)
+
+
+def byPackage(rows):
+    """
+    Returns:
+        dict: Top-level package -> microseconds spent importing its own modules.
+    """
+    totals = {}
+    for own, _, _, name in rows:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + own
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Break down Closetman's import times.")
+    parser.add_argument('modules', nargs='*', default=defaultTargets, help="modules to break down")
+    parser.add_argument('--runs', type=int, default=7, help="fresh interpreters per measurement")
+    parser.add_argument('--top', type=int, default=12, help="packages listed per module")
+    args = parser.parse_args()
+    sys.path.insert(0, root)
+    missing = lambda modules: [module for module in modules if importlib.util.find_spec(module) is None]
+
+    print("Start-up stages (median ms of import time):")
+    for label, modules in stages:
+        absent = missing(modules)
+        present = [module for module in modules if module not in absent]
+        median = statistics.median(totalTime(importTimes(present)) for _ in range(args.runs)) / 1e3
+        note = f"  (without {', '.join(absent)})" if absent else ""
+        print(f"  {median:8.1f}  {label}{note}")
+
+    for module in args.modules:
+        if missing([module]):
+            print(f"\n{module}: not installed")
+            continue
+        runs = [importTimes([module]) for _ in range(args.runs)]
+        packages = {}
+        for rows in runs:
+            for package, micros in byPackage(rows).items():
+                packages.setdefault(package, []).append(micros)
+        total = statistics.median(totalTime(rows) for rows in runs) / 1e3
+        print(f"\n{module}: {total:.1f} ms")
+        heaviest = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+        for package, micros in heaviest:
+            print(f"  {statistics.median(micros) / 1e3:8.1f}  {package}")
+
+
+if __name__ == "__main__":
+    main()
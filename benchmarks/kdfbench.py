@@ -0,0 +1,64 @@
+"""
+Time each key derivation setting, to pick the strongest kdfParams that keeps
+login under a target latency on this machine.
+
+Usage:
+    python benchmarks/kdfbench.py [target milliseconds, default 250]
+"""
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keymanager import KeyManager, deriveKey, kdfParams
+
+salt = base64.b64encode(os.urandom(16)).decode()
+candidates = ([{'kdf': 'sha256'}]
+              + [{'kdf': 'pbkdf2', 'iterations': iterations, 'salt': salt}
+                 for iterations in (100000, 300000, 600000, 1200000)]
+              + [{'kdf': 'scrypt', 'n': 2 ** exponent, 'r': 8, 'p': 1, 'salt': salt}
+                 for exponent in (14, 15, 16, 17)])
+
+
+def timeDerivation(params, repeats=3):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        deriveKey("correct horse battery staple", params)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    target = float(sys.argv[1]) / 1e3 if len(sys.argv) > 1 else 0.25
+    print(f"{'kdf':>8} {'cost':>10} {'ms':>9}")
+    fitting = []
+    for params in candidates:
+        elapsed = timeDerivation(params)
+        cost = params.get('iterations') or params.get('n') or ''
+        marker = "" if elapsed <= target else "  over target"
+        print(f"{params['kdf']:>8} {cost:>10} {elapsed * 1e3:>9.1f}{marker}")
+        if params['kdf'] != 'sha256' and elapsed <= target:
+            fitting.append(params)
+
+    keys = KeyManager("correct horse battery staple")
+    params = KeyManager.newParams()
+    start = time.perf_counter()
+    keys.key(params)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(1000):
+        keys.fernet(params)
+    cached = (time.perf_counter() - start) / 1000
+    print(f"\nkdfParams {kdfParams}: first derivation {first * 1e3:.1f} ms, cached lookup {cached * 1e6:.1f} us")
+    strongest = [params for params in fitting if params['kdf'] == kdfParams['kdf']]
+    if strongest:
+        suggestion = {setting: value for setting, value in strongest[-1].items() if setting != 'salt'}
+        print(f"Strongest {kdfParams['kdf']} setting under {target * 1e3:.0f} ms: {suggestion}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Time from entering the password to having an Inventory ready for the main
+window, for the single-file snapshot and for the segmented format.
+
+Usage:
+    python benchmarks/loadbench.py
+"""
+import os
+import tempfile
+import time
+
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+from synthetic import makeCloset
+from inventory import Inventory
+from keymanager import KeyManager, addKeyHeader, splitKeyHeader
+from segments import SegmentedStore
+from serialization import decodePayload, encodePayload, fileToToken, tokenToFile
+from storage import TinyDBStore
+
+
+def writeBlob(path, data, keys):
+    """
+    What saveData writes for the single-file format.
+    """
+    tables = {'drawers': {str(number + 1): {'drawer': drawer, 'items': items}
+                          for number, (drawer, items) in enumerate(data.items())}}
+    token = keys.fernet().encrypt(encodePayload(tables, 'json', 'zlib'))
+    with open(path, 'wb') as file:
+        file.write(addKeyHeader(keys.params, tokenToFile(token)))
+
+
+def openBlob(path, keys):
+    """
+    What loadData does for the single-file format.
+    """
+    with open(path, 'rb') as file:
+        params, encryptedData = splitKeyHeader(file.read())
+    db = TinyDB(storage=MemoryStorage)
+    db.storage.write(decodePayload(keys.fernet(params).decrypt(fileToToken(encryptedData))))
+    return Inventory(TinyDBStore(db.table('drawers')))
+
+
+def main():
+    # Keys are derived once up front, as at login, so only loading is timed
+    keys = KeyManager("benchmark")
+    keys.params = keys.newParams()
+    print(f"{'items':>9} {'drawers':>8} {'blob ms':>9} {'segments ms':>12} {'first drawer ms':>16}")
+    for drawerCount, itemsPerDrawer in [(10, 100), (100, 100), (300, 100), (300, 1000)]:
+        data = makeCloset(drawerCount, itemsPerDrawer)
+        with tempfile.TemporaryDirectory() as folder:
+            blobPath = os.path.join(folder, "user.json")
+            writeBlob(blobPath, data, keys)
+            segmentFolder = os.path.join(folder, "user")
+            store = SegmentedStore(segmentFolder, keys)
+            store.replaceAll(data)
+            store.capture(0)()
+
+            start = time.perf_counter()
+            openBlob(blobPath, keys)
+            blobTime = time.perf_counter() - start
+
+            start = time.perf_counter()
+            inventory = Inventory(SegmentedStore(segmentFolder, keys))
+            segmentTime = time.perf_counter() - start
+            start = time.perf_counter()
+            len(inventory.items("Drawer 0"))
+            drawerTime = time.perf_counter() - start
+
+        print(f"{drawerCount * itemsPerDrawer:>9} {drawerCount:>8} {blobTime * 1e3:>9.1f} "
+              f"{segmentTime * 1e3:>12.1f} {drawerTime * 1e3:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare the ItemIndex against the nested loop "Search for Item" used to run.
+
+Usage:
+    python benchmarks/searchbench.py
+"""
+import random
+import time
+
+from synthetic import makeCloset
+from itemindex import ItemIndex
+
+
+def loopSearch(data, searchItem):
+    """
+    The original full scan over every drawer and item.
+    """
+    foundItems = []
+    for drawer, items in data.items():
+        for item in items:
+            if item['name'] == searchItem:
+                foundItems.append((item['name'], drawer, item['quantity']))
+    return foundItems
+
+
+def timePerQuery(function, queries):
+    start = time.perf_counter()
+    for query in queries:
+        function(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    rng = random.Random(1)
+    print(f"{'items':>9} {'build s':>9} {'loop us':>10} {'exact us':>10} {'prefix us':>10} {'substr us':>10}")
+    for drawerCount, itemsPerDrawer in [(10, 100), (100, 100), (300, 100), (300, 300)]:
+        data = makeCloset(drawerCount, itemsPerDrawer)
+        names = [item['name'] for items in data.values() for item in items]
+        queries = [rng.choice(names) for _ in range(200)]
+
+        start = time.perf_counter()
+        index = ItemIndex(data)
+        buildTime = time.perf_counter() - start
+
+        for query in queries[:20]:
+            assert sorted(index.exact(query)) == sorted(loopSearch(data, query))
+
+        loopTime = timePerQuery(lambda query: loopSearch(data, query), queries[:20])
+        exactTime = timePerQuery(index.exact, queries)
+        prefixTime = timePerQuery(index.prefix, [query[:12] for query in queries])
+        substringTime = timePerQuery(index.substring, [query[-6:] for query in queries])
+        print(f"{len(names):>9} {buildTime:>9.3f} {loopTime * 1e6:>10.1f} {exactTime * 1e6:>10.1f} "
+              f"{prefixTime * 1e6:>10.1f} {substringTime * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
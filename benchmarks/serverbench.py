@@ -0,0 +1,148 @@
+"""
+Run several client processes against closetserver.py at once and check that
+no edit is lost, that every client hears about the others' edits and that
+the data on disk matches once the server has stopped. Then print the
+request latency and throughput the clients saw.
+
+Each client works in its own drawer and also adds and removes uniquely named
+items in one shared drawer, so the expected final state is known exactly.
+
+Usage:
+    python benchmarks/serverbench.py [clients, default 4] [edits per client, default 500]
+"""
+import multiprocessing
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from cryptography.fernet import InvalidToken
+
+from synthetic import makeCloset
+import closetcore
+from closetclient import openCloset
+from closetcore import Closet
+from closetserver import InventoryServer
+from datalock import DataInUseError
+
+username = "bench"
+password = "benchmark"
+
+
+def clientEdits(number, edits):
+    """
+    The edits one client makes: items for its own drawer, and items added to
+    and later removed from the shared drawer.
+    """
+    own = f"Client {number}"
+    yield ["newDrawer", own, []]
+    for edit in range(edits):
+        if edit % 4 == 1:
+            yield ["addItem", "Shared", f"client {number} part {edit}", edit]
+        elif edit % 8 == 3:
+            yield ["removeItem", "Shared", f"client {number} part {edit - 2}"]
+        else:
+            yield ["addItem", own, f"part {edit}", edit]
+
+
+def runClient(folder, number, edits, barrier, results):
+    closetcore.dataFolder = folder
+    closet = openCloset(username, password)
+    heard = []
+    closet.inventory.listeners.append(heard.append)
+    inventory = closet.inventory
+    barrier.wait()
+    latencies = []
+    for edit in clientEdits(number, edits):
+        start = time.perf_counter()
+        getattr(inventory, edit[0])(*edit[1:])
+        latencies.append(time.perf_counter() - start)
+    closet.save()
+    barrier.wait()  # Every client has finished editing
+    time.sleep(0.5)  # Let the last notifications arrive
+    closet.close()
+    results.put((number, latencies, len(heard)))
+
+
+def expectedState(clients, edits, start):
+    state = {drawer: list(items) for drawer, items in start.items()}
+    for number in range(clients):
+        for edit in clientEdits(number, edits):
+            if edit[0] == "newDrawer":
+                state[edit[1]] = []
+            elif edit[0] == "addItem":
+                state[edit[1]].append({'name': edit[2], 'quantity': edit[3]})
+            else:
+                state[edit[1]] = [item for item in state[edit[1]] if item['name'] != edit[2]]
+    return state
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    folder = tempfile.mkdtemp()
+    closetcore.dataFolder = folder
+    try:
+        closet = Closet(username, password)
+        start = makeCloset(5, 20)
+        start["Shared"] = []
+        for drawer, items in start.items():
+            closet.inventory.newDrawer(drawer, items)
+        closet.inventory.sync()
+        server = InventoryServer(closet)
+        server.listen()
+        threading.Thread(target=server.serveForever, daemon=True).start()
+
+        try:
+            Closet(username, password)
+            raise AssertionError("Opened data the server holds")
+        except DataInUseError:
+            pass
+        try:
+            openCloset(username, "wrong password")
+            raise AssertionError("Connected with the wrong password")
+        except InvalidToken:
+            pass
+
+        barrier = multiprocessing.Barrier(clients)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=runClient, args=(folder, number, edits, barrier, results))
+                     for number in range(clients)]
+        began = time.perf_counter()
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - began
+        for process in processes:
+            process.join()
+
+        server.stop()
+        with server.lock:
+            closet.close()
+
+        state = expectedState(clients, edits, start)
+        reopened = Closet(username, password)
+        data = reopened.store.readAll()
+        reopened.close()
+        # Clients interleave in the shared drawer, so only its contents are fixed, not its order
+        byName = lambda items: sorted(items, key=lambda item: item['name'])
+        assert byName(data.pop("Shared")) == byName(state.pop("Shared")), "shared drawer differs"
+        assert data == state, "client drawers differ"
+        editsPerClient = len(list(clientEdits(0, edits)))
+        for number, _, heard in reports:
+            assert heard == editsPerClient * (clients - 1), f"client {number} heard {heard} edits"
+        print(f"{clients} clients x {edits} edits: no edit lost, every client heard every other client's edits, "
+              f"data on disk matches")
+
+        latencies = sorted(latency for _, clientLatencies, _ in reports for latency in clientLatencies)
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{len(latencies) / elapsed:.0f} edits/s overall, p50 {statistics.median(latencies) * 1e3:.2f} ms, "
+              f"p99 {p99 * 1e3:.2f} ms per edit (including key derivation and start-up: {elapsed:.1f} s)")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
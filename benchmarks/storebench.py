@@ -0,0 +1,198 @@
+"""
+Conformance check and timings for every storage engine.
+
+The same random edit sequences are applied to each engine and to a plain
+dict; every engine must read back exactly like the dict after each step and
+again after being saved and reopened. The timings then show what opening,
+loading a drawer, editing an item and finding an item by name cost on a
+large closet.
+
+Usage:
+    python benchmarks/storebench.py [item count for the timings, default 100000]
+"""
+import copy
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+from synthetic import makeCloset
+from keymanager import KeyManager
+from segments import SegmentedStore
+from sqlitestore import SQLiteStore
+from storage import TinyDBStore
+
+
+class TinyDBEngine:
+    def __init__(self, folder, keys):
+        self.table = TinyDB(storage=MemoryStorage).table('drawers')  # type: ignore
+
+    def open(self):
+        return TinyDBStore(self.table)
+
+    def save(self, store):
+        pass
+
+
+class SegmentsEngine:
+    def __init__(self, folder, keys):
+        self.folder = os.path.join(folder, "segments")
+        self.keys = keys
+
+    def open(self):
+        return SegmentedStore(self.folder, self.keys)
+
+    def save(self, store):
+        store.capture(0)()
+
+
+class SQLiteEngine:
+    def __init__(self, folder, keys):
+        self.path = os.path.join(folder, "store.sqlite")
+        self.keys = keys
+
+    def open(self):
+        return SQLiteStore(self.path, self.keys)
+
+    def save(self, store):
+        store.capture(0)()
+        store.close()
+
+
+engines = {'tinydb': TinyDBEngine, 'segments': SegmentsEngine, 'sqlite': SQLiteEngine}
+
+
+def randomEdit(rng, data):
+    """
+    Pick an edit the GUI or the command line could make against the current data.
+    """
+    drawers = list(data)
+    kind = rng.choice(["new", "overwrite", "add", "remove", "set", "delete"] if drawers else ["new"])
+    if kind == "new":
+        items = [{'name': f"part {rng.randrange(20)}", 'quantity': rng.randint(1, 9)} for _ in range(rng.randint(0, 5))]
+        return ["upsertDrawer", f"Drawer new {rng.randrange(100)}", items]
+    drawer = rng.choice(drawers)
+    names = [item['name'] for item in data[drawer]] + ["missing part"]
+    if kind == "overwrite":
+        return ["upsertDrawer", drawer, [{'name': f"part {rng.randrange(20)}", 'quantity': rng.randint(1, 9)}]]
+    if kind == "add":
+        return ["addItem", drawer, rng.choice(names[:-1] or ["part 0"]), rng.randint(1, 9)]
+    if kind == "remove":
+        return ["removeItem", drawer, rng.choice(names)]
+    if kind == "set":
+        return ["setQuantity", drawer, rng.choice(names), rng.randint(0, 9)]
+    return ["deleteDrawer", drawer]
+
+
+def applyToDict(data, edit):
+    """
+    The reference behaviour of each store edit.
+    """
+    if edit[0] == "upsertDrawer":
+        data[edit[1]] = copy.deepcopy(edit[2])
+    elif edit[0] == "addItem":
+        data[edit[1]].append({'name': edit[2], 'quantity': edit[3]})
+    elif edit[0] == "deleteDrawer":
+        del data[edit[1]]
+    else:
+        for position, item in enumerate(data[edit[1]]):
+            if item['name'] == edit[2]:
+                if edit[0] == "removeItem":
+                    del data[edit[1]][position]
+                else:
+                    item['quantity'] = edit[3]
+                return True
+        return False
+
+
+def checkConformance(keys, folder, sequences=20, steps=60):
+    for name, engine in engines.items():
+        rng = random.Random(11)
+        for sequence in range(sequences):
+            sequenceFolder = os.path.join(folder, f"{name}{sequence}")
+            os.makedirs(sequenceFolder)
+            data = makeCloset(rng.randint(0, 4), rng.randint(0, 4), seed=rng.randrange(1000))
+            engine = engines[name](sequenceFolder, keys)
+            store = engine.open()
+            store.replaceAll(copy.deepcopy(data))
+            for step in range(steps):
+                edit = randomEdit(rng, data)
+                expected = applyToDict(data, edit)
+                result = getattr(store, edit[0])(*edit[1:])
+                if expected is not None:
+                    assert result == expected, (name, edit)
+                assert store.drawerNames() == list(data), (name, edit)
+                assert store.readAll() == data, (name, edit)
+                if step % 20 == 19:
+                    engine.save(store)
+                    store = engine.open()
+                    assert store.readAll() == data, (name, "reopen")
+            if hasattr(store, 'findItem'):
+                for drawer, items in data.items():
+                    for item in items:
+                        expected = [(other, found['quantity']) for other, otherItems in data.items()
+                                    for found in otherItems if found['name'] == item['name']]
+                        assert sorted(store.findItem(item['name'])) == sorted(expected), (name, item)
+            engine.save(store)
+        print(f"{name}: {sequences} random edit sequences of {steps} steps match the reference")
+
+
+def timeEngines(keys, folder, itemCount):
+    drawerCount = max(1, itemCount // 1000)
+    data = makeCloset(drawerCount, itemCount // drawerCount)
+    print(f"\n{itemCount} items in {drawerCount} drawers")
+    print(f"{'engine':>9} {'build s':>8} {'open ms':>8} {'drawer ms':>10} {'add ms':>8} {'set ms':>8} "
+          f"{'remove ms':>10} {'find ms':>8}")
+    for name, engine in engines.items():
+        engine = engine(os.path.join(folder, f"timing-{name}"), keys)
+        os.makedirs(os.path.join(folder, f"timing-{name}"))
+        start = time.perf_counter()
+        store = engine.open()
+        store.replaceAll(data)
+        engine.save(store)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = engine.open()
+        opened = time.perf_counter() - start
+        drawer = f"Drawer {drawerCount // 2}"
+        start = time.perf_counter()
+        items = store.loadDrawer(drawer)
+        loaded = time.perf_counter() - start
+        target = items[len(items) // 2]['name']
+
+        timings = []
+        for edit in (["addItem", drawer, "bench part", 1], ["setQuantity", drawer, target, 7],
+                     ["removeItem", drawer, "bench part"]):
+            start = time.perf_counter()
+            getattr(store, edit[0])(*edit[1:])
+            timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        if hasattr(store, 'findItem'):
+            store.findItem(target)
+        else:
+            [item for items in store.readAll().values() for item in items if item['name'] == target]
+        found = time.perf_counter() - start
+        engine.save(store)
+        print(f"{name:>9} {build:>8.2f} {opened * 1e3:>8.1f} {loaded * 1e3:>10.2f} {timings[0] * 1e3:>8.2f} "
+              f"{timings[1] * 1e3:>8.2f} {timings[2] * 1e3:>10.2f} {found * 1e3:>8.2f}")
+
+
+def main():
+    itemCount = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    keys = KeyManager("benchmark")
+    folder = tempfile.mkdtemp()
+    try:
+        checkConformance(keys, folder)
+        timeEngines(keys, folder, itemCount)
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
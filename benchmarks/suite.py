@@ -0,0 +1,208 @@
+"""
+Benchmark the storage and query paths end to end, without the GUI, and write
+the results as JSON so runs on different commits can be compared.
+
+For every closet size and storage format it times:
+    login      opening the data: key derivation, decrypting what is needed up front
+    loadAll    opening the data and decrypting every drawer
+    save       replacing every drawer and saving
+    edit       one added item and the save that follows it
+    bulkEdit   1000 quantity changes and one save
+    search     exact, prefix and substring searches on a loaded closet
+and reports p50 and p99 latency, throughput and the peak memory allocated by
+Python during one extra traced run.
+
+Usage:
+    python benchmarks/suite.py [--sizes 10,1000,100000] [--formats segments,sqlite]
+                               [--names random|zipf] [--seed 0] [--output results.json]
+    python benchmarks/suite.py --compare base.json new.json [--tolerance 1.2]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from synthetic import makeCloset
+import closetcore
+from closetcore import Closet
+
+password = "benchmark"
+defaultSizes = [10, 100, 1000, 10000, 100000, 1000000]
+itemsPerDrawer = 1000
+bulkEdits = 1000
+
+
+def percentile(sortedTimes, fraction):
+    return sortedTimes[max(0, math.ceil(fraction * len(sortedTimes)) - 1)]
+
+
+def measure(run, repeats, work=1):
+    """
+    Time repeated runs, then trace one more run for its peak memory.
+
+    Args:
+        run (callable): Does one run. Called with the run number.
+        repeats (int): The number of timed runs.
+        work (int): Units of work per run, for the throughput.
+
+    Returns:
+        dict: The p50 and p99 in milliseconds, units per second and peak bytes.
+    """
+    times = []
+    for number in range(repeats):
+        start = time.perf_counter()
+        run(number)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run(repeats)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    times.sort()
+    return {'repeats': repeats, 'p50Ms': percentile(times, 0.5) * 1e3, 'p99Ms': percentile(times, 0.99) * 1e3,
+            'perSecond': work * len(times) / sum(times), 'peakBytes': peak}
+
+
+def benchmarkFormat(storage, size, args):
+    """
+    Run every operation on one closet size in one storage format.
+
+    Returns:
+        list: One result dict per operation.
+    """
+    username = f"{storage}{size}"
+    drawerCount = max(1, math.ceil(size / itemsPerDrawer))
+    data = makeCloset(drawerCount, min(size, itemsPerDrawer), seed=args.seed, names=args.names)
+    names = [item['name'] for items in data.values() for item in items]
+    rng = random.Random(args.seed)
+    few = 3 if size >= 100000 else None  # Keep the largest closets to a few minutes
+    results = []
+
+    closet = Closet(username, password, autosave=False, storage=storage)
+    closet.writeData(data)
+    closet.save()
+    closet.close()
+
+    def login(_):
+        Closet(username, password, autosave=False, storage=storage).close()
+    results.append(('login', measure(login, few or 5)))
+
+    def loadAll(_):
+        opened = Closet(username, password, autosave=False, storage=storage)
+        opened.inventory.loadAll()
+        opened.close()
+    results.append(('loadAll', measure(loadAll, few or 5, size)))
+
+    closet = Closet(username, password, autosave=False, storage=storage)
+    inventory = closet.inventory
+
+    def save(_):
+        closet.writeData(data)
+        closet.save()
+    results.append(('save', measure(save, few or 5, size)))
+
+    drawers = list(data)
+
+    def edit(number):
+        inventory.addItem(rng.choice(drawers), f"benchmark part {number}", 1)
+        closet.save()
+    results.append(('edit', measure(edit, 10 if few else 50)))
+
+    def bulkEdit(_):
+        for _ in range(bulkEdits):
+            drawer = rng.choice(drawers)
+            item = rng.choice(data[drawer])
+            inventory.setQuantity(drawer, item['name'], rng.randint(1, 500))
+        closet.save()
+    results.append(('bulkEdit', measure(bulkEdit, few or 5, bulkEdits)))
+
+    inventory.loadAll()
+    queries = []
+    for _ in range(100):
+        name = rng.choice(names)
+        queries += [name, name[:rng.randint(1, 4)].lower(), name[len(name) // 3:len(name) // 3 + 3]]
+
+    def search(number):
+        inventory.search(queries[number % len(queries)])
+    results.append(('search', measure(search, len(queries))))
+    closet.close()
+    return [dict(operation=operation, storage=storage, items=size, **result) for operation, result in results]
+
+
+def environment(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'machine': platform.platform(),
+            'processor': platform.processor(), 'seed': args.seed, 'names': args.names,
+            'itemsPerDrawer': itemsPerDrawer, 'time': time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(basePath, newPath, tolerance):
+    """
+    Print each operation's p50 in two result files and flag slowdowns.
+
+    Returns:
+        int: The number of operations slower than tolerance times the base.
+    """
+    with open(basePath) as file:
+        base = {(result['operation'], result['storage'], result['items']): result for result in json.load(file)['results']}
+    with open(newPath) as file:
+        new = json.load(file)['results']
+    regressions = 0
+    print(f"{'operation':>10} {'storage':>9} {'items':>8} {'base ms':>10} {'new ms':>10} {'ratio':>6}")
+    for result in new:
+        old = base.get((result['operation'], result['storage'], result['items']))
+        if old is None:
+            continue
+        ratio = result['p50Ms'] / old['p50Ms'] if old['p50Ms'] else float('inf')
+        flag = "  slower" if ratio > tolerance else ""
+        regressions += bool(flag)
+        print(f"{result['operation']:>10} {result['storage']:>9} {result['items']:>8} {old['p50Ms']:>10.3f} "
+              f"{result['p50Ms']:>10.3f} {ratio:>6.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Closetman's storage and query paths.")
+    parser.add_argument('--sizes', default=",".join(map(str, defaultSizes)), help="comma-separated item counts")
+    parser.add_argument('--formats', default=",".join(closetcore.storageFormats), help="comma-separated storage formats")
+    parser.add_argument('--names', choices=('random', 'zipf'), default='random', help="how item names repeat")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="the JSON file to write, standard output by default")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="compare two result files")
+    parser.add_argument('--tolerance', type=float, default=1.2, help="p50 ratio reported as slower")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.tolerance) else 0)
+
+    folder = tempfile.mkdtemp()
+    closetcore.dataFolder = folder
+    results = []
+    try:
+        for size in map(int, args.sizes.split(",")):
+            for storage in args.formats.split(","):
+                print(f"{size} items, {storage}...", file=sys.stderr)
+                results += benchmarkFormat(storage, size, args)
+    finally:
+        shutil.rmtree(folder)
+    report = json.dumps({'environment': environment(args), 'results': results}, indent=1)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import itertools
+import os
+import random
+import sys
+
+# Let the benchmarks import the modules that live next to closetman.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+partKinds = ["resistor", "capacitor", "inductor", "diode", "LED", "USB-C cable", "header",
+             "crystal", "regulator", "MOSFET", "op-amp", "fuse", "switch", "connector"]
+partValues = ["1k", "4.7k", "10k", "100k", "1u", "10u", "100n", "22p", "3.3V", "5V", "0805", "SMD", "THT"]
+
+
+def makeCloset(drawerCount, itemsPerDrawer, seed=0, names='random', namePool=1000):
+    """
+    Build a synthetic closet shaped like the result of readData().
+
+    Args:
+        drawerCount (int): The number of drawers.
+        itemsPerDrawer (int): The number of items in each drawer.
+        seed (int): The random seed, so runs are reproducible.
+        names (str): 'random' for names that rarely repeat, or 'zipf' to draw
+            names from a pool of namePool with a few very common ones, like a
+            closet full of the same resistors.
+        namePool (int): The number of distinct names for 'zipf'.
+
+    Returns:
+        dict: Drawer name -> list of {'name', 'quantity'} dicts.
+    """
+    rng = random.Random(seed)
+    if names == 'zipf':
+        pool = [f"{rng.choice(partValues)} {rng.choice(partKinds)} #{number}" for number in range(namePool)]
+        weights = list(itertools.accumulate(1 / rank for rank in range(1, namePool + 1)))
+
+        def pick():
+            return rng.choices(pool, cum_weights=weights)[0]
+    elif names == 'random':
+        def pick():
+            return f"{rng.choice(partValues)} {rng.choice(partKinds)} #{rng.randrange(10000)}"
+    else:
+        raise ValueError(f"Unknown name distribution '{names}'")
+    data = {}
+    for drawerNumber in range(drawerCount):
+        items = []
+        for _ in range(itemsPerDrawer):
+            items.append({'name': pick(), 'quantity': rng.randint(1, 500)})
+        data[f"Drawer {drawerNumber}"] = items
+    return data
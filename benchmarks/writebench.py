@@ -0,0 +1,208 @@
+"""
+Check the per-drawer TinyDBStore edits against the old truncate-and-reinsert
+writeData, then time one edit with each.
+
+Random edit sequences are applied both ways and the two tables must read back
+identically after every step. The same edits are also autosaved to a segment
+store while some of its writes fail, and reopening it and replaying its
+journal must still give every edit.
+
+Usage:
+    python benchmarks/writebench.py
+"""
+import copy
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+from synthetic import makeCloset
+import segments
+from autosave import Autosaver
+from journal import Journal, readJournal
+from keymanager import KeyManager
+from segments import SegmentedStore
+from storage import TinyDBStore
+
+# Store method for each kind of edit randomEdit() makes
+storeMethods = {"upsert": "upsertDrawer", "add": "addItem", "remove": "removeItem", "delete": "deleteDrawer"}
+
+
+def freshTable(data):
+    db = TinyDB(storage=MemoryStorage)
+    table = db.table('drawers')
+    for drawer, items in copy.deepcopy(data).items():
+        table.insert({'drawer': drawer, 'items': items})
+    return table
+
+
+def readTable(table):
+    return {doc['drawer']: doc['items'] for doc in table.all()}
+
+
+def oldWriteData(table, data):
+    table.truncate()
+    for key, items in data.items():
+        table.insert({'drawer': key, 'items': items})
+
+
+def randomEdit(rng, data):
+    """
+    Pick an edit the GUI could make against the current data.
+    """
+    drawers = list(data)
+    kind = rng.choice(["new", "overwrite", "add", "remove", "delete"] if drawers else ["new"])
+    if kind == "new":
+        items = [{'name': f"part {rng.randrange(50)}", 'quantity': rng.randint(1, 9)} for _ in range(rng.randint(1, 5))]
+        return ("upsert", f"Drawer new {rng.randrange(1000)}", items)
+    drawer = rng.choice(drawers)
+    if kind == "overwrite":
+        return ("upsert", drawer, [{'name': f"part {rng.randrange(50)}", 'quantity': rng.randint(1, 9)}])
+    if kind == "add":
+        return ("add", drawer, f"part {rng.randrange(50)}", rng.randint(1, 9))
+    if kind == "remove":
+        names = [item['name'] for item in data[drawer]] + ["missing part"]
+        return ("remove", drawer, rng.choice(names))
+    return ("delete", drawer)
+
+
+def applyOld(table, edit):
+    data = copy.deepcopy(readTable(table))
+    if edit[0] == "upsert":
+        data[edit[1]] = copy.deepcopy(edit[2])
+    elif edit[0] == "add":
+        data[edit[1]].append({'name': edit[2], 'quantity': edit[3]})
+    elif edit[0] == "remove":
+        for item in data[edit[1]]:
+            if item['name'] == edit[2]:
+                data[edit[1]].remove(item)
+                break
+    else:
+        del data[edit[1]]
+    oldWriteData(table, data)
+
+
+def applyNew(store, edit):
+    if edit[0] == "upsert":
+        store.upsertDrawer(edit[1], edit[2])
+    elif edit[0] == "add":
+        store.addItem(edit[1], edit[2], edit[3])
+    elif edit[0] == "remove":
+        store.removeItem(edit[1], edit[2])
+    else:
+        store.deleteDrawer(edit[1])
+
+
+def checkEquivalence(sequences=50, steps=60):
+    rng = random.Random(7)
+    for _ in range(sequences):
+        data = makeCloset(rng.randint(0, 6), rng.randint(0, 6), seed=rng.randrange(1000))
+        oldTable = freshTable(data)
+        store = TinyDBStore(freshTable(data))
+        for _ in range(steps):
+            edit = randomEdit(rng, readTable(oldTable))
+            applyOld(oldTable, edit)
+            applyNew(store, edit)
+            assert list(readTable(oldTable).items()) == list(store.readAll().items()), edit
+    print(f"{sequences} random edit sequences of {steps} steps match the old writeData")
+
+
+def reopen(folder, keys):
+    """
+    Open a segment store and replay its journal, as loadSegments() does.
+    """
+    store = SegmentedStore(folder, keys)
+    journalPath = os.path.join(folder, "journal")
+    key = keys.key(store.params)
+    for seq, edit in readJournal(journalPath + ".old", key) + readJournal(journalPath, key):
+        if seq > store.journalSeq:
+            getattr(store, edit[0])(*edit[1:])
+    return store
+
+
+def checkFailedWrites(runs=10, steps=150, failRate=0.3):
+    """
+    Autosave random edits to a segment store while a share of its file
+    writes fail. However the last snapshot ends, reopening the store and
+    replaying the journal must give every edit, and a last snapshot that
+    succeeds must leave no segment file the manifest does not name.
+    """
+    rng = random.Random(11)
+    keys = KeyManager("benchmark")
+    writeEncrypted = segments.writeEncrypted
+    failing = threading.Event()
+    failures = 0
+
+    def flakyWrite(*args, **kwargs):
+        nonlocal failures
+        if failing.is_set() and rng.random() < failRate:
+            failures += 1
+            raise OSError("simulated write failure")
+        return writeEncrypted(*args, **kwargs)
+
+    segments.writeEncrypted = flakyWrite
+    try:
+        for run in range(runs):
+            folder = tempfile.mkdtemp()
+            try:
+                store = SegmentedStore(folder, keys)
+                reference = TinyDBStore(freshTable({}))
+                lock = threading.Lock()
+                autosaver = Autosaver(Journal(os.path.join(folder, "journal"), keys.key(store.params)), store.capture,
+                                      lock, delay=0.001)
+                failing.set()
+                for _ in range(steps):
+                    edit = randomEdit(rng, reference.readAll())
+                    applyNew(reference, edit)
+                    with lock:  # As Inventory.sync() does
+                        edit = [storeMethods[edit[0]]] + list(edit[1:])
+                        getattr(store, edit[0])(*edit[1:])
+                        autosaver.edit(edit)
+                    if rng.random() < 0.2:
+                        autosaver.flush()
+                        time.sleep(0.002)  # Let a snapshot start
+                lastFails = run % 2 == 0
+                if not lastFails:
+                    failing.clear()
+                autosaver.close()
+                failing.clear()
+                autosaver.journal.close()
+                assert reopen(folder, keys).readAll() == reference.readAll(), f"run {run} lost edits"
+                if not lastFails:
+                    named = {f"{segment:06x}.seg" for segment in reopen(folder, keys).segments.values()}
+                    onDisk = {name for name in os.listdir(folder) if name.endswith(".seg")}
+                    assert onDisk == named, f"run {run} left orphaned segments {sorted(onDisk - named)}"
+            finally:
+                shutil.rmtree(folder)
+    finally:
+        segments.writeEncrypted = writeEncrypted
+    print(f"{runs} autosaved edit sequences of {steps} steps survive {failures} failed writes")
+
+
+def timeEdits():
+    print(f"{'items':>9} {'writeData ms':>13} {'addItem ms':>11}")
+    for drawerCount, itemsPerDrawer in [(10, 100), (100, 100), (300, 100)]:
+        data = makeCloset(drawerCount, itemsPerDrawer)
+        table = freshTable(data)
+        start = time.perf_counter()
+        for _ in range(5):
+            oldWriteData(table, readTable(table))
+        oldTime = (time.perf_counter() - start) / 5
+
+        store = TinyDBStore(freshTable(data))
+        start = time.perf_counter()
+        for number in range(200):
+            store.addItem("Drawer 0", f"bench part {number}", 1)
+        newTime = (time.perf_counter() - start) / 200
+        print(f"{drawerCount * itemsPerDrawer:>9} {oldTime * 1e3:>13.3f} {newTime * 1e3:>11.3f}")
+
+
+if __name__ == "__main__":
+    checkEquivalence()
+    checkFailedWrites()
+    timeEdits()
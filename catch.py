@@ -1,17 +1,10 @@
-import pygame
+import argparse
+import functools
+import os
 import random
+import time
 
-# Initialize pygame
-pygame.init()
-
-# Set the width and height of the screen (width, height)
-screen = pygame.display.set_mode((800, 600))
-
-# Set the title of the window
-pygame.display.set_caption("Catch Game")
-
-# Set the clock
-clock = pygame.time.Clock()
+import pygame
 
 # Colors
 white = (255, 255, 255)
@@ -20,141 +13,398 @@ red = (255, 0, 0)
 green = (0, 255, 0)
 blue = (0, 0, 255)
 
-# Load the player's image
-playerImage = pygame.image.load("images/stormont.png")
-objImage = pygame.image.load("images/kraken.png")
-rain = pygame.image.load("images/obs.png")
+# The simulation runs stepRate fixed steps a second, and speeds are in pixels
+# per step. A frame runs as many steps as the time since the last one calls
+# for, so the game runs at the same speed whatever the frame rate, down to
+# stepRate / maxStepsPerFrame frames a second. Below that, the time past the
+# cap is dropped rather than caught up later, so one slow frame cannot make
+# every frame after it slower still.
+stepRate = 60
+stepTime = 1 / stepRate
+maxStepsPerFrame = 5
+frameRate = 60
+
+# Up to this many sprites, they are drawn between their last two positions and
+# only the parts of the screen they leave or move to are redrawn and sent to the
+# display. Past it, clearing them one blit at a time costs more than redrawing
+# the whole screen, so that is done instead, with sprites where the last step
+# left them.
+dirtyRectLimit = 50
+
+# Falling sprites are found with a grid of cells a sprite wide and taller than
+# their fall from above the screen to below it, starting where they spawn.
+# They only fall, so one keeps its cell until it respawns and the grid needs
+# no upkeep between respawns.
+gridCellSize = (25, 800)
+gridOrigin = (0, -100)
+
+# Arrow keys, by the names --script uses
+moveKeys = {'left': pygame.K_LEFT, 'right': pygame.K_RIGHT, 'up': pygame.K_UP, 'down': pygame.K_DOWN}
+
+# Phases of a headless frame, in the order they run
+headlessPhases = ('events', 'move', 'collide', 'render')
+
+
+def parseScript(text):
+    """
+    Read a --script of moves, like "left:30,right+up:20,none:10".
 
-# Load sounds
-pygame.mixer.music.load("sounds/driftveilCity.mp3")
-pygame.mixer.music.play(-1)  # Play music in a loop
-# catch_sound = pygame.mixer.Sound("sounds/catch.wav")
-hitSound = pygame.mixer.Sound("sounds/jump.mp3")
-gameOver = pygame.mixer.Sound("sounds/gameOver.mp3")
+    Args:
+        text (str): Comma-separated keys:steps moves. Keys are arrow key
+            names joined by +, or none.
 
+    Returns:
+        list: (pressed keys, steps) tuples; the pressed keys map every arrow key to whether it is held.
 
-class Player(pygame.sprite.Sprite):
+    Raises:
+        argparse.ArgumentTypeError: If a move cannot be read.
     """
-    A class representing the player.
+    moves = []
+    for move in text.split(','):
+        names, _, steps = move.strip().partition(':')
+        held = set() if names == 'none' else set(names.split('+'))
+        if not held <= moveKeys.keys() or not steps.isdigit() or int(steps) < 1:
+            raise argparse.ArgumentTypeError(f"expected keys:steps like left+up:20, got '{move}'")
+        moves.append(({key: name in held for name, key in moveKeys.items()}, int(steps)))
+    return moves
+
+
+def parseArgs(argv=None):
+    """
+    Args:
+        argv (list): The command line arguments, sys.argv by default.
+
+    Returns:
+        argparse.Namespace: The options.
+    """
+    parser = argparse.ArgumentParser(description="Catch the krakens and avoid the acid rain.")
+    parser.add_argument('--stress', type=int, metavar='COUNT',
+                        help="drop COUNT krakens and COUNT raindrops, never end the game and report the frame rate")
+    parser.add_argument('--headless', type=int, metavar='FRAMES',
+                        help="simulate FRAMES frames with no window, sound or keyboard, as fast as possible, "
+                             "and report the frame rate and where the time went")
+    parser.add_argument('--seed', type=int,
+                        help="seed the random numbers so a run can be repeated; --headless uses 0 by default")
+    parser.add_argument('--script', type=parseScript, metavar='MOVES',
+                        help="with --headless, repeat moves like left:30,right+up:20,none:10 "
+                             "instead of moving at random")
+    return parser.parse_args(argv)
+
+
+def loadSprite(path, size):
+    """
+    Load an image once, converted to the screen's pixel format and scaled to
+    its sprite size, so every sprite shares it and blits need no conversion.
+
+    Args:
+        path (str): The image file.
+        size (tuple): The sprite's (width, height).
+
+    Returns:
+        pygame.Surface: The sprite image.
+    """
+    return pygame.transform.scale(pygame.image.load(path).convert_alpha(), size)
+
+
+def loadAssets():
+    """
+    Load the sprite images and sounds, and start the music.
+    """
+    global playerImage, hitSound, gameOver
+    # Load the sprite images
+    playerImage = loadSprite("images/stormont.png", (50, 50))
+    Object.image = loadSprite("images/kraken.png", (25, 25))
+    Obstacle.image = loadSprite("images/obs.png", (25, 25))
+
+    # Load sounds
+    pygame.mixer.music.load("sounds/driftveilCity.mp3")
+    pygame.mixer.music.play(-1)  # Play music in a loop
+    # catch_sound = pygame.mixer.Sound("sounds/catch.wav")
+    hitSound = pygame.mixer.Sound("sounds/jump.mp3")
+    gameOver = pygame.mixer.Sound("sounds/gameOver.mp3")
+
+
+class SpatialHash:
+    """
+    A uniform grid of cells for finding the sprites that overlap a rectangle
+    without testing every sprite. Each sprite is filed under the cell holding
+    its hitbox's top left corner, so it must be no bigger than a cell, and a
+    query also looks one cell further left and up for sprites reaching in
+    from there.
 
     Attributes:
-        image (pygame.Surface): The image of the player.
-        rect (pygame.Rect): The rectangle defining the player's position and dimensions.
-        speed (int): The speed at which the player moves.
+        cellSize (tuple): The (width, height) of a cell.
+        origin (tuple): The (x, y) of the top left corner of cell (0, 0).
+        cells (dict): (column, row) -> ([sprites], [their hitboxes]).
+        keys (dict): Sprite -> the cell it is filed under.
     """
-    def __init__(self):
+    def __init__(self, cellSize, origin=(0, 0)):
+        self.cellSize = cellSize
+        self.origin = origin
+        self.cells = {}
+        self.keys = {}
+
+    def key(self, x, y):
+        return ((x - self.origin[0]) // self.cellSize[0], (y - self.origin[1]) // self.cellSize[1])
+
+    def move(self, sprite):
+        """
+        File a sprite under the cell its hitbox is in now. Call it whenever
+        a sprite may have moved to another cell.
+
+        Args:
+            sprite (MovingSprite): The sprite.
+        """
+        key = self.key(*sprite.hitbox.topleft)
+        old = self.keys.get(sprite)
+        if key == old:
+            return
+        if old is not None:
+            sprites, hitboxes = self.cells[old]
+            position = sprites.index(sprite)
+            del sprites[position]
+            del hitboxes[position]
+        sprites, hitboxes = self.cells.setdefault(key, ([], []))
+        sprites.append(sprite)
+        # Hitboxes are moved in place, so this list stays in step with the sprites
+        hitboxes.append(sprite.hitbox)
+        self.keys[sprite] = key
+
+    def query(self, rect):
+        """
+        Args:
+            rect (pygame.Rect): The area to search.
+
+        Returns:
+            list: The sprites whose hitboxes overlap the rectangle.
+        """
+        left, top = self.key(rect.left, rect.top)
+        right, bottom = self.key(rect.right - 1, rect.bottom - 1)
+        found = []
+        for column in range(left - 1, right + 1):
+            for row in range(top - 1, bottom + 1):
+                cell = self.cells.get((column, row))
+                if cell:
+                    sprites = cell[0]
+                    found.extend(sprites[position] for position in rect.collidelistall(cell[1]))
+        return found
+
+
+class MovingSprite(pygame.sprite.Sprite):
+    """
+    A sprite moved by the fixed-step simulation and drawn between its last two
+    positions, so motion stays smooth whether frames are drawn faster or
+    slower than steps are run.
+
+    Attributes:
+        image (pygame.Surface): The image of the sprite.
+        hitbox (pygame.Rect): Where the simulation has the sprite, used for collisions.
+        previous (tuple): The hitbox's top left corner before the last step.
+        rect (pygame.Rect): Where the sprite was last drawn.
+        grid (SpatialHash): The grid the sprite is filed in, if any.
+        interpolated (bool): Whether sprites are drawn between steps. Set for
+            every sprite before any is made.
+    """
+    grid = None
+    interpolated = True
+
+    def __init__(self, x, y):
         super().__init__()
+        self.rect = self.image.get_rect(topleft=(x, y))
+        # Drawn where the simulation has it, the sprite can use one Rect for both
+        self.hitbox = self.rect.copy() if self.interpolated else self.rect
+        self.previous = self.hitbox.topleft
+
+    def place(self, x, y):
+        """
+        Put the sprite somewhere without drawing it moving there.
+        """
+        self.hitbox.topleft = (x, y)
+        self.previous = self.hitbox.topleft
+        if self.grid is not None:
+            self.grid.move(self)
+
+    def interpolate(self, alpha):
+        """
+        Move the drawn sprite between its last two positions.
+
+        Args:
+            alpha (float): How far through the next step the game is, from 0 to 1.
+        """
+        x, y = self.previous
+        hitbox = self.hitbox
+        self.rect.topleft = (round(x + (hitbox.x - x) * alpha), round(y + (hitbox.y - y) * alpha))
+
+
+class Player(MovingSprite):
+    """
+    A class representing the player.
+
+    Attributes:
+        speed (int): The distance the player moves in a step.
+        controls (callable): Returns which arrow keys are held, the keyboard by default.
+    """
+    def __init__(self, controls=pygame.key.get_pressed):
         self.image = playerImage
-        self.image = pygame.transform.scale(self.image, (50, 50))
-        self.rect = self.image.get_rect()
-        self.rect.x = 375
-        self.rect.y = 500
+        super().__init__(375, 500)
         self.speed = 5
+        self.controls = controls
 
     def update(self):
         """
         Update the player's position based on key presses and ensure the player stays within screen boundaries.
         """
-        keys = pygame.key.get_pressed()
+        self.previous = self.hitbox.topleft
+        keys = self.controls()
         if keys[pygame.K_LEFT]:
-            self.rect.x -= self.speed
+            self.hitbox.x -= self.speed
         if keys[pygame.K_RIGHT]:
-            self.rect.x += self.speed
+            self.hitbox.x += self.speed
         if keys[pygame.K_UP]:
-            self.rect.y -= self.speed
+            self.hitbox.y -= self.speed
         if keys[pygame.K_DOWN]:
-            self.rect.y += self.speed
+            self.hitbox.y += self.speed
 
-        if self.rect.left < 0:
-            self.rect.left = 0
-        if self.rect.right > 800:
-            self.rect.right = 800
-        if self.rect.top < 0:
-            self.rect.top = 0
-        if self.rect.bottom > 600:
-            self.rect.bottom = 600
+        if self.hitbox.left < 0:
+            self.hitbox.left = 0
+        if self.hitbox.right > 800:
+            self.hitbox.right = 800
+        if self.hitbox.top < 0:
+            self.hitbox.top = 0
+        if self.hitbox.bottom > 600:
+            self.hitbox.bottom = 600
 
 
-class Object(pygame.sprite.Sprite):
+class RandomInput:
     """
-    A class representing objects that the player should catch.
+    Controls for a headless player that holds a random direction, or none,
+    for a random number of steps.
 
     Attributes:
-        image (pygame.Surface): The image of the object.
-        rect (pygame.Rect): The rectangle defining the object's position and dimensions.
-        speed (int): The speed at which the object moves downwards.
+        rng (random.Random): Where the moves come from.
+        keys (dict): Arrow key -> whether it is held.
+        steps (int): Steps left before the next move.
     """
-    def __init__(self):
-        super().__init__()
-        self.image = objImage
-        self.image = pygame.transform.scale(self.image, (25, 25))
-        self.rect = self.image.get_rect()
-        self.rect.x = random.randrange(0, 750)
-        self.rect.y = random.randrange(-100, -40)
-        self.speed = random.randint(2, 8)
+    def __init__(self, rng):
+        self.rng = rng
+        self.steps = 0
 
-    def update(self):
-        """
-        Update the position of the object, moving it down the screen and resetting it if it goes off the screen.
-        """
-        self.rect.y += self.speed
-        if self.rect.top > 600:
-            self.rect.x = random.randrange(0, 750)
-            self.rect.y = random.randrange(-100, -40)
-            self.speed = random.randint(2, 8)
+    def __call__(self):
+        if not self.steps:
+            held = self.rng.choice([(), ('left',), ('right',), ('up',), ('down',), ('left', 'up'), ('right', 'up')])
+            self.keys = {key: name in held for name, key in moveKeys.items()}
+            self.steps = self.rng.randint(5, 60)
+        self.steps -= 1
+        return self.keys
 
 
-class Obstacle(pygame.sprite.Sprite):
+class ScriptedInput:
     """
-    A class representing obstacles that the player should avoid.
+    Controls for a headless player that repeats the moves of a --script.
 
     Attributes:
-        image (pygame.Surface): The image of the obstacle.
-        rect (pygame.Rect): The rectangle defining the obstacle's position and dimensions.
-        speed (int): The speed at which the obstacle moves downwards.
+        moves (list): (pressed keys, steps) tuples, as parseScript() returns.
+        position (int): The move being made.
+        steps (int): Steps left in it.
     """
-    def __init__(self):
-        super().__init__()
-        self.image = rain
-        self.image = pygame.transform.scale(self.image, (25, 25))
-        self.rect = self.image.get_rect()
-        self.rect.x = random.randrange(0, 750)
-        self.rect.y = random.randrange(-100, -40)
+    def __init__(self, moves):
+        self.moves = moves
+        self.position = 0
+        self.steps = moves[0][1]
+
+    def __call__(self):
+        if not self.steps:
+            self.position = (self.position + 1) % len(self.moves)
+            self.steps = self.moves[self.position][1]
+        self.steps -= 1
+        return self.moves[self.position][0]
+
+
+class FallingSprite(MovingSprite):
+    """
+    A sprite that falls down the screen. When it leaves the screen, is caught
+    or hits the player it is sent back above the top instead of being
+    replaced, so sprites are recycled rather than built again.
+
+    Attributes:
+        image (pygame.Surface): The sprite's image, shared by its whole class.
+        speed (int): The distance the sprite falls in a step.
+    """
+    image = None
+
+    def __init__(self, grid=None):
+        super().__init__(0, 0)
+        self.grid = grid
+        self.respawn()
+
+    def respawn(self):
+        """
+        Move the sprite to a random place above the screen with a new speed.
+        """
+        self.place(random.randrange(0, 750), random.randrange(-100, -40))
         self.speed = random.randint(2, 8)
 
     def update(self):
         """
-        Update the position of the obstacle, moving it down the screen and resetting it if it goes off the screen.
+        Move the sprite down the screen, respawning it once it has gone off the bottom.
         """
-        self.rect.y += self.speed
-        if self.rect.top > 600:
-            self.rect.x = random.randrange(0, 750)
-            self.rect.y = random.randrange(-100, -40)
-            self.speed = random.randint(2, 8)
+        hitbox = self.hitbox
+        self.previous = hitbox.topleft
+        hitbox.y += self.speed
+        if hitbox.top > 600:
+            self.respawn()
+
+
+class Object(FallingSprite):
+    """
+    An object that the player should catch.
+    """
+
+
+class Obstacle(FallingSprite):
+    """
+    An obstacle that the player should avoid.
+    """
 
 
 # Function to initialize the game
 def initGame():
-    global allSprites, objects, obstacles, player, score, hitCounter
-    allSprites = pygame.sprite.Group()
-    objects = pygame.sprite.Group()
-    obstacles = pygame.sprite.Group()
-    player = Player()
+    global allSprites, objectGrid, obstacleGrid, movers, player, scoreText, highScoreText, hitsText, fpsText
+    global score, hitCounter
+    allSprites = pygame.sprite.RenderUpdates() if dirtyRects else pygame.sprite.Group()
+    objectGrid = SpatialHash(gridCellSize, gridOrigin)
+    obstacleGrid = SpatialHash(gridCellSize, gridOrigin)
+    movers = pygame.sprite.Group()
+    player = Player(controls)
     allSprites.add(player)
+    movers.add(player)
 
-    for i in range(10):
-        obj = Object()
+    for i in range(fallingCount):
+        obj = Object(objectGrid)
         allSprites.add(obj)
-        objects.add(obj)
+        movers.add(obj)
 
-    for i in range(10):
-        obs = Obstacle()
+    for i in range(fallingCount):
+        obs = Obstacle(obstacleGrid)
         allSprites.add(obs)
-        obstacles.add(obs)
+        movers.add(obs)
+
+    # Added last, so drawn in front of the sprites
+    scoreText = TextSprite(18, 50, 10)
+    highScoreText = TextSprite(18, 50, 30)
+    hitsText = TextSprite(18, 50, 50)
+    fpsText = TextSprite(18, 750, 10)
+    allSprites.add(scoreText, highScoreText, hitsText)
+    if args.stress:
+        allSprites.add(fpsText)
 
     score = 0
     hitCounter = 0
 
+    # Only changed parts of the screen are updated from here on, so start from a clean one
+    screen.blit(background, (0, 0))
+    pygame.display.flip()
+
 
 def saveHighScore(highScore):
     """
@@ -180,10 +430,42 @@ def loadHighScore():
         return 0
 
 
-fontName = pygame.font.match_font("arial")
+# Rendered strings kept for drawText; the HUD and menus only use a few dozen
+textCacheSize = 64
 
 
-def drawText(surf, text, size, x, y):
+@functools.lru_cache(maxsize=None)
+def getFont(size):
+    """
+    Open the game font once per size instead of on every draw.
+
+    Args:
+        size (int): The font size.
+
+    Returns:
+        pygame.font.Font: The font.
+    """
+    return pygame.font.Font(pygame.font.match_font("arial"), size)
+
+
+@functools.lru_cache(maxsize=textCacheSize)
+def renderText(text, size, color):
+    """
+    Render a string, reusing the surface while the same text is drawn again,
+    so the HUD is only re-rendered when the score, hits or high score change.
+
+    Args:
+        text (str): The text to render.
+        size (int): The font size.
+        color (tuple): The RGB text color.
+
+    Returns:
+        pygame.Surface: The rendered text, shared between calls, so it must not be drawn on.
+    """
+    return getFont(size).render(text, True, color)
+
+
+def drawText(surf, text, size, x, y, color=black):
     """
     Draw text on the screen at a specified position.
 
@@ -193,14 +475,37 @@ def drawText(surf, text, size, x, y):
         size (int): The font size of the text.
         x (int): The x-coordinate of the text position.
         y (int): The y-coordinate of the text position.
+        color (tuple): The RGB text color.
     """
-    font = pygame.font.Font(fontName, size)
-    textSurface = font.render(text, True, black)
+    textSurface = renderText(text, size, color)
     textRect = textSurface.get_rect()
     textRect.midtop = (x, y)
     surf.blit(textSurface, textRect)
 
 
+class TextSprite(pygame.sprite.Sprite):
+    """
+    A line of HUD text, rendered again only when the text changes.
+
+    Attributes:
+        text (str): The text shown.
+        size (int): The font size.
+        position (tuple): The (x, y) of the text's top middle.
+    """
+    def __init__(self, size, x, y):
+        super().__init__()
+        self.size = size
+        self.position = (x, y)
+        self.text = None
+        self.setText("")
+
+    def setText(self, text):
+        if text != self.text:
+            self.text = text
+            self.image = renderText(text, self.size, black)
+            self.rect = self.image.get_rect(midtop=self.position)
+
+
 def showHowToPlayScreen():
     """
     Display the "How to Play" screen with game instructions.
@@ -240,6 +545,7 @@ def showGameOverScreen():
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r:
                     initGame()
+                    clock.tick()  # Time spent on this screen is not game time
                     waiting = False
                 if event.key == pygame.K_q:
                     running = False
@@ -247,62 +553,218 @@ def showGameOverScreen():
                     exit()
 
 
-# Load the high score at the start
-highScore = loadHighScore()
-
-# Show the "How to Play" screen
-showHowToPlayScreen()
-
-# Initialize the game
-initGame()
-
-# Game loop
-running = True
-while running:
-    # Set the frame rate
-    clock.tick(60)
-
-    # Process events
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-    # Update all sprites
-    allSprites.update()
-
-    # Check for collisions between the player and objects
-    hits = pygame.sprite.spritecollide(player, objects, True)
+def checkCollisions():
+    """
+    Count and recycle what the player caught or was hit by.
+    """
+    global score, highScore, hitCounter
+    # Check for collisions between the player and objects, recycling what was caught or hit
+    hits = objectGrid.query(player.hitbox)
     for hit in hits:
         score += 1
         if score > highScore:
             highScore = score
-            saveHighScore(highScore)
-        obj = Object()
-        allSprites.add(obj)
-        objects.add(obj)
+            if not args.headless:
+                saveHighScore(highScore)
+        hit.respawn()
 
-    obsHits = pygame.sprite.spritecollide(player, obstacles, True)
+    obsHits = obstacleGrid.query(player.hitbox)
     for hit in obsHits:
         hitCounter += 1
-        hitSound.play()
-        if hitCounter == 3:
+        if not args.headless:
+            hitSound.play()
+        if hitCounter == 3 and not args.stress and not args.headless:
             showGameOverScreen()
-        obs = Obstacle()
-        allSprites.add(obs)
-        obstacles.add(obs)
+        hit.respawn()
 
     # Update the high score if necessary
     if score > highScore:
         highScore = score
-        saveHighScore(highScore)
+        if not args.headless:
+            saveHighScore(highScore)
 
-    # Draw everything on the screen
-    screen.fill(white)
-    allSprites.draw(screen)
-    drawText(screen, f"Score: {score}", 18, 50, 10)
-    drawText(screen, f"High Score: {highScore}", 18, 50, 30)
-    drawText(screen, f"Hits: {hitCounter}", 18, 50, 50)
 
-    pygame.display.update()
+def step():
+    """
+    Advance the simulation by one fixed step: move everything, then count
+    and recycle what the player caught or was hit by.
+    """
+    movers.update()
+    checkCollisions()
+
+
+def render(alpha):
+    """
+    Draw the sprites where they are between steps. Only the parts of the
+    screen they left or moved to are updated, unless there are too many.
+
+    Args:
+        alpha (float): How far through the next step the game is, from 0 to 1.
+    """
+    if dirtyRects:
+        for sprite in movers:
+            sprite.interpolate(alpha)
+    scoreText.setText(f"Score: {score}")
+    highScoreText.setText(f"High Score: {highScore}")
+    hitsText.setText(f"Hits: {hitCounter}")
+    if args.stress:
+        fpsText.setText(f"FPS: {clock.get_fps():.0f}")
+    if dirtyRects:
+        allSprites.clear(screen, background)
+        pygame.display.update(allSprites.draw(screen))
+    else:
+        screen.fill(white)  # The background is plain white, and filling it is cheaper than a blit
+        allSprites.draw(screen)
+        pygame.display.update()
+
+
+def runGame():
+    """
+    Run the game loop until the window is closed.
+
+    Returns:
+        list: Milliseconds each frame spent working rather than waiting.
+    """
+    global running
+    running = True
+    lag = 0.0  # Seconds of game time not yet simulated
+    busyTimes = []
+    clock.tick()  # Time spent on the "How to Play" screen is not game time
+    while running:
+        # Set the frame rate
+        lag += clock.tick(frameRate) / 1000
+        busyTimes.append(clock.get_rawtime())
+
+        # Process events
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+        steps = 0
+        while running and lag >= stepTime and steps < maxStepsPerFrame:
+            step()
+            lag -= stepTime
+            steps += 1
+        lag = min(lag, stepTime)  # Time past the cap is dropped
+        render(lag / stepTime)
+    return busyTimes
+
+
+def runHeadless(frames):
+    """
+    Simulate frames back to back, one step each, timing every phase.
+
+    Args:
+        frames (int): The number of frames.
+
+    Returns:
+        dict: Phase name -> the seconds it took in each frame.
+    """
+    times = {phase: [] for phase in headlessPhases}
+    for frame in range(frames):
+        start = time.perf_counter()
+        pygame.event.get()
+        moved = time.perf_counter()
+        movers.update()
+        collided = time.perf_counter()
+        checkCollisions()
+        rendered = time.perf_counter()
+        render(1.0)
+        end = time.perf_counter()
+        for phase, took in zip(headlessPhases, (moved - start, collided - moved, rendered - collided, end - rendered)):
+            times[phase].append(took)
+    return times
+
+
+def reportHeadless(times, seed):
+    """
+    Print the frame rate, each phase's share of the time and the final
+    score, which is the same on every run with the same options.
+
+    Args:
+        times (dict): What runHeadless() returned.
+        seed (int): The seed the run used.
+    """
+    frames = len(times['events'])
+    total = sum(sum(phaseTimes) for phaseTimes in times.values())
+    print(f"{frames} frames with {2 * fallingCount} falling sprites in {total:.2f} s: "
+          f"{frames / total:.0f} frames/sec")
+    for phase in headlessPhases:
+        phaseTimes = sorted(times[phase])
+        print(f"  {phase:<8} {sum(phaseTimes) / frames * 1e3:7.3f} ms/frame mean, "
+              f"{phaseTimes[frames * 99 // 100] * 1e3:7.3f} ms p99, {100 * sum(phaseTimes) / total:5.1f}%")
+    print(f"Score {score}, hits {hitCounter} (seed {seed})")
+
+
+def main(argv=None):
+    """
+    Play the game, or simulate it with --headless.
+
+    Args:
+        argv (list): The command line arguments, sys.argv by default.
+    """
+    global args, screen, clock, background, fallingCount, dirtyRects, controls, highScore
+    args = parseArgs(argv)
+    seed = 0 if args.headless and args.seed is None else args.seed
+    random.seed(seed)
+    if args.headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+        controls = ScriptedInput(args.script) if args.script else RandomInput(random.Random(seed))
+    else:
+        controls = pygame.key.get_pressed
+
+    # Initialize pygame
+    pygame.init()
+
+    # Set the width and height of the screen (width, height)
+    screen = pygame.display.set_mode((800, 600))
+
+    # Set the title of the window
+    pygame.display.set_caption("Catch Game")
+
+    # Set the clock
+    clock = pygame.time.Clock()
+
+    # What is behind the sprites, painted back wherever one has moved away
+    background = pygame.Surface(screen.get_size()).convert()
+    background.fill(white)
+
+    # Falling sprites of each kind on screen at once
+    fallingCount = args.stress or 10
+    dirtyRects = 2 * fallingCount + 1 <= dirtyRectLimit
+    MovingSprite.interpolated = dirtyRects
+
+    loadAssets()
+
+    if args.headless:
+        # A simulation starts from nothing and leaves the saved high score alone
+        highScore = 0
+        initGame()
+        times = runHeadless(args.headless)
+        pygame.quit()
+        reportHeadless(times, seed)
+        return
+
+    # Load the high score at the start
+    highScore = loadHighScore()
+
+    # Show the "How to Play" screen
+    showHowToPlayScreen()
+
+    # Initialize the game
+    initGame()
+
+    busyTimes = runGame()
+
+    pygame.quit()
+
+    if args.stress and busyTimes:
+        busyTimes.sort()
+        print(f"{len(busyTimes)} frames with {2 * fallingCount} falling sprites: "
+              f"{clock.get_fps():.1f} FPS at the end, each frame busy for {busyTimes[len(busyTimes) // 2]} ms "
+              f"(median) and {busyTimes[len(busyTimes) * 99 // 100]} ms (99th percentile) of the {1000 / 60:.1f} ms it has")
+
 
-pygame.quit()
+if __name__ == "__main__":
+    main()
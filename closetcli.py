@@ -0,0 +1,425 @@
+"""
+Bulk import, export, adjust and search a user's inventory without the GUI.
+
+Rows are drawer,name,quantity (adjust takes drawer,name,delta), as CSV with a
+header line or as JSON lines with those keys. Input files are read twice:
+first every row is checked, then, only if all of them are valid, the rows are
+applied and the inventory is saved once at the end.
+
+Usage:
+    python closetcli.py --user NAME import FILE [--format csv|jsonl]
+    python closetcli.py --user NAME adjust FILE [--format csv|jsonl]
+    python closetcli.py --user NAME export [--format csv|jsonl] [--output FILE]
+    python closetcli.py --user NAME query TEXT [--format csv|jsonl]
+    python closetcli.py --user NAME summary
+    python closetcli.py --user NAME threshold ITEM VALUE
+    python closetcli.py --user NAME columns FILE.npz
+    python closetcli.py --user NAME report [--by name|drawer|item] [--top N] [--histogram BINS] [--input FILE.npz]
+    python closetcli.py --user NAME diff OLD.npz [NEW.npz]
+    python closetcli.py --user NAME migrate --to FORMAT [--from FORMAT]
+
+The password is read from the CLOSETMAN_PASSWORD environment variable, or
+asked for. FILE may be - to read standard input. --stats FILE (before the
+command) writes how long the loads, saves and encryption took to a JSON file.
+
+columns, report and diff work on NumPy columns and need NumPy installed.
+Columnar files, like export's output, are not encrypted. report --input and
+diff with two files only read those files, so no password is asked for.
+"""
+import argparse
+import csv
+import getpass
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import closetcore
+import stats
+from closetclient import openCloset
+from datalock import DataInUseError
+
+# Queued edits are written to the store every this many rows, so a large
+# import never holds all of them in memory at once
+syncEvery = 10000
+
+# Validation stops after this many bad rows
+maxErrors = 20
+
+
+def readRows(path, fileFormat, valueField):
+    """
+    Stream the rows of an input file.
+
+    Args:
+        path (str): The file to read.
+        fileFormat (str): 'csv' or 'jsonl'.
+        valueField (str): 'quantity' or 'delta'.
+
+    Yields:
+        Tuple[int, dict]: The line number and the row, or None and an error
+            message in place of the row if the line could not be parsed.
+    """
+    fields = ('drawer', 'name', valueField)
+    with open(path, newline='', encoding='utf-8') as file:
+        if fileFormat == 'csv':
+            reader = csv.DictReader(file)
+            missing = [field for field in fields if field not in (reader.fieldnames or [])]
+            if missing:
+                yield 1, None, f"header is missing {', '.join(missing)}"
+                return
+            for row in reader:
+                yield reader.line_num, row, None
+        else:
+            for lineNumber, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield lineNumber, None, f"invalid JSON: {e}"
+                    continue
+                if not isinstance(row, dict):
+                    yield lineNumber, None, "expected an object"
+                    continue
+                yield lineNumber, row, None
+
+
+def parseRow(row, valueField):
+    """
+    Check one row and convert its value to an int.
+
+    Args:
+        row (dict): The row as read.
+        valueField (str): 'quantity' or 'delta'.
+
+    Returns:
+        Tuple[str, str, int]: The drawer, item name and value.
+
+    Raises:
+        ValueError: If a field is missing or the value is not a whole number.
+    """
+    drawer = row.get('drawer')
+    name = row.get('name')
+    value = row.get(valueField)
+    if not isinstance(drawer, str) or not drawer:
+        raise ValueError("drawer is missing")
+    if not isinstance(name, str) or not name:
+        raise ValueError("name is missing")
+    if isinstance(value, str):
+        text = value.strip()
+        if valueField == 'delta' and text[:1] in '+-':
+            text = text[1:]
+        if not text.isdigit():
+            raise ValueError(f"{valueField} must be a whole number, got '{value}'")
+        value = int(value)
+    elif isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{valueField} must be a whole number, got {value!r}")
+    if valueField == 'quantity' and value < 0:
+        raise ValueError(f"quantity must not be negative, got {value}")
+    return drawer, name, value
+
+
+def validate(path, fileFormat, valueField, check=None):
+    """
+    Check every row of an input file without changing anything.
+
+    Args:
+        path (str): The file to read.
+        fileFormat (str): 'csv' or 'jsonl'.
+        valueField (str): 'quantity' or 'delta'.
+        check (callable): Called with each parsed row; raises ValueError for
+            rows that are well formed but cannot be applied.
+
+    Returns:
+        Tuple[int, list]: The number of rows read and "line N: message" errors.
+    """
+    count = 0
+    errors = []
+    for lineNumber, row, error in readRows(path, fileFormat, valueField):
+        count += 1
+        try:
+            if error:
+                raise ValueError(error)
+            parsed = parseRow(row, valueField)
+            if check:
+                check(*parsed)
+        except ValueError as e:
+            errors.append(f"line {lineNumber}: {e}")
+            if len(errors) >= maxErrors:
+                errors.append("too many errors, stopping")
+                break
+    return count, errors
+
+
+def applyRows(closet, path, fileFormat, valueField, apply):
+    """
+    Apply every row of an already validated input file.
+
+    Args:
+        closet (Closet): The open inventory.
+        path (str): The file to read.
+        fileFormat (str): 'csv' or 'jsonl'.
+        valueField (str): 'quantity' or 'delta'.
+        apply (callable): Called with each parsed row.
+    """
+    for count, (_, row, _) in enumerate(readRows(path, fileFormat, valueField), 1):
+        apply(*parseRow(row, valueField))
+        if count % syncEvery == 0:
+            closet.inventory.sync()
+
+
+def importRows(closet, path, fileFormat):
+    """
+    Append every row's item to its drawer, creating drawers as needed.
+    """
+    inventory = closet.inventory
+    count, errors = validate(path, fileFormat, 'quantity')
+    if errors:
+        return count, errors
+
+    def apply(drawer, name, quantity):
+        if drawer in inventory:
+            inventory.addItem(drawer, name, quantity)
+        else:
+            inventory.newDrawer(drawer, [{'name': name, 'quantity': quantity}])
+    applyRows(closet, path, fileFormat, 'quantity', apply)
+    return count, errors
+
+
+def adjustRows(closet, path, fileFormat):
+    """
+    Add every row's delta to the quantity of an existing item. Rows are
+    checked in order, so a file that would take a quantity below zero part way
+    through is rejected as a whole.
+    """
+    inventory = closet.inventory
+    quantities = {}
+
+    def current(drawer, name):
+        if (drawer, name) not in quantities:
+            if drawer not in inventory:
+                raise ValueError(f"drawer '{drawer}' not found")
+            for item in inventory.items(drawer):
+                if item['name'] == name:
+                    quantities[drawer, name] = item['quantity']
+                    break
+            else:
+                raise ValueError(f"item '{name}' not found in drawer '{drawer}'")
+        return quantities[drawer, name]
+
+    def check(drawer, name, delta):
+        quantity = current(drawer, name) + delta
+        if quantity < 0:
+            raise ValueError(f"'{name}' in drawer '{drawer}' would drop to {quantity}")
+        quantities[drawer, name] = quantity
+
+    count, errors = validate(path, fileFormat, 'delta', check)
+    if errors:
+        return count, errors
+    quantities.clear()  # Applying starts from the real quantities again
+
+    def apply(drawer, name, delta):
+        inventory.setQuantity(drawer, name, current(drawer, name) + delta)
+        quantities[drawer, name] += delta
+    applyRows(closet, path, fileFormat, 'delta', apply)
+    return count, errors
+
+
+def writeRows(rows, output, fileFormat, fields=('drawer', 'name', 'quantity')):
+    """
+    Write rows as they are produced.
+
+    Args:
+        rows (iterable): The rows to write, one value per field.
+        output (file): The file to write to.
+        fileFormat (str): 'csv' or 'jsonl'.
+        fields (tuple): The field names.
+
+    Returns:
+        int: The number of rows written.
+    """
+    count = 0
+    writer = csv.writer(output) if fileFormat == 'csv' else None
+    if writer:
+        writer.writerow(fields)
+    for row in rows:
+        if writer:
+            writer.writerow(row)
+        else:
+            output.write(json.dumps(dict(zip(fields, row))) + "\n")
+        count += 1
+    return count
+
+
+def exportRows(inventory):
+    """
+    Yield every item, one drawer at a time.
+    """
+    for drawer in list(inventory.drawerNames()):
+        for item in inventory.items(drawer):
+            yield drawer, item['name'], item['quantity']
+
+
+def analyse(args, closet):
+    """
+    Run the columns, report and diff commands on a columnar copy of the
+    inventory.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+        closet (Closet or RemoteCloset): The open inventory, None when the
+            command only reads columnar files.
+    """
+    import analytics  # NumPy is only needed by these commands
+    current = analytics.ColumnarInventory.fromInventory(closet.inventory) if closet else None
+    if args.command == 'columns':
+        current.save(args.output)
+        print(f"{len(current)} item(s) written to {args.output}.", file=sys.stderr)
+    elif args.command == 'report':
+        columns = analytics.ColumnarInventory.load(args.input) if args.input else current
+        if args.histogram:
+            writeRows(columns.histogram(args.histogram, args.by), sys.stdout, args.format, ('from', 'to', 'count'))
+        else:
+            writeRows(columns.top(args.by, args.top), sys.stdout, args.format, (args.by, 'total'))
+    else:
+        new = analytics.ColumnarInventory.load(args.new) if args.new else current
+        writeRows(analytics.diff(analytics.ColumnarInventory.load(args.old), new), sys.stdout, args.format,
+                  ('drawer', 'name', 'before', 'after'))
+
+
+def spoolStdin():
+    """
+    Copy standard input to a temporary file, since input is read twice.
+
+    Returns:
+        str: The temporary file's path.
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.closetcli', delete=False, encoding='utf-8', newline='') as file:
+        shutil.copyfileobj(sys.stdin, file)
+    return file.name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import, export, adjust and search a Closetman inventory.")
+    parser.add_argument('--user', required=True, help="the username whose data to open")
+    parser.add_argument('--stats', metavar='FILE', help="time the storage and encryption calls and write the results here")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command, helpText in [('import', "append drawer,name,quantity rows"),
+                              ('adjust', "add drawer,name,delta rows to existing items")]:
+        subparser = commands.add_parser(command, help=helpText)
+        subparser.add_argument('file', help="the input file, or - for standard input")
+        subparser.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+    subparser = commands.add_parser('export', help="write every item as drawer,name,quantity rows")
+    subparser.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+    subparser.add_argument('--output', help="the file to write, standard output by default")
+    subparser = commands.add_parser('query', help="search for items by name, suggesting close names when none match")
+    subparser.add_argument('text', help="the text to search for")
+    subparser.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+    commands.add_parser('summary', help="print the closet's totals and the items low on stock")
+    subparser = commands.add_parser('threshold', help="set an item's low-stock threshold, 0 to clear it")
+    subparser.add_argument('item', help="the item name")
+    subparser.add_argument('value', type=int, help="alert when the item's total drops below this")
+    subparser = commands.add_parser('columns', help="write every item to a compact columnar file for analysis")
+    subparser.add_argument('output', help="the .npz file to write")
+    subparser = commands.add_parser('report', help="print totals by item name or drawer, the largest or a histogram")
+    subparser.add_argument('--by', choices=('name', 'drawer', 'item'), default='name',
+                           help="what to total; item is each item's own quantity, for --histogram")
+    subparser.add_argument('--top', type=int, metavar='N', help="only the N largest totals")
+    subparser.add_argument('--histogram', type=int, metavar='BINS', help="count the totals into BINS bins instead")
+    subparser.add_argument('--input', help="a file written by columns, instead of the inventory")
+    subparser.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+    subparser = commands.add_parser('diff', help="list the items that changed between two columnar files")
+    subparser.add_argument('old', help="a file written by columns")
+    subparser.add_argument('new', nargs='?', help="a later file, the inventory as it is now by default")
+    subparser.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+    subparser = commands.add_parser('migrate', help="move the data to another storage format")
+    subparser.add_argument('--to', dest='target', choices=closetcore.storageFormats, required=True)
+    subparser.add_argument('--from', dest='source', choices=closetcore.storageFormats,
+                           default=closetcore.storageFormat, help="the format to read, storageFormat by default")
+    args = parser.parse_args(argv)
+    if args.stats:
+        stats.enabled = True
+    if args.command == 'report' and args.by == 'item' and not args.histogram:
+        parser.error("--by item needs --histogram")
+    if (args.command == 'report' and args.input) or (args.command == 'diff' and args.new):
+        analyse(args, None)  # Only columnar files are read, so no password is needed
+        return
+
+    password = os.environ.get('CLOSETMAN_PASSWORD')
+    if password is None:
+        password = getpass.getpass("Password: ")
+    if args.command == 'migrate':
+        if args.source == args.target:
+            parser.error("--from and --to are the same format")
+        try:
+            count = closetcore.migrateStorage(args.user, password, args.source, args.target)
+        except FileExistsError as e:
+            sys.exit(f"{e}, nothing was changed.")
+        except DataInUseError:
+            sys.exit("The data is open in another program, close it first.")
+        except Exception as e:
+            sys.exit(f"Invalid password or data corrupted! {e}")
+        print(f"{count} drawer(s) moved to {args.target}. Set storageFormat = \"{args.target}\" in closetcore.py "
+              f"to use it.", file=sys.stderr)
+        return
+    try:
+        # Without autosave nothing is written until the single save at the end;
+        # through closetserver.py each edit is saved by the server as it is made
+        closet = openCloset(args.user, password, autosave=False)
+    except DataInUseError:
+        sys.exit("The data is open in another program. Close it, or run closetserver.py to share it.")
+    except Exception as e:
+        sys.exit(f"Invalid password or data corrupted! {e}")
+
+    closet.inventory.alertListeners.append(lambda name, total, threshold: print(
+        f"Low stock: '{name}' is down to {total} (threshold {threshold})", file=sys.stderr))
+
+    if args.command in ('import', 'adjust'):
+        path = spoolStdin() if args.file == '-' else args.file
+        try:
+            run = importRows if args.command == 'import' else adjustRows
+            count, errors = run(closet, path, args.format)
+        finally:
+            if args.file == '-':
+                os.remove(path)
+        if errors:
+            for error in errors:
+                print(f"{args.file}: {error}", file=sys.stderr)
+            sys.exit(f"Nothing was changed, {len(errors)} problem(s) found.")
+        closet.save()
+        print(f"{count} row(s) applied.", file=sys.stderr)
+    elif args.command == 'export':
+        if args.output:
+            with open(args.output, 'w', newline='', encoding='utf-8') as output:
+                count = writeRows(exportRows(closet.inventory), output, args.format)
+        else:
+            count = writeRows(exportRows(closet.inventory), sys.stdout, args.format)
+        print(f"{count} item(s) exported.", file=sys.stderr)
+    elif args.command == 'summary':
+        summary = closet.inventory.summary()
+        print(f"{summary['drawers']} drawers, {summary['items']} items, {summary['names']} different names, "
+              f"{summary['quantity']} pieces in total")
+        for name, total, threshold in closet.inventory.lowStock():
+            print(f"Low stock: '{name}' has {total} (threshold {threshold})")
+    elif args.command == 'threshold':
+        closet.setThreshold(args.item, args.value)
+    elif args.command in ('columns', 'report', 'diff'):
+        analyse(args, closet)
+    else:
+        matches = closet.inventory.search(args.text)
+        writeRows(((drawer, name, quantity) for name, drawer, quantity in matches), sys.stdout, args.format)
+        if not matches:
+            suggestions = closet.inventory.suggest(args.text)
+            for name, drawer, quantity in suggestions['items']:
+                print(f"Did you mean '{name}' ({quantity} in drawer '{drawer}')?", file=sys.stderr)
+            for drawer, count in suggestions['drawers']:
+                print(f"Did you mean drawer '{drawer}' ({count} items)?", file=sys.stderr)
+    closet.close()
+    if args.stats:
+        stats.dump(args.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import json
+import os
+import socket
+import threading
+
+from cryptography.fernet import InvalidToken
+
+from closetcore import Closet
+from itemindex import fuzzyLimit
+from closetserver import readMessages, sendMessage, serverInfoPath
+from keymanager import KeyManager
+
+# Exceptions raised again on the client under their own type
+remoteErrors = {'KeyError': KeyError, 'ValueError': ValueError, 'TypeError': TypeError}
+
+
+def openCloset(username, password, autosave=True):
+    """
+    Open a user's inventory through closetserver.py if it is serving that
+    user, or directly otherwise.
+
+    Args:
+        username (str): The username.
+        password (str): The user's password.
+        autosave (bool): For direct access, whether to save in the background.
+
+    Returns:
+        Closet or RemoteCloset: The open inventory.
+
+    Raises:
+        DataInUseError: If another program has the user's data open directly.
+        InvalidToken: If the password is wrong or the data is damaged.
+    """
+    path = serverInfoPath(username)
+    if os.path.exists(path):
+        with open(path) as file:
+            info = json.load(file)
+        try:
+            return RemoteCloset(username, password, info)
+        except (ConnectionError, FileNotFoundError):
+            pass  # Left by a server that died, so the data is free to open
+    return Closet(username, password, autosave)
+
+
+class RemoteInventory:
+    """
+    Stands in for Inventory when the data is open in closetserver.py. Every
+    call is a request to the server, which applies edits as they are made, so
+    sync() has nothing left to do.
+
+    Attributes:
+        listeners (list): Callables given each edit made by another client.
+        alertListeners (list): Callables given (name, total, threshold) when
+            an edit takes an item's total below its threshold.
+    """
+    def __init__(self, closet):
+        self.closet = closet
+        self.listeners = []
+        self.alertListeners = []
+
+    def __contains__(self, drawer):
+        return self.closet.call('contains', drawer)
+
+    @property
+    def thresholds(self):
+        return self.closet.call('thresholds')
+
+    def drawerNames(self):
+        return self.closet.call('drawerNames')
+
+    def items(self, drawer):
+        return self.closet.call('items', drawer)
+
+    def newDrawer(self, drawer, items):
+        self.closet.call('newDrawer', drawer, [dict(item) for item in items])
+
+    def addItem(self, drawer, name, quantity):
+        self.closet.call('addItem', drawer, name, quantity)
+
+    def removeItem(self, drawer, name):
+        return self.closet.call('removeItem', drawer, name)
+
+    def setQuantity(self, drawer, name, quantity):
+        return self.closet.call('setQuantity', drawer, name, quantity)
+
+    def removeDrawer(self, drawer):
+        self.closet.call('removeDrawer', drawer)
+
+    def search(self, query):
+        return [tuple(match) for match in self.closet.call('search', query)]
+
+    def checkBatch(self, rows):
+        return [tuple(error) for error in self.closet.call('checkBatch', rows)]
+
+    def applyBatch(self, rows):
+        return [tuple(error) for error in self.closet.call('applyBatch', rows)]
+
+    def suggest(self, query, limit=fuzzyLimit):
+        return {kind: [tuple(match) for match in matches]
+                for kind, matches in self.closet.call('suggest', query, limit).items()}
+
+    def summary(self):
+        return self.closet.call('summary')
+
+    def total(self, name):
+        return self.closet.call('total', name)
+
+    def drawerCount(self, drawer):
+        return self.closet.call('drawerCount', drawer)
+
+    def lowStock(self):
+        return [tuple(row) for row in self.closet.call('lowStock')]
+
+    def sync(self):
+        pass
+
+
+class RemoteCloset:
+    """
+    A user's inventory open in closetserver.py, with the same interface as
+    Closet for the GUI and the command line.
+
+    Attributes:
+        username (str): The user whose data is open.
+        inventory (RemoteInventory): The inventory.
+        client (int): The number the server gave this client.
+    """
+    remote = True
+
+    def __init__(self, username, password, info):
+        self.username = username
+        self.fernet = KeyManager(password).fernet(info['params'])
+        if isinstance(info['address'], str):
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.connection.connect(info['address'])
+        else:
+            self.connection = socket.create_connection(tuple(info['address']))
+        self.inventory = RemoteInventory(self)
+        self.sendLock = threading.Lock()
+        self.replies = {}
+        self.nextId = 0
+        self.closed = False
+        self.client = None
+        threading.Thread(target=self._read, daemon=True).start()
+        try:
+            self.client = self.call('hello')['client']
+        except ConnectionError:
+            self.close()
+            raise InvalidToken()  # The server hung up: the message was not under its key
+
+    def _read(self):
+        try:
+            for message in readMessages(self.connection, self.fernet):
+                if 'event' not in message:
+                    waiting = self.replies.pop(message['id'])
+                    waiting[1] = message
+                    waiting[0].set()
+                elif message['event'] == 'edit' and message['origin'] != self.client:
+                    for listener in self.inventory.listeners:
+                        listener(message['edit'])
+                elif message['event'] == 'alert':
+                    for listener in self.inventory.alertListeners:
+                        listener(*message['alert'])
+        except (OSError, ValueError, InvalidToken):
+            pass
+        with self.sendLock:
+            self.closed = True
+            for waiting in self.replies.values():
+                waiting[0].set()  # Without a reply, so call() raises
+
+    def call(self, method, *args):
+        """
+        Send a request to the server and wait for its reply.
+
+        Args:
+            method (str): The method to call.
+            *args: Its arguments.
+
+        Returns:
+            The method's result.
+
+        Raises:
+            ConnectionError: If the server has gone away.
+        """
+        waiting = [threading.Event(), None]
+        with self.sendLock:
+            if self.closed:
+                raise ConnectionError("The inventory server has stopped")
+            self.nextId += 1
+            requestId = self.nextId
+            self.replies[requestId] = waiting
+            sendMessage(self.connection, self.fernet, {'id': requestId, 'method': method, 'args': args})
+        waiting[0].wait()
+        reply = waiting[1]
+        if reply is None:
+            raise ConnectionError("The inventory server has stopped")
+        if 'error' in reply:
+            raise remoteErrors.get(reply['type'], RuntimeError)(reply['error'])
+        return reply['result']
+
+    def setThreshold(self, name, threshold):
+        """
+        Set or clear an item's low-stock threshold on the server.
+        """
+        self.call('setThreshold', name, threshold)
+
+    def save(self):
+        """
+        Wait until the server has journaled every edit made so far.
+        """
+        self.call('save')
+
+    def close(self):
+        """
+        Disconnect. Safe to call more than once.
+        """
+        if self.connection.fileno() != -1:
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.connection.close()
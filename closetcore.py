@@ -0,0 +1,663 @@
+import os
+import time
+
+import stats
+from autosave import Autosaver
+from datalock import DataLock
+from history import changes, packSnapshots, unpackSnapshots
+from inventory import Inventory
+from journal import Journal, readJournal, removeJournal
+from keymanager import KeyManager, fernetFor, legacyParams, addKeyHeader, splitKeyHeader
+from segments import SegmentedStore, writeEncrypted
+from sqlitestore import SQLiteStore
+from serialization import decodePayload, encodePayload, fileToToken, packPayload, serialize, tokenToFile
+from storage import TinyDBStore
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+# Constants
+dataFolder = "data"
+# "segments" keeps one encrypted file per drawer in data/<user>/ and only
+# decrypts a drawer when it is used; "blob" keeps everything in data/<user>.json;
+# "sqlite" keeps encrypted rows with indexed names in data/<user>.sqlite.
+# closetcli.py migrate moves a user's data from one to another.
+storageFormat = "segments"
+storageFormats = ("segments", "blob", "sqlite")
+# How saved data is encoded before encryption. The choice is written into each
+# file's header, so files saved with other settings still load.
+payloadSerializer = "json"  # "json" or "binary"
+payloadCompressor = "zlib"  # "none", "zlib" or "lzma"
+
+
+@stats.timed("encryptData")
+def encryptData(data, key):
+    """
+    Encrypt data using the provided key.
+
+    Args:
+        data (bytes): The data to encrypt.
+        key (bytes): The encryption key.
+
+    Returns:
+        bytes: The encrypted data as a Fernet token.
+    """
+    stats.count("bytesEncrypted", len(data))
+    return fernetFor(key).encrypt(data)
+
+
+@stats.timed("decryptData")
+def decryptData(data, key):
+    """
+    Decrypt data using the provided key.
+
+    Args:
+        data (bytes): The Fernet token to decrypt.
+        key (bytes): The encryption key.
+
+    Returns:
+        bytes: The decrypted data.
+    """
+    stats.count("bytesDecrypted", len(data))
+    return fernetFor(key).decrypt(data)
+
+
+def journalPath(username):
+    """
+    Get the path of a user's edit journal, kept next to their snapshot file.
+
+    Args:
+        username (str): The username to determine the file name.
+
+    Returns:
+        str: The journal file path.
+    """
+    return os.path.join(dataFolder, f"{username}.journal")
+
+
+def thresholdsPath(username):
+    """
+    Get the path of a user's low-stock thresholds, kept apart from the drawers
+    so they stay the same whichever storage format is used.
+
+    Args:
+        username (str): The username to determine the file name.
+
+    Returns:
+        str: The thresholds file path.
+    """
+    return os.path.join(dataFolder, f"{username}.thresholds")
+
+
+def loadThresholds(username, keys):
+    """
+    Args:
+        username (str): The username to determine the file name.
+        keys (KeyManager): The session's key manager.
+
+    Returns:
+        dict: Item name -> low-stock threshold, empty if none have been set.
+    """
+    path = thresholdsPath(username)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'rb') as file:
+        params, data = splitKeyHeader(file.read())
+    return decodePayload(keys.fernet(params).decrypt(fileToToken(data)))
+
+
+def saveThresholds(username, keys, thresholds):
+    """
+    Args:
+        username (str): The username to determine the file name.
+        keys (KeyManager): The session's key manager.
+        thresholds (dict): Item name -> low-stock threshold.
+    """
+    writeEncrypted(keys.fernet(), thresholdsPath(username),
+                   encodePayload(thresholds, payloadSerializer, payloadCompressor), keys.params)
+
+
+def snapshotsPath(username):
+    """
+    Args:
+        username (str): The username to determine the file name.
+
+    Returns:
+        str: The path of the user's named snapshots.
+    """
+    return os.path.join(dataFolder, f"{username}.snapshots")
+
+
+def loadSnapshots(username, keys):
+    """
+    Args:
+        username (str): The username to determine the file name.
+        keys (KeyManager): The session's key manager.
+
+    Returns:
+        dict: Snapshot name -> (time taken, PersistentMap), empty if none have been taken.
+    """
+    path = snapshotsPath(username)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'rb') as file:
+        params, data = splitKeyHeader(file.read())
+    return unpackSnapshots(decodePayload(keys.fernet(params).decrypt(fileToToken(data))))
+
+
+def saveSnapshots(username, keys, snapshots):
+    """
+    Args:
+        username (str): The username to determine the file name.
+        keys (KeyManager): The session's key manager.
+        snapshots (dict): Snapshot name -> (time taken, PersistentMap).
+    """
+    writeEncrypted(keys.fernet(), snapshotsPath(username),
+                   encodePayload(packSnapshots(snapshots), payloadSerializer, payloadCompressor), keys.params)
+
+
+def lockPath(username):
+    """
+    Args:
+        username (str): The username to determine the file name.
+
+    Returns:
+        str: The path of the lock file held while the user's data is open.
+    """
+    return os.path.join(dataFolder, f"{username}.lock")
+
+
+def getJournalSeq(db):
+    """
+    Get the sequence number of the last journaled edit contained in the database.
+
+    Args:
+        db (TinyDB): The TinyDB instance.
+
+    Returns:
+        int: The sequence number, 0 if nothing has been journaled.
+    """
+    meta = db.table('meta').all()
+    return meta[0]['journalSeq'] if meta else 0
+
+
+def setJournalSeq(db, seq):
+    """
+    Record the sequence number of the last journaled edit contained in the database.
+
+    Args:
+        db (TinyDB): The TinyDB instance.
+        seq (int): The sequence number.
+    """
+    metaTable = db.table('meta')
+    metaTable.truncate()
+    metaTable.insert({'journalSeq': seq})
+
+
+def replayJournal(store, seq, username, key):
+    """
+    Apply the journaled edits that are newer than the loaded snapshot.
+
+    Args:
+        store (TinyDBStore or SegmentedStore): The store holding the snapshot.
+        seq (int): The last journaled edit contained in the snapshot.
+        username (str): The username to determine the journal file name.
+        key (bytes): The encryption key.
+
+    Returns:
+        int: The last journaled edit contained in the store after replay.
+    """
+    path = journalPath(username)
+    # A snapshot that did not finish leaves its journal under the .old name
+    for recordSeq, edit in readJournal(path + ".old", key) + readJournal(path, key):
+        if recordSeq > seq:
+            getattr(store, edit[0])(*edit[1:])
+            seq = recordSeq
+    return seq
+
+
+@stats.timed("loadData")
+def loadData(username, keys, upgrade=True):
+    """
+    Load data from a file, decrypt it, and load it into a TinyDB instance.
+    Edits journaled since that file was saved are replayed on top of it.
+
+    Files whose key derivation is weaker than kdfParams, and new users, are
+    saved straight away under freshly derived parameters, which then become
+    the session's.
+
+    Args:
+        username (str): The username to determine the file name.
+        keys (KeyManager): The session's key manager.
+        upgrade (bool): Whether to re-encrypt a file with a weak key derivation.
+
+    Returns:
+        Tuple[TinyDB, Table]: The TinyDB instance and the drawers table.
+
+    Raises:
+        InvalidToken: If the password is wrong or the file is damaged.
+    """
+    if not os.path.exists(dataFolder):
+        os.makedirs(dataFolder)
+        
+    filePath = os.path.join(dataFolder, f"{username}.json")
+    db = TinyDB(storage=MemoryStorage)  # type: ignore
+    params = legacyParams  # A journal without a snapshot was written by an older version
+    
+    if os.path.exists(filePath):
+        with open(filePath, 'rb') as file:
+            params, encryptedData = splitKeyHeader(file.read())
+        decryptedData = decryptData(fileToToken(encryptedData), keys.key(params))
+        db.storage.write(decodePayload(decryptedData))  # Load decrypted data into TinyDB
+    drawersTable = db.table('drawers')
+    setJournalSeq(db, replayJournal(TinyDBStore(drawersTable), getJournalSeq(db), username, keys.key(params)))
+    if upgrade and keys.needsUpgrade(params):
+        keys.params = keys.newParams()
+        saveData(username, keys, db)
+        removeJournal(journalPath(username))  # Its edits are in the new snapshot
+    else:
+        keys.params = params
+    return db, drawersTable
+
+
+def migrateToSegments(username, keys):
+    """
+    Convert a user's single-file snapshot, and any journal on top of it, to the
+    segmented format. The old file is kept as <username>.json.bak.
+
+    Args:
+        username (str): The username to determine the file names.
+        keys (KeyManager): The session's key manager.
+    """
+    db, drawersTable = loadData(username, keys, upgrade=False)
+    store = SegmentedStore(os.path.join(dataFolder, username), keys, payloadSerializer, payloadCompressor)
+    store.replaceAll(TinyDBStore(drawersTable).readAll())
+    store.capture(getJournalSeq(db))()
+    removeJournal(journalPath(username))  # Its edits are in the segments
+    filePath = os.path.join(dataFolder, f"{username}.json")
+    os.replace(filePath, filePath + ".bak")
+
+
+@stats.timed("loadSegments")
+def loadSegments(username, keys):
+    """
+    Open a user's segmented data, decrypting only the manifest of drawer names,
+    and replay the journal on top of it. Users who still have a single-file
+    snapshot are migrated first, and stores whose key derivation is weaker
+    than kdfParams are re-encrypted under freshly derived parameters.
+
+    Args:
+        username (str): The username to determine the folder name.
+        keys (KeyManager): The session's key manager.
+
+    Returns:
+        Tuple[SegmentedStore, int]: The store and the last journaled edit it contains.
+
+    Raises:
+        InvalidToken: If the password is wrong or the data is damaged.
+    """
+    folder = os.path.join(dataFolder, username)
+    filePath = os.path.join(dataFolder, f"{username}.json")
+    if not os.path.exists(os.path.join(folder, "manifest")) and os.path.exists(filePath):
+        migrateToSegments(username, keys)
+    store = SegmentedStore(folder, keys, payloadSerializer, payloadCompressor)
+    seq = replayJournal(store, store.journalSeq, username, keys.key(store.params))
+    if keys.needsUpgrade(store.params):
+        store.rekey()
+        store.capture(seq)()
+        removeJournal(journalPath(username))  # Its edits are in the new segments
+    keys.params = store.params
+    return store, seq
+
+
+@stats.timed("loadSQLite")
+def loadSQLite(username, keys):
+    """
+    Open a user's SQLite store, decrypting only the drawer names, and replay
+    the journal on top of it. Stores whose key derivation is weaker than
+    kdfParams are re-encrypted under freshly derived parameters.
+
+    Args:
+        username (str): The username to determine the file name.
+        keys (KeyManager): The session's key manager.
+
+    Returns:
+        Tuple[SQLiteStore, int]: The store and the last journaled edit it contains.
+
+    Raises:
+        InvalidToken: If the password is wrong or the data is damaged.
+    """
+    if not os.path.exists(dataFolder):
+        os.makedirs(dataFolder)
+    store = SQLiteStore(storagePath(username, "sqlite"), keys)
+    seq = replayJournal(store, store.journalSeq, username, keys.key(store.params))
+    if keys.needsUpgrade(store.params):
+        store.rekey()
+        store.capture(seq)()
+        removeJournal(journalPath(username))  # Its edits are in the re-encrypted rows
+    keys.params = store.params
+    return store, seq
+
+
+def storagePath(username, storage):
+    """
+    Get the file or folder holding a user's data in a storage format.
+
+    Args:
+        username (str): The username.
+        storage (str): One of storageFormats.
+
+    Returns:
+        str: The path.
+    """
+    if storage == "segments":
+        return os.path.join(dataFolder, username)
+    if storage == "sqlite":
+        return os.path.join(dataFolder, f"{username}.sqlite")
+    return os.path.join(dataFolder, f"{username}.json")
+
+
+def migrateStorage(username, password, source, target):
+    """
+    Copy a user's data, and any journal on top of it, from one storage format
+    to another one drawer at a time. The source is kept with a .bak suffix.
+
+    Args:
+        username (str): The username.
+        password (str): The user's password.
+        source (str): The storage format to read, one of storageFormats.
+        target (str): The storage format to write, one of storageFormats.
+
+    Returns:
+        int: The number of drawers copied.
+
+    Raises:
+        FileExistsError: If the user already has data in the target format, or
+            a backup of the source is in the way.
+        InvalidToken: If the password is wrong or the data is damaged.
+    """
+    targetPath = storagePath(username, target)
+    sourcePath = storagePath(username, source)
+    for path in (targetPath, sourcePath + ".bak"):
+        if os.path.exists(path):
+            raise FileExistsError(f"'{path}' already exists")
+    closet = Closet(username, password, autosave=False, storage=source)
+    keys = closet.keys
+    if target == "segments":
+        store = SegmentedStore(targetPath, keys, payloadSerializer, payloadCompressor)
+    elif target == "sqlite":
+        store = SQLiteStore(targetPath, keys)
+    else:
+        db = TinyDB(storage=MemoryStorage)  # type: ignore
+        store = TinyDBStore(db.table('drawers'))
+    drawers = closet.store.drawerNames()
+    for drawer in drawers:
+        store.upsertDrawer(drawer, closet.store.loadDrawer(drawer))
+    if target == "blob":
+        setJournalSeq(db, 0)
+        saveData(username, keys, db)
+    else:
+        store.capture(0)()
+        if target == "sqlite":
+            store.close()
+    closet.close()
+    removeJournal(journalPath(username))  # Its edits are in the target now
+    os.replace(sourcePath, sourcePath + ".bak")
+    return len(drawers)
+
+
+@stats.timed("writeSnapshot")
+def writeSnapshot(filePath, data, keys):
+    """
+    Compress and encrypt serialized data and replace a file with it. The data
+    goes to a temporary file first so a crash never leaves a half-written snapshot.
+
+    Args:
+        filePath (str): The file to replace.
+        data (bytes): The TinyDB data, serialized with payloadSerializer.
+        keys (KeyManager): The session's key manager.
+    """
+    encryptedData = encryptData(packPayload(data, payloadSerializer, payloadCompressor), keys.key())
+    tempPath = filePath + ".tmp"
+    fileData = addKeyHeader(keys.params, tokenToFile(encryptedData))
+    stats.count("bytesWritten", len(fileData))
+    with open(tempPath, 'wb') as file:
+        file.write(fileData)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tempPath, filePath)
+
+
+@stats.timed("saveData")
+def saveData(username, keys, db):
+    """
+    Save data from a TinyDB instance to a file, encrypting it.
+
+    Args:
+        username (str): The username to determine the file name.
+        keys (KeyManager): The session's key manager.
+        db (TinyDB): The TinyDB instance containing the data.
+    """
+    if not os.path.exists(dataFolder):
+        os.makedirs(dataFolder)
+    
+    filePath = os.path.join(dataFolder, f"{username}.json")
+    data = serialize(db.storage.read(), payloadSerializer)  # Serialize the data from TinyDB
+    writeSnapshot(filePath, data, keys)
+
+
+class Closet:
+    """
+    One user's open inventory: the session keys, the store, the in-memory
+    Inventory and, unless turned off, the background autosave. The user's
+    data is locked until close(), so a second program cannot open it and
+    overwrite this one's edits.
+
+    With autosave, every synced edit is journaled and snapshots are written on
+    a worker thread. Without it nothing touches the disk until save(), so a
+    batch of edits lands in a single encrypted save.
+
+    Attributes:
+        username (str): The user whose data is open.
+        keys (KeyManager): The session's key manager.
+        storage (str): The storage format the data is kept in.
+        store (TinyDBStore, SegmentedStore or SQLiteStore): The storage behind the inventory.
+        db (TinyDB): The TinyDB instance, for the "blob" format only.
+        inventory (Inventory): The in-memory inventory.
+        seq (int): The last journaled edit contained in the store.
+        autosaver (Autosaver): The autosave worker, None without autosave.
+        lock (DataLock): The lock on the user's data.
+        closed (bool): Whether close() has been called.
+        snapshots (dict): Snapshot name -> (time taken, PersistentMap), read
+            from disk the first time a snapshot is used.
+
+    Raises:
+        DataInUseError: If another program has the user's data open.
+        InvalidToken: If the password is wrong or the data is damaged.
+    """
+    remote = False
+
+    def __init__(self, username, password, autosave=True, storage=None):
+        self.username = username
+        self.storage = storage or storageFormat
+        if not os.path.exists(dataFolder):
+            os.makedirs(dataFolder)
+        self.closed = False
+        self.lock = DataLock(lockPath(username))
+        self.lock.acquire()
+        try:
+            self.keys = KeyManager(password)  # Derive the key once for the whole session
+            self.db = None
+            if self.storage == "segments":
+                self.store, self.seq = loadSegments(username, self.keys)
+            elif self.storage == "sqlite":
+                self.store, self.seq = loadSQLite(username, self.keys)
+            else:
+                self.db, drawersTable = loadData(username, self.keys)
+                self.store = TinyDBStore(drawersTable)
+                self.seq = getJournalSeq(self.db)
+            self.inventory = Inventory(self.store)
+            self.inventory.thresholds = loadThresholds(username, self.keys)
+        except Exception:
+            self.lock.release()
+            raise
+        self.snapshots = None
+        self.autosaver = None
+        if autosave:
+            journal = Journal(journalPath(username), self.keys.key())
+            self.autosaver = Autosaver(journal, self.captureSnapshot, self.inventory.lock, self.seq)
+            self.inventory.listeners.append(self.autosaver.edit)
+
+    @stats.timed("Closet.captureSnapshot")
+    def captureSnapshot(self, seq):
+        """
+        Capture the inventory for saving. Only the capture happens here; the
+        returned function does the compression, encryption and writing, so the
+        autosave worker can run it while the inventory keeps being edited.
+
+        Args:
+            seq (int): The last journaled edit contained in the store.
+
+        Returns:
+            callable: Writes the captured snapshot.
+        """
+        if self.storage != "blob":
+            return self.store.capture(seq)  # Only the drawers edited since the last save
+        setJournalSeq(self.db, seq)
+        snapshot = serialize(self.db.storage.read(), payloadSerializer)
+        filePath = os.path.join(dataFolder, f"{self.username}.json")
+        return lambda: writeSnapshot(filePath, snapshot, self.keys)
+
+    @stats.timed("Closet.readData")
+    def readData(self):
+        """
+        Read and return every drawer in the store.
+
+        Returns:
+            dict: Drawer name -> list of item dicts.
+        """
+        with self.inventory.lock:
+            return self.store.readAll()
+
+    @stats.timed("Closet.writeData")
+    def writeData(self, data):
+        """
+        Replace every drawer in the store. Single edits should go through the
+        inventory instead.
+
+        Args:
+            data (dict): Drawer name -> list of item dicts.
+        """
+        with self.inventory.lock:
+            self.store.replaceAll(data)
+
+    def setThreshold(self, name, threshold):
+        """
+        Set or clear an item's low-stock threshold and save the thresholds.
+
+        Args:
+            name (str): The item name.
+            threshold (int): Alert when the item's total drops below this; 0 clears it.
+        """
+        if threshold:
+            self.inventory.thresholds[name] = threshold
+        else:
+            self.inventory.thresholds.pop(name, None)
+        saveThresholds(self.username, self.keys, self.inventory.thresholds)
+
+    def _snapshots(self):
+        if self.snapshots is None:
+            self.snapshots = loadSnapshots(self.username, self.keys)
+        self.inventory.enableHistory()
+        self.inventory.sync()
+        self.inventory.loadAll()  # Snapshots hold every drawer
+        return self.snapshots
+
+    def snapshotList(self):
+        """
+        Returns:
+            list: (name, time taken) tuples of the named snapshots, oldest first.
+        """
+        return sorted(((name, taken) for name, (taken, _) in self._snapshots().items()), key=lambda row: row[1])
+
+    def takeSnapshot(self, name):
+        """
+        Save the inventory as it is now under a name, replacing any snapshot
+        with that name. It shares its drawers with the inventory's history
+        and, on disk, with the other snapshots.
+
+        Args:
+            name (str): The snapshot name.
+        """
+        snapshots = self._snapshots()
+        snapshots[name] = (time.time(), self.inventory.history.current)
+        saveSnapshots(self.username, self.keys, snapshots)
+
+    def deleteSnapshot(self, name):
+        """
+        Args:
+            name (str): The snapshot name.
+        """
+        snapshots = self._snapshots()
+        del snapshots[name]
+        saveSnapshots(self.username, self.keys, snapshots)
+
+    def changesSince(self, name):
+        """
+        Compare a snapshot with the inventory as it is now. The snapshot is
+        already in memory, so no older file is decrypted to do it.
+
+        Args:
+            name (str): The snapshot name.
+
+        Returns:
+            list: (drawer, name, quantity then, quantity now) tuples, with
+                None where the item was missing.
+        """
+        return changes(self._snapshots()[name][1], self.inventory.history.current)
+
+    def restoreSnapshot(self, name):
+        """
+        Bring the inventory back to a snapshot. This is one undo step, so
+        undo() takes it back.
+
+        Args:
+            name (str): The snapshot name.
+        """
+        version = self._snapshots()[name][1]
+        self.inventory.restore(version)
+        self.inventory.history.push(version)
+        self.inventory.sync()
+
+    @stats.timed("Closet.save")
+    def save(self):
+        """
+        Write the inventory's pending edits to the store and save it in one
+        encrypted write. Only used without autosave.
+        """
+        self.inventory.sync()
+        self.captureSnapshot(self.seq)()
+        removeJournal(journalPath(self.username))  # Anything replayed from it is in the snapshot
+
+    def close(self):
+        """
+        Sync the inventory and, with autosave, wait for the final snapshot.
+        Without autosave, call save() first. Safe to call more than once;
+        later calls do nothing.
+
+        Raises:
+            Exception: The last error the autosave worker hit while saving,
+                raised by the first call only.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.inventory.sync()
+            if self.autosaver is not None:
+                self.autosaver.close()
+            if self.storage == "sqlite":
+                self.store.close()  # Anything not saved by now is rolled back
+        finally:
+            self.lock.release()
+        if self.autosaver is not None and self.autosaver.error:
+            raise self.autosaver.error
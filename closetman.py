@@ -1,154 +1,287 @@
-import os
+import time
+startTime = time.perf_counter()  # Before the other imports, so they count towards the startup time
+
+import atexit
+import importlib
+import threading
 import PySimpleGUI as sg
-from tinydb import TinyDB, Query
-from tinydb.storages import MemoryStorage
-from cryptography.fernet import Fernet
-import base64
-import hashlib
-import json
-import subprocess
+import stats
+from drawerview import DrawerPager, columns, pageRows
 
 # Constants
 imageFileName = "chargers.jpg"
-dataFolder = "data"
 
 # Theme
 sg.theme('DarkGrey2')
 
-def generateKey(password):
+def popup(title, message):
     """
-    Generate an encryption key from a password.
+    Create a popup window with a message.
 
     Args:
-        password (str): The password to generate the key from.
-
-    Returns:
-        bytes: The generated encryption key.
+        title (str): The title of the popup window.
+        message (str): The message to display in the popup window.
     """
-    return base64.urlsafe_b64encode(hashlib.sha256(password.encode()).digest())
+    layout = [
+        [sg.Text(message)],
+        [sg.Button('OK')]
+    ]
+    window = sg.Window(title, layout, modal=True)
+    while True:
+        event, _ = window.read()
+        if event == sg.WIN_CLOSED or event == 'OK':
+            break
+    window.close()
 
-def encryptData(data, key):
+def showDrawer(drawerName, items, action=None):
     """
-    Encrypt data using the provided key.
+    Show a drawer's items in a table, one page at a time. Clicking a column
+    heading sorts by it and typing in the filter box narrows the items down.
 
     Args:
-        data (str): The data to encrypt.
-        key (bytes): The encryption key.
+        drawerName (str): The drawer name.
+        items (Sequence): The drawer's items.
+        action (str): The text of an extra button, such as "Remove Drawer".
 
     Returns:
-        str: The encrypted data as a string.
+        bool: True if the extra button was clicked.
     """
-    fernet = Fernet(key)
-    return fernet.encrypt(data.encode()).decode()
+    pager = DrawerPager(items)
+    buttons = [sg.Button('Previous'), sg.Button('Next'), sg.Button('Close')]
+    if action:
+        buttons.insert(2, sg.Button(action))
+    layout = [
+        [sg.Text(f"Drawer '{drawerName}'"), sg.Text("Filter:"), sg.Input(key='-FILTER-', size=(25, 1), enable_events=True)],
+        [sg.Table(values=pager.rows(), headings=['Item', 'Quantity'], key='-TABLE-', num_rows=pageRows,
+                  auto_size_columns=False, col_widths=[40, 10], justification='left', enable_click_events=True)],
+        [sg.Text(pager.status(), key='-STATUS-', size=(40, 1))],
+        buttons
+    ]
+    window = sg.Window("Drawer Contents", layout, modal=True)
+    clicked = False
+    while True:
+        event, values = window.read()
+        if event == sg.WIN_CLOSED or event == 'Close':
+            break
+        if event == action:
+            clicked = True
+            break
+        if event == '-FILTER-':
+            pager.setFilter(values['-FILTER-'])
+        elif event == 'Previous':
+            pager.turn(-1)
+        elif event == 'Next':
+            pager.turn(1)
+        elif isinstance(event, tuple) and event[0] == '-TABLE-' and event[2][0] == -1:
+            pager.sortBy(columns[event[2][1]])  # A click on a column heading
+        else:
+            continue
+        # Only the visible page is handed to the table
+        window['-TABLE-'].update(values=pager.rows())
+        window['-STATUS-'].update(pager.status())
+    window.close()
+    return clicked
 
-def decryptData(data, key):
+def showBatchEntry():
+    """
+    Enter or adjust many items across drawers at once. Every line is checked
+    before anything changes, and the whole batch is applied as one edit.
     """
-    Decrypt data using the provided key.
+    from batchentry import maxErrors, parseBatch
 
-    Args:
-        data (str): The encrypted data to decrypt.
-        key (bytes): The encryption key.
+    layout = [
+        [sg.Text('One item per line: "drawer, name, quantity", or "name, quantity" for the drawer below.')],
+        [sg.Text("A quantity like 12 sets it, adding the item or drawer if needed; +5 or -2 changes it.")],
+        [sg.Text("Drawer:"), sg.Combo(sorted(inventory.drawerNames()), key='-DRAWER-', size=(30, 1))],
+        [sg.Multiline(key='-ROWS-', size=(70, 20))],
+        [sg.Text("", key='-RESULT-', size=(70, 6))],
+        [sg.Button('Check'), sg.Button('Apply'), sg.Button('Close')]
+    ]
+    window = sg.Window("Batch Entry", layout, modal=True)
+    while True:
+        event, values = window.read()
+        if event == sg.WIN_CLOSED or event == 'Close':
+            break
+        rows, lineNumbers, errors = parseBatch(values['-ROWS-'], (values['-DRAWER-'] or "").strip())
+        if rows and not errors:
+            check = inventory.applyBatch if event == 'Apply' else inventory.checkBatch
+            errors = [f"line {lineNumbers[position]}: {message}" for position, message in check(rows)]
+        if errors:
+            window['-RESULT-'].update("Nothing was changed:\n" + "\n".join(errors[:maxErrors]))
+        elif not rows:
+            window['-RESULT-'].update("Enter at least one item.")
+        elif event == 'Apply':
+            popup("Success", f"{len(rows)} rows applied!")
+            break
+        else:
+            window['-RESULT-'].update(f"All {len(rows)} rows can be applied.")
+    window.close()
 
-    Returns:
-        str: The decrypted data as a string.
+def showSummary():
     """
-    fernet = Fernet(key)
-    return fernet.decrypt(data.encode()).decode()
-
-def loadData(username, password):
+    Show the closet's totals and the items that are low on stock, and let the
+    user look up an item's total or set its low-stock threshold.
     """
-    Load data from a file, decrypt it, and load it into a TinyDB instance.
+    def lowStockRows():
+        return [list(row) for row in inventory.lowStock()]
 
-    Args:
-        username (str): The username to determine the file name.
-        password (str): The password to decrypt the data.
+    summary = inventory.summary()
+    layout = [
+        [sg.Text(f"{summary['drawers']} drawers, {summary['items']} items, {summary['names']} different names, "
+                 f"{summary['quantity']} pieces in total")],
+        [sg.Text("Item:"), sg.Input(key='-NAME-', size=(25, 1)), sg.Button('Total'), sg.Button('Set Threshold')],
+        [sg.Text("", key='-TOTAL-', size=(60, 1))],
+        [sg.Text("Low on stock:")],
+        [sg.Table(values=lowStockRows(), headings=['Item', 'Total', 'Threshold'], key='-LOW-', num_rows=10,
+                  auto_size_columns=False, col_widths=[30, 8, 10], justification='left')],
+        [sg.Button('Close')]
+    ]
+    window = sg.Window("Summary", layout, modal=True)
+    while True:
+        event, values = window.read()
+        if event == sg.WIN_CLOSED or event == 'Close':
+            break
+        name = values['-NAME-']
+        if not name:
+            continue
+        if event == 'Total':
+            threshold = inventory.thresholds.get(name)
+            limit = f", alert below {threshold}" if threshold else ""
+            window['-TOTAL-'].update(f"'{name}': {inventory.total(name)} in total{limit}")
+        elif event == 'Set Threshold':
+            threshold = sg.popup_get_text(f"Alert when the total of '{name}' drops below (0 for never):")
+            if threshold and threshold.isdigit():
+                closet.setThreshold(name, int(threshold))
+                window['-LOW-'].update(values=lowStockRows())
+            elif threshold is not None:
+                popup("Error", "Threshold must be a number!")
+    window.close()
 
-    Returns:
-        Tuple[TinyDB, Table]: The TinyDB instance and the drawers table.
-    """
-    if not os.path.exists(dataFolder):
-        os.makedirs(dataFolder)
-        
-    filePath = os.path.join(dataFolder, f"{username}.json")
-    
-    if os.path.exists(filePath):
-        with open(filePath, 'r') as file:
-            encryptedData = file.read()
-        try:
-            decryptedData = decryptData(encryptedData, generateKey(password))
-            db = TinyDB(storage=MemoryStorage)  # type: ignore
-            db.storage.write(json.loads(decryptedData))  # Load decrypted data into TinyDB
-            drawersTable = db.table('drawers')
-            return db, drawersTable
-        except Exception as e:
-            sg.popup_error("Invalid password or data corrupted!", str(e))
-            return None, None
-    else:
-        db = TinyDB(filePath)
-        drawersTable = db.table('drawers')
-        return db, drawersTable
-
-def saveData(username, password, db):
+def showChanges(title, rows):
     """
-    Save data from a TinyDB instance to a file, encrypting it.
+    Show item changes in a table.
 
     Args:
-        username (str): The username to determine the file name.
-        password (str): The password to encrypt the data.
-        db (TinyDB): The TinyDB instance containing the data.
-    """
-    if not os.path.exists(dataFolder):
-        os.makedirs(dataFolder)
-    
-    filePath = os.path.join(dataFolder, f"{username}.json")
-    data = json.dumps(db.storage.read())  # Serialize the data from TinyDB
-    encryptedData = encryptData(data, generateKey(password))
-    with open(filePath, 'w') as file:
-        file.write(encryptedData)
-
-def readData():
+        title (str): The window title.
+        rows (list): (drawer, name, quantity then, quantity now) tuples, with
+            None where the item was missing.
     """
-    Read and return all data from the drawers table.
+    values = [[drawer, name, "" if then is None else then, "" if now is None else now] for drawer, name, then, now in rows]
+    layout = [
+        [sg.Text(f"{len(rows)} item(s) changed" if rows else "Nothing has changed")],
+        [sg.Table(values=values, headings=['Drawer', 'Item', 'Then', 'Now'], num_rows=20,
+                  auto_size_columns=False, col_widths=[20, 30, 8, 8], justification='left')],
+        [sg.Button('Close')]
+    ]
+    window = sg.Window(title, layout, modal=True)
+    while True:
+        event, _ = window.read()
+        if event == sg.WIN_CLOSED or event == 'Close':
+            break
+    window.close()
 
-    Returns:
-        dict: The data from the drawers table.
+def showSnapshots():
     """
-    data = {}
-    for item in drawersTable.all():
-        data[item['drawer']] = item['items']
-    return data
-
-def writeData(data):
+    List the named snapshots and let the user take a new one, see what has
+    changed since one, restore one or delete one.
     """
-    Write data to the drawers table.
+    def snapshotRows():
+        return [[name, time.strftime("%Y-%m-%d %H:%M", time.localtime(taken))] for name, taken in closet.snapshotList()]
 
-    Args:
-        data (dict): The data to write to the drawers table.
-    """
-    drawersTable.truncate()  # Clear the table first
-    for key, items in data.items():
-        drawersTable.insert({'drawer': key, 'items': items})
+    rows = snapshotRows()
+    layout = [
+        [sg.Text("Name:"), sg.Input(key='-NAME-', size=(25, 1)), sg.Button('Take Snapshot')],
+        [sg.Table(values=rows, headings=['Snapshot', 'Taken'], key='-SNAPSHOTS-', num_rows=10,
+                  auto_size_columns=False, col_widths=[30, 18], justification='left')],
+        [sg.Button('Show Changes'), sg.Button('Restore'), sg.Button('Delete'), sg.Button('Close')]
+    ]
+    window = sg.Window("Snapshots", layout, modal=True)
+    while True:
+        event, values = window.read()
+        if event == sg.WIN_CLOSED or event == 'Close':
+            break
+        if event == 'Take Snapshot':
+            name = values['-NAME-'].strip()
+            if not name:
+                popup("Error", "Enter a name for the snapshot!")
+                continue
+            closet.takeSnapshot(name)
+        else:
+            if not values['-SNAPSHOTS-']:
+                popup("Error", "Select a snapshot first!")
+                continue
+            name = rows[values['-SNAPSHOTS-'][0]][0]
+            if event == 'Show Changes':
+                showChanges(f"Changes since '{name}'", closet.changesSince(name))
+            elif event == 'Restore':
+                if sg.popup_yes_no(f"Bring the inventory back to snapshot '{name}'? Undo takes it back.") == 'Yes':
+                    closet.restoreSnapshot(name)
+                    popup("Success", f"Snapshot '{name}' restored!")
+            elif event == 'Delete':
+                closet.deleteSnapshot(name)
+        rows = snapshotRows()
+        window['-SNAPSHOTS-'].update(values=rows)
+    window.close()
 
-def popup(title, message):
+def showStats():
     """
-    Create a popup window with a message.
+    Show how often the instrumented functions and event handlers ran and how
+    long they took, turn the instrumentation on or off, profile the next
+    action with cProfile and save everything to a JSON file.
 
-    Args:
-        title (str): The title of the popup window.
-        message (str): The message to display in the popup window.
+    Handler times include the time the user spends in their dialogs; the CPU
+    column and the functions they call show the work itself.
     """
+    def counterText():
+        return ", ".join(f"{name}: {value:,}" for name, value in sorted(stats.counters.items())) or "No bytes counted yet"
+
+    def stateText():
+        return "Instrumentation is on." if stats.enabled else "Instrumentation is off; turn it on to start measuring."
+
     layout = [
-        [sg.Text(message)],
-        [sg.Button('OK')]
+        [sg.Text(stateText(), key='-STATE-', size=(60, 1)), sg.Button('Turn On' if not stats.enabled else 'Turn Off', key='-TOGGLE-')],
+        [sg.Table(values=stats.rows(), headings=['Action', 'Calls', 'Total ms', 'Longest ms', 'CPU ms'], key='-TIMINGS-',
+                  num_rows=15, auto_size_columns=False, col_widths=[30, 8, 10, 10, 10], justification='left')],
+        [sg.Text(counterText(), key='-COUNTERS-', size=(90, 1))],
+        [sg.Text("Last profiled action:")],
+        [sg.Multiline(stats.lastProfile or "", key='-PROFILE-', size=(100, 12), disabled=True)],
+        [sg.Button('Refresh'), sg.Button('Reset'), sg.Button('Profile Next Action'), sg.Button('Save to File'), sg.Button('Close')]
     ]
-    window = sg.Window(title, layout, modal=True)
+    window = sg.Window("Stats", layout, modal=True)
     while True:
         event, _ = window.read()
-        if event == sg.WIN_CLOSED or event == 'OK':
+        if event == sg.WIN_CLOSED or event == 'Close':
             break
+        if event == '-TOGGLE-':
+            stats.enabled = not stats.enabled
+            window['-TOGGLE-'].update('Turn Off' if stats.enabled else 'Turn On')
+        elif event == 'Reset':
+            stats.reset()
+        elif event == 'Profile Next Action':
+            stats.enabled = True
+            stats.profileNext = True
+            window['-TOGGLE-'].update('Turn Off')
+            popup("Profiling", "The next button you click in the main window will be profiled.")
+        elif event == 'Save to File':
+            path = sg.popup_get_file("Save the stats to:", save_as=True, default_path="closetman-stats.json",
+                                     file_types=(("JSON", "*.json"),))
+            if path:
+                stats.dump(path)
+                popup("Success", f"Stats saved to '{path}'")
+        window['-STATE-'].update(stateText())
+        window['-TIMINGS-'].update(values=stats.rows())
+        window['-COUNTERS-'].update(counterText())
+        window['-PROFILE-'].update(stats.lastProfile or "")
     window.close()
 
+# The encryption and storage modules are slow to import, so they load on a
+# background thread while the user types their credentials
+preloader = threading.Thread(target=importlib.import_module, args=("closetclient",), daemon=True)
+preloader.start()
+
 # Get username and password
+if stats.enabled:
+    stats.record("startup to login prompt", time.perf_counter() - startTime, time.process_time())
 username = sg.popup_get_text("Enter your username:")
 if username is None:  # If the user cancels, exit the program
     exit()
@@ -156,147 +289,216 @@ if username is None:  # If the user cancels, exit the program
 password = sg.popup_get_text("Enter your password:", password_char='*')
 if password is None:  # If the user cancels, exit the program
     exit()
-
-# Initialize the database
-db, drawersTable = loadData(username, password)
-if db is None:
+passwordTime = time.perf_counter()
+passwordCpuTime = time.process_time()
+
+preloader.join()
+from closetclient import openCloset
+from datalock import DataInUseError
+
+# Open the user's data, through closetserver.py if it is running; the handlers
+# below edit closet.inventory and synced edits are saved off the event loop
+try:
+    with stats.timing("login"):
+        closet = openCloset(username, password)
+except DataInUseError:
+    sg.popup_error("Your data is open in another window!", "Close it, or run closetserver.py to share it.")
+    exit()
+except Exception as e:
+    sg.popup_error("Invalid password or data corrupted!", str(e))
     exit()
+inventory = closet.inventory
+stockAlerts = []  # Filled by the inventory as edits take items below their thresholds
+inventory.alertListeners.append(lambda name, total, threshold: stockAlerts.append(
+    f"'{name}' is down to {total} (threshold {threshold})"))
+atexit.register(closet.close)  # Still save if the program stops unexpectedly
+if not closet.remote:
+    inventory.enableHistory()  # Each event's edits become one undo step
 
 # Main GUI layout
 layout = [
     [sg.Text("Choose an option:")],
-    [sg.Button("New Drawer"), sg.Button("Add/Remove Item"), sg.Button("Search for Item"), sg.Button("Display Drawer")],
-    [sg.Button("Remove Drawer")], 
+    [sg.Button("New Drawer"), sg.Button("Add/Remove Item"), sg.Button("Batch Entry"), sg.Button("Search for Item"),
+     sg.Button("Display Drawer")],
+    [sg.Button("Remove Drawer"), sg.Button("Summary"), sg.Button("Stats")], 
+    [sg.Button("Undo"), sg.Button("Redo"), sg.Button("Snapshots")],
     [sg.Button("Tired?")],  # New Button
+    [sg.Text("", key='-CHANGES-', size=(60, 1))],
     [sg.Exit()]
 ]
 
 # Create the window
 window = sg.Window("Drawer Management System", layout)
+if closet.remote:
+    # Called on the client's reader thread, so hand the edit to the event loop
+    inventory.listeners.append(lambda edit: window.write_event_value('-CHANGED-', edit))
+
+if stats.enabled:
+    stats.record("password to main window", time.perf_counter() - passwordTime,
+                 time.process_time() - passwordCpuTime)
 
 # Event loop
 while True:
     event, values = window.read()
     if event == sg.WIN_CLOSED or event == 'Exit':
-        saveData(username, password, db)
+        try:
+            closet.close()  # Waits for the final snapshot
+        except Exception as e:
+            sg.popup_error("Saving failed!", str(e))
         break
-    
-    data = readData()
-
-    if event == "New Drawer":
-        drawerName = sg.popup_get_text("Enter the drawer name:")
-        if drawerName:
-            if drawerName in data:
-                if sg.popup_yes_no(f"Drawer '{drawerName}' already exists. Do you want to overwrite it?") == 'No':
-                    continue
-            objectName = sg.popup_get_text("Enter the first object name for the drawer:")
-            if objectName:
-                quantity = sg.popup_get_text("Enter the quantity for the item:")
-                if quantity and quantity.isdigit():
-                    data[drawerName] = [{'name': objectName, 'quantity': int(quantity)}]
-                    while sg.popup_yes_no("Do you want to add another object?") == 'Yes':
-                        objectName = sg.popup_get_text("Enter the next object name:")
-                        if objectName:
-                            quantity = sg.popup_get_text("Enter the quantity for the item:")
-                            if quantity and quantity.isdigit():
-                                data[drawerName].append({'name': objectName, 'quantity': int(quantity)})
-                            else:
-                                popup("Error", "Quantity must be a number!")
-                                break
-                    writeData(data)
-                    popup("Success", "Drawer and objects added successfully!")
-                else:
-                    popup("Error", "Quantity must be a number!")
-
-    elif event == "Add/Remove Item":
-        drawerName = sg.popup_get_text("Enter the drawer name:")
-        if drawerName in data:
-            action = sg.popup_get_text("Enter 'a' to add an item or 'r' to remove an item:")
-            if action == 'a':
-                objectName = sg.popup_get_text("Enter the object name to add:")
+
+    # Each handler, including the save of its edits, is timed while stats are on
+    with stats.timing(f"event {event}"):
+        if event == "New Drawer":
+            drawerName = sg.popup_get_text("Enter the drawer name:")
+            if drawerName:
+                if drawerName in inventory:
+                    if sg.popup_yes_no(f"Drawer '{drawerName}' already exists. Do you want to overwrite it?") == 'No':
+                        continue
+                objectName = sg.popup_get_text("Enter the first object name for the drawer:")
                 if objectName:
                     quantity = sg.popup_get_text("Enter the quantity for the item:")
                     if quantity and quantity.isdigit():
-                        data[drawerName].append({'name': objectName, 'quantity': int(quantity)})
-                        writeData(data)
-                        popup("Success", f"Object '{objectName}' added to drawer '{drawerName}'!")
+                        items = [{'name': objectName, 'quantity': int(quantity)}]
+                        while sg.popup_yes_no("Do you want to add another object?") == 'Yes':
+                            objectName = sg.popup_get_text("Enter the next object name:")
+                            if objectName:
+                                quantity = sg.popup_get_text("Enter the quantity for the item:")
+                                if quantity and quantity.isdigit():
+                                    items.append({'name': objectName, 'quantity': int(quantity)})
+                                else:
+                                    popup("Error", "Quantity must be a number!")
+                                    break
+                        inventory.newDrawer(drawerName, items)
+                        popup("Success", "Drawer and objects added successfully!")
                     else:
                         popup("Error", "Quantity must be a number!")
-            elif action == 'r':
-                objectName = sg.popup_get_text("Enter the object name to remove:")
-                found = False
-                for item in data[drawerName]:
-                    if item['name'] == objectName:
-                        data[drawerName].remove(item)
-                        found = True
-                        writeData(data)
+
+        elif event == "Add/Remove Item":
+            drawerName = sg.popup_get_text("Enter the drawer name:")
+            if drawerName in inventory:
+                action = sg.popup_get_text("Enter 'a' to add an item or 'r' to remove an item:")
+                if action == 'a':
+                    objectName = sg.popup_get_text("Enter the object name to add:")
+                    if objectName:
+                        quantity = sg.popup_get_text("Enter the quantity for the item:")
+                        if quantity and quantity.isdigit():
+                            inventory.addItem(drawerName, objectName, int(quantity))
+                            popup("Success", f"Object '{objectName}' added to drawer '{drawerName}'!")
+                        else:
+                            popup("Error", "Quantity must be a number!")
+                elif action == 'r':
+                    objectName = sg.popup_get_text("Enter the object name to remove:")
+                    if inventory.removeItem(drawerName, objectName):
                         popup("Success", f"Object '{objectName}' removed from drawer '{drawerName}'!")
-                        break
-                if not found:
-                    popup("Error", f"Object '{objectName}' not found in drawer '{drawerName}'")
-            else: 
-                popup("Error", "Please enter 'a' or 'r' for add or remove!")
-        else:
-            popup("Error", f"Drawer '{drawerName}' not found")
-
-    elif event == "Search for Item":
-        searchItem = sg.popup_get_text("Enter the object name to search for:")
-        foundItems = []
-        for drawer, items in data.items():
-            for item in items:
-                if item['name'] == searchItem:
-                    foundItems.append(f"{item['name']} (Quantity: {item['quantity']}) found in drawer '{drawer}'")
-        if foundItems:
-            popup("Found", "\n".join(foundItems))
-        else:
-            popup("Not Found", f"Object '{searchItem}' not found")
-
-    elif event == "Display Drawer":
-        drawerNames = list(data.keys())
-        if drawerNames:
-            layout = [
-                [sg.Text('Select a drawer to display:')],
-                [sg.Combo(drawerNames, key='-DRAWER-', readonly=True)],
-                [sg.Button('OK'), sg.Button('Cancel')]
-            ]
-            windowSelect = sg.Window("Select Drawer", layout)
-            eventSelect, valuesSelect = windowSelect.read()
-            if eventSelect == 'OK' and valuesSelect['-DRAWER-']:
-                drawerName = valuesSelect['-DRAWER-']
-                if drawerName in data:
-                    itemsList = "\n".join([f"{item['name']} (Quantity: {item['quantity']})" for item in data[drawerName]])
-                    popup("Drawer Contents", f"Drawer '{drawerName}' contains:\n{itemsList}")
-                else:
-                    popup("Error", f"Drawer '{drawerName}' not found")
-            windowSelect.close()
-        else:
-            popup("Error", "No drawers available to display")
-
-    elif event == "Remove Drawer":
-        drawerNames = list(data.keys())
-        if drawerNames:
-            layout = [
-                [sg.Text('Select a drawer to remove:')],
-                [sg.Combo(drawerNames, key='-DRAWER-', readonly=True)],
-                [sg.Button('OK'), sg.Button('Cancel')]
-            ]
-            windowRemove = sg.Window("Select Drawer to Remove", layout)
-            eventRemove, valuesRemove = windowRemove.read()
-            if eventRemove == 'OK' and valuesRemove['-DRAWER-']:
-                drawerName = valuesRemove['-DRAWER-']
-                if drawerName in data:
-                    itemsList = "\n".join([f"{item['name']} (Quantity: {item['quantity']})" for item in data[drawerName]])
-                    if sg.popup_yes_no(f"Are you sure you want to remove drawer '{drawerName}'? It contains:\n{itemsList}") == 'Yes':
-                        del data[drawerName]
-                        writeData(data)
-                        popup("Success", f"Drawer '{drawerName}' removed successfully!")
-                else:
-                    popup("Error", f"Drawer '{drawerName}' not found")
-            windowRemove.close()
-        else:
-            popup("Error", "No drawers available to remove")
+                    else:
+                        popup("Error", f"Object '{objectName}' not found in drawer '{drawerName}'")
+                else: 
+                    popup("Error", "Please enter 'a' or 'r' for add or remove!")
+            else:
+                popup("Error", f"Drawer '{drawerName}' not found")
+
+        elif event == "Batch Entry":
+            showBatchEntry()
+
+        elif event == "Search for Item":
+            searchItem = sg.popup_get_text("Enter the object name to search for:")
+            foundItems = []
+            if searchItem:
+                for name, drawer, quantity in inventory.search(searchItem):
+                    foundItems.append(f"{name} (Quantity: {quantity}) found in drawer '{drawer}'")
+            if foundItems:
+                popup("Found", "\n".join(foundItems))
+            else:
+                message = f"Object '{searchItem}' not found"
+                suggestions = inventory.suggest(searchItem) if searchItem else {'items': [], 'drawers': []}
+                lines = [f"{name} (Quantity: {quantity}) in drawer '{drawer}'"
+                         for name, drawer, quantity in suggestions['items']]
+                lines += [f"Drawer '{drawer}' ({count} items)" for drawer, count in suggestions['drawers']]
+                if lines:
+                    message += "\n\nDid you mean:\n" + "\n".join(lines)
+                popup("Not Found", message)
+
+        elif event == "Display Drawer":
+            drawerNames = list(inventory.drawerNames())
+            if drawerNames:
+                layout = [
+                    [sg.Text('Select a drawer to display:')],
+                    [sg.Combo(drawerNames, key='-DRAWER-', readonly=True)],
+                    [sg.Button('OK'), sg.Button('Cancel')]
+                ]
+                windowSelect = sg.Window("Select Drawer", layout)
+                eventSelect, valuesSelect = windowSelect.read()
+                if eventSelect == 'OK' and valuesSelect['-DRAWER-']:
+                    drawerName = valuesSelect['-DRAWER-']
+                    if drawerName in inventory:
+                        showDrawer(drawerName, inventory.items(drawerName))
+                    else:
+                        popup("Error", f"Drawer '{drawerName}' not found")
+                windowSelect.close()
+            else:
+                popup("Error", "No drawers available to display")
+
+        elif event == "Remove Drawer":
+            drawerNames = list(inventory.drawerNames())
+            if drawerNames:
+                layout = [
+                    [sg.Text('Select a drawer to remove:')],
+                    [sg.Combo(drawerNames, key='-DRAWER-', readonly=True)],
+                    [sg.Button('OK'), sg.Button('Cancel')]
+                ]
+                windowRemove = sg.Window("Select Drawer to Remove", layout)
+                eventRemove, valuesRemove = windowRemove.read()
+                if eventRemove == 'OK' and valuesRemove['-DRAWER-']:
+                    drawerName = valuesRemove['-DRAWER-']
+                    if drawerName in inventory:
+                        items = inventory.items(drawerName)
+                        if showDrawer(drawerName, items, "Remove Drawer") and \
+                                sg.popup_yes_no(f"Are you sure you want to remove drawer '{drawerName}' and its {inventory.drawerCount(drawerName)} items?") == 'Yes':
+                            inventory.removeDrawer(drawerName)
+                            popup("Success", f"Drawer '{drawerName}' removed successfully!")
+                    else:
+                        popup("Error", f"Drawer '{drawerName}' not found")
+                windowRemove.close()
+            else:
+                popup("Error", "No drawers available to remove")
+
+        elif event == '-CHANGED-':
+            window['-CHANGES-'].update(f"Drawer '{values['-CHANGED-'][1]}' was just changed in another window")
+
+        elif event == "Summary":
+            showSummary()
+
+        elif event == "Stats":
+            showStats()
+
+        elif event in ("Undo", "Redo", "Snapshots") and closet.remote:
+            popup("Error", "Undo and snapshots are not available while closetserver.py shares the inventory")
+
+        elif event == "Undo":
+            if inventory.undo():
+                window['-CHANGES-'].update("Your last change was undone")
+            else:
+                popup("Error", "Nothing to undo")
+
+        elif event == "Redo":
+            if inventory.redo():
+                window['-CHANGES-'].update("Your last undone change was redone")
+            else:
+                popup("Error", "Nothing to redo")
+
+        elif event == "Snapshots":
+            showSnapshots()
+
+        elif event == "Tired?":
+            import subprocess  # Only needed here, so it is not imported at startup
+            subprocess.Popen(["python", "catch.py"])  # This line runs catch.py
+
+        if stockAlerts:
+            popup("Low Stock", "\n".join(stockAlerts))
+            stockAlerts.clear()
 
-    elif event == "Tired?":
-        subprocess.Popen(["python", "catch.py"])  # This line runs catch.py
+        # Write this event's edits to TinyDB; a no-op when nothing changed
+        inventory.sync()
 
 window.close()
@@ -0,0 +1,263 @@
+"""
+Serve one user's inventory to any number of GUI and command line clients.
+
+The server opens the user's data once, holds the lock on it and keeps the
+decrypted inventory in memory. Clients connect through a Unix socket (a
+localhost port where Unix sockets are not available) whose address is written
+to data/<user>.server; closetman.py and closetcli.py use it automatically while
+it runs. Requests are handled one at a time, so edits from different clients
+never overwrite each other, and every edit is pushed to the other clients.
+Every message is encrypted with the user's key, so only clients that know the
+password can connect.
+
+Usage:
+    python closetserver.py --user NAME
+
+The password is read from the CLOSETMAN_PASSWORD environment variable, or
+asked for. Stop the server with Ctrl+C; it saves before exiting.
+"""
+import argparse
+import getpass
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+
+from cryptography.fernet import InvalidToken
+
+import closetcore
+from closetcore import Closet
+
+# Edits and queries a client may call on the inventory
+inventoryMethods = {'newDrawer', 'addItem', 'removeItem', 'setQuantity', 'removeDrawer', 'checkBatch',
+                    'applyBatch', 'search', 'suggest', 'summary', 'total', 'drawerCount', 'lowStock'}
+
+
+def serverInfoPath(username):
+    """
+    Args:
+        username (str): The username to determine the file name.
+
+    Returns:
+        str: The path of the file telling clients where the server listens.
+    """
+    return os.path.join(closetcore.dataFolder, f"{username}.server")
+
+
+def sendMessage(connection, fernet, message):
+    """
+    Encrypt a message and send it as one line.
+
+    Args:
+        connection (socket.socket): The connection.
+        fernet (Fernet): The user's Fernet instance.
+        message (dict): The JSON-compatible message.
+    """
+    connection.sendall(fernet.encrypt(json.dumps(message, separators=(',', ':')).encode()) + b"\n")
+
+
+def readMessages(connection, fernet):
+    """
+    Yield the messages arriving on a connection until it is closed.
+
+    Args:
+        connection (socket.socket): The connection.
+        fernet (Fernet): The user's Fernet instance.
+
+    Yields:
+        dict: Each decrypted message.
+
+    Raises:
+        InvalidToken: If a message was not encrypted with the user's key.
+    """
+    for line in connection.makefile('rb'):
+        yield json.loads(fernet.decrypt(line.strip()))
+
+
+class InventoryServer:
+    """
+    Serves an open Closet to clients, one request at a time. The
+    notifications a request causes are queued while it is handled and sent
+    once the lock is released, so a slow client never holds up the others.
+
+    Attributes:
+        closet (Closet): The open inventory, with autosave.
+        lock (threading.Lock): Held while a request is handled.
+        broadcastLock (threading.Lock): Held while a request's notifications
+            are sent, so they go out in the order the requests were handled.
+        clients (dict): Client number -> (connection, send lock).
+        origin (int): The client whose request is being handled.
+        notifications (list): Messages queued for every client by the
+            request being handled.
+    """
+    def __init__(self, closet):
+        self.closet = closet
+        self.fernet = closet.keys.fernet()
+        self.lock = threading.Lock()
+        self.broadcastLock = threading.Lock()
+        self.clients = {}
+        self.nextClient = 1
+        self.origin = None
+        self.notifications = []
+        self.listener = None
+        self.address = None
+        self.stopped = False
+        closet.inventory.listeners.append(self._edited)
+        closet.inventory.alertListeners.append(self._alerted)
+
+    def _broadcast(self, message):
+        for connection, sendLock in list(self.clients.values()):
+            try:
+                with sendLock:
+                    sendMessage(connection, self.fernet, message)
+            except OSError:
+                pass  # Its handler notices and drops it
+
+    def _edited(self, edit):
+        self.notifications.append({'event': 'edit', 'edit': edit, 'origin': self.origin})
+
+    def _alerted(self, name, total, threshold):
+        self.notifications.append({'event': 'alert', 'alert': [name, total, threshold], 'origin': self.origin})
+
+    def _call(self, method, args):
+        inventory = self.closet.inventory
+        if method == 'contains':
+            return args[0] in inventory
+        if method == 'drawerNames':
+            return list(inventory.drawerNames())
+        if method == 'items':
+            return [dict(item) for item in inventory.items(args[0])]
+        if method == 'thresholds':
+            return inventory.thresholds
+        if method == 'setThreshold':
+            return self.closet.setThreshold(*args)
+        if method == 'save':
+            return None
+        if method not in inventoryMethods:
+            raise ValueError(f"Unknown method '{method}'")
+        result = getattr(inventory, method)(*args)
+        inventory.sync()  # Journal the edit straight away, other clients see it now
+        return result
+
+    def _handle(self, connection, client):
+        sendLock = threading.Lock()
+        try:
+            for request in readMessages(connection, self.fernet):
+                if request['method'] == 'hello':
+                    # Only now that it has proven it knows the key does it get notifications
+                    self.clients[client] = (connection, sendLock)
+                    reply = {'id': request['id'], 'result': {'client': client}}
+                else:
+                    with self.lock:
+                        try:
+                            self.origin = client
+                            reply = {'id': request['id'], 'result': self._call(request['method'], request['args'])}
+                        except Exception as e:
+                            reply = {'id': request['id'], 'error': str(e), 'type': type(e).__name__}
+                        finally:
+                            self.origin = None
+                        notifications, self.notifications = self.notifications, []
+                        # Taken before the next request can queue any, to keep them in order
+                        self.broadcastLock.acquire()
+                    try:
+                        for message in notifications:
+                            self._broadcast(message)
+                    finally:
+                        self.broadcastLock.release()
+                    if request['method'] == 'save' and self.closet.autosaver:
+                        self.closet.autosaver.flush()
+                with sendLock:
+                    sendMessage(connection, self.fernet, reply)
+        except (InvalidToken, OSError, ValueError, KeyError):
+            pass  # A client without the key, or one that went away
+        finally:
+            self.clients.pop(client, None)
+            connection.close()
+
+    def listen(self):
+        """
+        Open the socket and tell clients where it is.
+        """
+        if hasattr(socket, 'AF_UNIX'):
+            self.address = os.path.join(closetcore.dataFolder, f"{self.closet.username}.sock")
+            if os.path.exists(self.address):
+                os.remove(self.address)  # Left by a server that died; we hold the lock now
+            self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.listener.bind(self.address)
+            os.chmod(self.address, 0o600)
+        else:
+            self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.listener.bind(('127.0.0.1', 0))
+            self.address = list(self.listener.getsockname())
+        self.listener.listen()
+        info = json.dumps({'address': self.address, 'params': self.closet.keys.params})
+        infoFile = os.open(serverInfoPath(self.closet.username), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(infoFile, 'w') as file:
+            file.write(info)
+
+    def serveForever(self):
+        """
+        Accept clients, each on its own thread, until stop() is called.
+        """
+        while True:
+            try:
+                connection, _ = self.listener.accept()
+            except OSError:
+                if self.stopped:
+                    return
+                raise
+            client = self.nextClient
+            self.nextClient += 1
+            threading.Thread(target=self._handle, args=(connection, client), daemon=True).start()
+
+    def stop(self):
+        """
+        Stop accepting clients, disconnect the connected ones and remove the
+        socket and the address file. Does not close the Closet.
+        """
+        self.stopped = True
+        if self.listener is not None:
+            try:
+                self.listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.listener.close()
+        for connection, _ in list(self.clients.values()):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for path in (serverInfoPath(self.closet.username), self.address):
+            if isinstance(path, str) and os.path.exists(path):
+                os.remove(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a Closetman inventory to several clients at once.")
+    parser.add_argument('--user', required=True, help="the username whose data to serve")
+    args = parser.parse_args(argv)
+    password = os.environ.get('CLOSETMAN_PASSWORD')
+    if password is None:
+        password = getpass.getpass("Password: ")
+    try:
+        closet = Closet(args.user, password)
+    except Exception as e:
+        sys.exit(f"Could not open the data: {e}")
+    server = InventoryServer(closet)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # Save on a plain kill too
+    try:
+        server.listen()
+        print(f"Serving '{args.user}' on {server.address}. Press Ctrl+C to stop.", file=sys.stderr)
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        with server.lock:
+            closet.close()
+
+
+if __name__ == "__main__":
+    main()
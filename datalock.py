@@ -0,0 +1,65 @@
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class DataInUseError(RuntimeError):
+    """
+    Raised when another process already has a user's data open.
+    """
+
+
+class DataLock:
+    """
+    An advisory lock on a user's data, held by whichever process has it open:
+    a GUI or command line working on the files directly, or the inventory
+    server. The operating system releases it if the process dies.
+
+    Attributes:
+        path (str): The lock file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def acquire(self):
+        """
+        Take the lock without waiting.
+
+        Raises:
+            DataInUseError: If another process holds it.
+        """
+        file = open(self.path, 'a+')
+        try:
+            if fcntl:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            file.close()
+            raise DataInUseError(f"'{self.path}' is locked by another program")
+        # Record the holder, only to help whoever finds the lock taken
+        file.seek(0)
+        file.truncate()
+        file.write(str(os.getpid()))
+        file.flush()
+        self.file = file
+
+    def release(self):
+        """
+        Give the lock up. Safe to call when it is not held.
+        """
+        if self.file is None:
+            return
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
@@ -0,0 +1,106 @@
+# Rows shown per page of the drawer viewer
+pageRows = 40
+
+columns = ('name', 'quantity')
+
+
+class DrawerPager:
+    """
+    Pages through one drawer's items for the drawer viewer.
+
+    Only the rows of the current page are built. Sorting and filtering keep a
+    list of item positions instead of copying items, and with neither in
+    effect a page is a plain slice of the drawer.
+
+    Attributes:
+        items (Sequence): The drawer's items, e.g. Inventory.items(drawer).
+        pageSize (int): Rows per page.
+        sortColumn (str): 'name', 'quantity' or None for the drawer's order.
+        descending (bool): Whether the sort is reversed.
+        filterText (str): Only items whose name contains this, ignoring case.
+        pageNumber (int): The current page, from 0.
+    """
+    def __init__(self, items, pageSize=pageRows):
+        self.items = items
+        self.pageSize = pageSize
+        self.sortColumn = None
+        self.descending = False
+        self.filterText = ""
+        self.pageNumber = 0
+        self.positions = None  # Item positions in display order, None for all of them in order
+
+    def _refresh(self):
+        if self.sortColumn is None and not self.filterText:
+            self.positions = None
+        else:
+            text = self.filterText.lower()
+            positions = [position for position, item in enumerate(self.items)
+                         if text in item['name'].lower()] if text else list(range(len(self.items)))
+            if self.sortColumn == 'name':
+                positions.sort(key=lambda position: self.items[position]['name'].lower(), reverse=self.descending)
+            elif self.sortColumn == 'quantity':
+                positions.sort(key=lambda position: self.items[position]['quantity'], reverse=self.descending)
+            self.positions = positions
+        self.pageNumber = 0
+
+    def __len__(self):
+        return len(self.items) if self.positions is None else len(self.positions)
+
+    def pageCount(self):
+        """
+        Returns:
+            int: The number of pages, at least 1.
+        """
+        return max(1, -(-len(self) // self.pageSize))
+
+    def setFilter(self, text):
+        """
+        Show only the items whose name contains text, ignoring case, and go
+        back to the first page.
+
+        Args:
+            text (str): The filter text, empty to show every item.
+        """
+        if text != self.filterText:
+            self.filterText = text
+            self._refresh()
+
+    def sortBy(self, column):
+        """
+        Sort by a column, or reverse the sort if it is already sorted by it,
+        and go back to the first page.
+
+        Args:
+            column (str): 'name' or 'quantity'.
+        """
+        self.descending = not self.descending if column == self.sortColumn else False
+        self.sortColumn = column
+        self._refresh()
+
+    def turn(self, pages):
+        """
+        Move forward or back, stopping at the first and last page.
+
+        Args:
+            pages (int): The number of pages to move, negative to go back.
+        """
+        self.pageNumber = min(max(self.pageNumber + pages, 0), self.pageCount() - 1)
+
+    def rows(self):
+        """
+        Returns:
+            list: [name, quantity] rows for the current page.
+        """
+        start = self.pageNumber * self.pageSize
+        if self.positions is None:
+            page = self.items[start:start + self.pageSize]
+        else:
+            page = [self.items[position] for position in self.positions[start:start + self.pageSize]]
+        return [[item['name'], item['quantity']] for item in page]
+
+    def status(self):
+        """
+        Returns:
+            str: The current page and item count, for the viewer's status line.
+        """
+        return f"Page {self.pageNumber + 1} of {self.pageCount()} ({len(self)} items)"
@@ -0,0 +1,354 @@
+# Undo steps kept before the oldest is forgotten
+historyLimit = 500
+
+# A hash trie node has 2 ** trieBits children
+trieBits = 5
+_width = 1 << trieBits
+_mask = _width - 1
+_missing = object()
+
+
+class _Leaf:
+    """
+    The (key, value) pairs whose keys share one hash.
+    """
+    __slots__ = ('hash', 'pairs')
+
+    def __init__(self, keyHash, pairs):
+        self.hash = keyHash
+        self.pairs = pairs
+
+
+def _hash(key):
+    return hash(key) & 0xFFFFFFFFFFFFFFFF
+
+
+def _get(node, keyHash, key, shift):
+    while node is not None:
+        if isinstance(node, _Leaf):
+            if node.hash == keyHash:
+                for pairKey, value in node.pairs:
+                    if pairKey == key:
+                        return value
+            return _missing
+        node = node[(keyHash >> shift) & _mask]
+        shift += trieBits
+    return _missing
+
+
+def _set(node, keyHash, key, value, shift):
+    if node is None:
+        return _Leaf(keyHash, ((key, value),)), True
+    if isinstance(node, _Leaf):
+        if node.hash == keyHash:
+            pairs = tuple(pair for pair in node.pairs if pair[0] != key)
+            return _Leaf(keyHash, pairs + ((key, value),)), len(pairs) == len(node.pairs)
+        # Two hashes meet: push the leaf down a level and try again
+        branch = [None] * _width
+        branch[(node.hash >> shift) & _mask] = node
+        return _set(tuple(branch), keyHash, key, value, shift)
+    position = (keyHash >> shift) & _mask
+    child, added = _set(node[position], keyHash, key, value, shift + trieBits)
+    return node[:position] + (child,) + node[position + 1:], added
+
+
+def _remove(node, keyHash, key, shift):
+    if node is None:
+        return None, False
+    if isinstance(node, _Leaf):
+        if node.hash != keyHash:
+            return node, False
+        pairs = tuple(pair for pair in node.pairs if pair[0] != key)
+        if len(pairs) == len(node.pairs):
+            return node, False
+        return (_Leaf(keyHash, pairs) if pairs else None), True
+    position = (keyHash >> shift) & _mask
+    child, removed = _remove(node[position], keyHash, key, shift + trieBits)
+    if not removed:
+        return node, False
+    node = node[:position] + (child,) + node[position + 1:]
+    children = [child for child in node if child is not None]
+    if not children:
+        return None, True
+    if len(children) == 1 and isinstance(children[0], _Leaf):
+        return children[0], True  # A lone leaf moves back up
+    return node, True
+
+
+def _pairs(node):
+    if node is None:
+        return
+    if isinstance(node, _Leaf):
+        yield from node.pairs
+        return
+    for child in node:
+        yield from _pairs(child)
+
+
+def _diff(old, new, changes):
+    if old is new:
+        return  # Shared by both versions, so nothing below differs
+    if isinstance(old, tuple) and isinstance(new, tuple):
+        for oldChild, newChild in zip(old, new):
+            _diff(oldChild, newChild, changes)
+        return
+    oldPairs = dict(_pairs(old))
+    for key, value in _pairs(new):
+        before = oldPairs.pop(key, _missing)
+        if before is not value:
+            changes.append((key, before, value))
+    changes.extend((key, value, _missing) for key, value in oldPairs.items())
+
+
+class PersistentMap:
+    """
+    An immutable mapping kept as a hash trie. set() and remove() return a
+    new map that shares every node off the changed path with the old one,
+    so a version costs memory for what changed, not for the whole map, and
+    two versions are compared by skipping the nodes they share.
+    """
+    __slots__ = ('_root', '_size')
+
+    def __init__(self, root=None, size=0):
+        self._root = root
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return _get(self._root, _hash(key), key, 0) is not _missing
+
+    def get(self, key, default=None):
+        value = _get(self._root, _hash(key), key, 0)
+        return default if value is _missing else value
+
+    def items(self):
+        return _pairs(self._root)
+
+    def set(self, key, value):
+        """
+        Returns:
+            PersistentMap: A map with key set to value.
+        """
+        root, added = _set(self._root, _hash(key), key, value, 0)
+        return PersistentMap(root, self._size + added)
+
+    def remove(self, key):
+        """
+        Returns:
+            PersistentMap: A map without key; this map if key is absent.
+        """
+        root, removed = _remove(self._root, _hash(key), key, 0)
+        return PersistentMap(root, self._size - 1) if removed else self
+
+    def diff(self, other):
+        """
+        Find the keys whose values differ from another map's, by identity.
+
+        Args:
+            other (PersistentMap): The newer map.
+
+        Returns:
+            list: (key, value here, value in other) tuples, with None for
+                a key missing on one side.
+        """
+        changes = []
+        _diff(self._root, other._root, changes)
+        return [(key, None if old is _missing else old, None if new is _missing else new)
+                for key, old, new in changes]
+
+
+class Unloaded:
+    """
+    Stands in for a drawer that has not been decrypted yet. Every version
+    shares the one placeholder, so once the drawer is loaded, which always
+    happens before it is first changed, they all see its contents.
+
+    Attributes:
+        items (tuple): The drawer's frozen items, None until it is loaded.
+    """
+    __slots__ = ('items',)
+
+    def __init__(self):
+        self.items = None
+
+
+def freeze(items):
+    """
+    Args:
+        items (list): A drawer's item dicts.
+
+    Returns:
+        tuple: (name, quantity) tuples, safe to share between versions.
+    """
+    return tuple((item['name'], item['quantity']) for item in items)
+
+
+def thaw(items):
+    """
+    Args:
+        items (tuple or Unloaded): A drawer's frozen items.
+
+    Returns:
+        list: The item dicts.
+    """
+    return [{'name': name, 'quantity': quantity} for name, quantity in contents(items)]
+
+
+def contents(items):
+    """
+    Args:
+        items (tuple or Unloaded): A drawer's frozen items.
+
+    Returns:
+        tuple: The (name, quantity) tuples.
+    """
+    return items.items if isinstance(items, Unloaded) else items
+
+
+def changes(old, new):
+    """
+    List what changed between two versions of the closet, item by item.
+    Items with the same name in one drawer are counted together.
+
+    Args:
+        old (PersistentMap): The earlier version.
+        new (PersistentMap): The later version.
+
+    Returns:
+        list: (drawer, name, quantity before, quantity after) tuples by drawer
+            and name, with None where the item was missing.
+    """
+    rows = []
+    for drawer, before, after in old.diff(new):
+        quantities = [{}, {}]
+        for side, items in enumerate((before, after)):
+            for name, quantity in contents(items) if items is not None else ():
+                quantities[side][name] = quantities[side].get(name, 0) + quantity
+        for name in quantities[0].keys() | quantities[1].keys():
+            then, now = quantities[0].get(name), quantities[1].get(name)
+            if then != now:
+                rows.append((drawer, name, then, now))
+    return sorted(rows)
+
+
+class History:
+    """
+    The versions of an Inventory for undo and redo. A version maps each
+    drawer name to its frozen items; one is committed at each sync, so an
+    undo step is everything one GUI action did.
+
+    Attributes:
+        current (PersistentMap): The version the inventory is at.
+        undoStack (list): Earlier versions, the newest last.
+        redoStack (list): Undone versions, the most recently undone last.
+        touched (set): Drawers edited since the last commit.
+        unloaded (dict): Drawer name -> the Unloaded placeholder it still has.
+        limit (int): The number of undo steps kept.
+    """
+    def __init__(self, drawers, limit=historyLimit):
+        self.unloaded = {}
+        current = PersistentMap()
+        for drawer, items in drawers.items():
+            if items is None:
+                self.unloaded[drawer] = Unloaded()
+                current = current.set(drawer, self.unloaded[drawer])
+            else:
+                current = current.set(drawer, freeze(items))
+        self.current = current
+        self.undoStack = []
+        self.redoStack = []
+        self.touched = set()
+        self.limit = limit
+
+    def loaded(self, drawer, items):
+        """
+        Fill in the placeholder of a drawer that has just been decrypted.
+        """
+        placeholder = self.unloaded.pop(drawer, None)
+        if placeholder is not None:
+            placeholder.items = freeze(items)
+
+    def commit(self, drawers):
+        """
+        Make a new version from the drawers touched since the last commit.
+
+        Args:
+            drawers (dict): The inventory's drawer name -> item dicts.
+        """
+        if not self.touched:
+            return
+        version = self.current
+        for drawer in self.touched:
+            if drawer in drawers:
+                version = version.set(drawer, freeze(drawers[drawer]))
+            else:
+                version = version.remove(drawer)
+        self.touched.clear()
+        self.push(version)
+
+    def push(self, version):
+        """
+        Move to a new version, keeping the current one to undo to.
+        """
+        self.undoStack.append(self.current)
+        if len(self.undoStack) > self.limit:
+            del self.undoStack[0]
+        self.redoStack.clear()
+        self.current = version
+
+    def back(self):
+        """
+        Move to the newest version on the undo stack.
+        """
+        self.redoStack.append(self.current)
+        self.current = self.undoStack.pop()
+
+    def forward(self):
+        """
+        Move to the most recently undone version.
+        """
+        self.undoStack.append(self.current)
+        self.current = self.redoStack.pop()
+
+
+def packSnapshots(snapshots):
+    """
+    Turn named versions into JSON-compatible data for saving. Drawers with the
+    same contents in several snapshots are stored once.
+
+    Args:
+        snapshots (dict): Name -> (time taken, PersistentMap). Every drawer
+            in them must have been loaded.
+
+    Returns:
+        dict: 'contents', a list of item lists, and 'snapshots', name ->
+            {'time', 'drawers': drawer name -> position in contents}.
+    """
+    positions = {}
+    packed = {}
+    for name, (taken, version) in snapshots.items():
+        drawers = {}
+        for drawer, items in version.items():
+            drawers[drawer] = positions.setdefault(contents(items), len(positions))
+        packed[name] = {'time': taken, 'drawers': drawers}
+    return {'contents': [[list(item) for item in items] for items in positions], 'snapshots': packed}
+
+
+def unpackSnapshots(data):
+    """
+    Args:
+        data (dict): The data written by packSnapshots.
+
+    Returns:
+        dict: Name -> (time taken, PersistentMap).
+    """
+    shared = [tuple(tuple(item) for item in items) for items in data['contents']]
+    snapshots = {}
+    for name, snapshot in data['snapshots'].items():
+        version = PersistentMap()
+        for drawer, position in snapshot['drawers'].items():
+            version = version.set(drawer, shared[position])
+        snapshots[name] = (snapshot['time'], version)
+    return snapshots
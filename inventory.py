@@ -0,0 +1,473 @@
+import threading
+from collections.abc import Sequence
+from types import MappingProxyType
+
+import stats
+from history import History, contents, thaw
+from itemindex import ItemIndex, NameGrams, fuzzyLimit
+
+
+class ItemsView(Sequence):
+    """
+    A read-only view of one drawer's item list that does not copy it.
+    """
+    def __init__(self, items):
+        self._items = items
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [MappingProxyType(item) for item in self._items[position]]
+        return MappingProxyType(self._items[position])
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Inventory:
+    """
+    The long-lived in-memory model of a user's drawers.
+
+    It is loaded from the store once, mutated in place by the GUI handlers and
+    keeps the item-name index in step. Only the drawer names are read up
+    front; a drawer's items are loaded the first time it is touched, and a
+    search loads whatever is left. Edits are queued and only written to the
+    store when sync() is called while the model is dirty.
+
+    Attributes:
+        store (TinyDBStore or SegmentedStore): Where synced edits are written.
+        drawers (dict): Drawer name -> list of item dicts, None until loaded.
+        index (ItemIndex): The item-name index over the loaded drawers.
+        drawerIndex (NameGrams): The n-gram index over the drawer names.
+        pending (list): Edits not yet written to the store. Each edit is a list
+            holding a store method name followed by its arguments.
+        listeners (list): Callables given each edit once it has been synced.
+        lock (threading.Lock): Held while the store is read or edited, so
+            another thread can capture the store in a consistent state.
+        thresholds (dict): Item name -> the total quantity below which it is low on stock.
+        alertListeners (list): Callables given (name, total, threshold) when an
+            edit takes an item's total below its threshold.
+        history (History): The versions for undo and redo, None until
+            enableHistory() is called.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.drawers = dict.fromkeys(store.drawerNames())
+        self.index = ItemIndex()
+        self.drawerIndex = NameGrams(self.drawers)
+        self.allLoaded = not self.drawers
+        self.pending = []
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.thresholds = {}
+        self.alertListeners = []
+        self.history = None
+
+    @property
+    def dirty(self):
+        return bool(self.pending)
+
+    def __contains__(self, drawer):
+        return drawer in self.drawers
+
+    def _read(self, drawer):
+        with self.lock:  # The autosave worker may be writing to the store
+            items = [dict(item) for item in self.store.loadDrawer(drawer)]
+        self.drawers[drawer] = items
+        if self.history is not None:
+            self.history.loaded(drawer, items)
+        return items
+
+    def _load(self, drawer):
+        items = self.drawers[drawer]
+        if items is None:
+            items = self._read(drawer)
+            self.index.addDrawer(drawer, items)
+        return items
+
+    def loadAll(self):
+        """
+        Load every drawer that has not been loaded yet.
+        """
+        if not self.allLoaded:
+            unloaded = [drawer for drawer, items in self.drawers.items() if items is None]
+            self.index.addDrawers({drawer: self._read(drawer) for drawer in unloaded})
+            self.allLoaded = True
+
+    def _stockBefore(self, names):
+        watched = [name for name in names if name in self.thresholds]
+        if watched:
+            self.loadAll()  # Totals are only exact once every drawer is counted
+        return {name: self.index.totals.get(name, 0) for name in watched}
+
+    def _alert(self, before):
+        for name, total in before.items():
+            after = self.index.totals.get(name, 0)
+            threshold = self.thresholds[name]
+            if total >= threshold > after:
+                for listener in self.alertListeners:
+                    listener(name, after, threshold)
+
+    def _touch(self, drawer):
+        if self.history is not None:
+            self.history.touched.add(drawer)
+
+    def _drawerStockBefore(self, drawer):
+        if not self.thresholds or drawer not in self.drawers:
+            return {}
+        return self._stockBefore({item['name'] for item in self._load(drawer)})
+
+    def drawerNames(self):
+        """
+        Returns:
+            KeysView: A live view of the drawer names.
+        """
+        return self.drawers.keys()
+
+    def items(self, drawer):
+        """
+        Args:
+            drawer (str): The drawer name.
+
+        Returns:
+            ItemsView: A read-only view of the drawer's items.
+        """
+        return ItemsView(self._load(drawer))
+
+    def newDrawer(self, drawer, items):
+        """
+        Create a drawer, or overwrite it if it already exists.
+
+        Args:
+            drawer (str): The drawer name.
+            items (list): The drawer's item dicts.
+        """
+        items = [dict(item) for item in items]
+        before = self._drawerStockBefore(drawer)
+        if self.history is not None and drawer in self.drawers:
+            self._load(drawer)  # Undo needs what is overwritten
+        if self.drawers.get(drawer) is not None:
+            self.index.removeDrawer(drawer, self.drawers[drawer])
+        if drawer not in self.drawers:
+            self.drawerIndex.add(drawer)
+        self.drawers[drawer] = items
+        self.index.addDrawer(drawer, items)
+        # Queue a copy, later edits to the drawer are queued separately
+        self.pending.append(["upsertDrawer", drawer, [dict(item) for item in items]])
+        self._touch(drawer)
+        self._alert(before)
+
+    def addItem(self, drawer, name, quantity):
+        """
+        Append an item to an existing drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            name (str): The item name.
+            quantity (int): The item quantity.
+        """
+        self._load(drawer).append({'name': name, 'quantity': quantity})
+        self.index.addItem(drawer, name, quantity)
+        self.pending.append(["addItem", drawer, name, quantity])
+        self._touch(drawer)
+
+    def removeItem(self, drawer, name):
+        """
+        Remove the first item with this name from a drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            name (str): The item name.
+
+        Returns:
+            bool: True if an item was removed.
+        """
+        before = self._stockBefore([name])
+        items = self._load(drawer)
+        for position, item in enumerate(items):
+            if item['name'] == name:
+                del items[position]
+                self.index.removeItem(drawer, name)
+                self.pending.append(["removeItem", drawer, name])
+                self._touch(drawer)
+                self._alert(before)
+                return True
+        return False
+
+    def setQuantity(self, drawer, name, quantity):
+        """
+        Change the quantity of the first item with this name in a drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            name (str): The item name.
+            quantity (int): The new quantity.
+
+        Returns:
+            bool: True if the item was found.
+        """
+        before = self._stockBefore([name])
+        for item in self._load(drawer):
+            if item['name'] == name:
+                item['quantity'] = quantity
+                self.index.setQuantity(drawer, name, quantity)
+                self.pending.append(["setQuantity", drawer, name, quantity])
+                self._touch(drawer)
+                self._alert(before)
+                return True
+        return False
+
+    def _planBatch(self, rows):
+        firsts = {}  # Drawer -> item name -> quantity of the first item with that name
+        before = {}
+        quantities = {}
+        errors = []
+        for position, (drawer, name, quantity, relative) in enumerate(rows):
+            if (drawer, name) not in quantities:
+                if drawer not in firsts:
+                    items = self._load(drawer) if drawer in self.drawers else []
+                    firsts[drawer] = {item['name']: item['quantity'] for item in reversed(items)}
+                before[drawer, name] = quantities[drawer, name] = firsts[drawer].get(name)
+            if relative:
+                if quantities[drawer, name] is None:
+                    errors.append((position, f"item '{name}' not found in drawer '{drawer}'"))
+                    continue
+                quantity += quantities[drawer, name]
+            if quantity < 0:
+                errors.append((position, f"'{name}' in drawer '{drawer}' would drop to {quantity}"))
+                continue
+            quantities[drawer, name] = quantity
+        return before, quantities, errors
+
+    def checkBatch(self, rows):
+        """
+        Check a batch of item edits without changing anything. Rows are
+        checked in order, each on top of the ones before it.
+
+        Args:
+            rows (list): (drawer, name, quantity, relative) rows. A relative
+                row adds its quantity, which may be negative, to an existing
+                item; any other sets the item's quantity, adding the item and
+                its drawer if they do not exist yet.
+
+        Returns:
+            list: (position in rows, message) tuples for the rows that cannot
+                be applied, empty if the whole batch can.
+        """
+        return self._planBatch(rows)[2]
+
+    @stats.timed("Inventory.applyBatch")
+    def applyBatch(self, rows):
+        """
+        Apply a batch of item edits as a whole, or not at all if any row
+        cannot be applied. Each item and each new drawer is edited once, with
+        its final quantities, and the edits are queued together, so the next
+        sync writes the batch in one step and undo takes it back in one.
+
+        Args:
+            rows (list): (drawer, name, quantity, relative) rows, as for checkBatch().
+
+        Returns:
+            list: The errors checkBatch() would return; nothing was changed
+                unless it is empty.
+        """
+        before, quantities, errors = self._planBatch(rows)
+        if errors:
+            return errors
+        newDrawers = {}
+        for (drawer, name), quantity in quantities.items():
+            if drawer not in self.drawers:
+                newDrawers.setdefault(drawer, []).append({'name': name, 'quantity': quantity})
+            elif before[drawer, name] is None:
+                self.addItem(drawer, name, quantity)
+            elif before[drawer, name] != quantity:
+                self.setQuantity(drawer, name, quantity)
+        for drawer, items in newDrawers.items():
+            self.newDrawer(drawer, items)
+        return errors
+
+    def removeDrawer(self, drawer):
+        """
+        Delete a drawer and all of its items.
+
+        Args:
+            drawer (str): The drawer name.
+        """
+        before = self._drawerStockBefore(drawer)
+        if self.history is not None:
+            self._load(drawer)  # Undo needs what is removed
+        items = self.drawers.pop(drawer)
+        self.drawerIndex.drop(drawer)
+        if items is not None:
+            self.index.removeDrawer(drawer, items)
+        self.pending.append(["deleteDrawer", drawer])
+        self._touch(drawer)
+        self._alert(before)
+
+    def summary(self):
+        """
+        Count the whole closet. The counts are kept up to date by every edit,
+        so after the first call, which loads any drawers not loaded yet, this
+        takes the same time whatever the closet's size.
+
+        Returns:
+            dict: 'drawers', 'items', 'names' (distinct item names) and
+                'quantity' (the sum of every item's quantity).
+        """
+        self.loadAll()
+        return {'drawers': len(self.drawers), 'items': self.index.itemCount,
+                'names': len(self.index.totals), 'quantity': self.index.quantityTotal}
+
+    def total(self, name):
+        """
+        Args:
+            name (str): The item name.
+
+        Returns:
+            int: The item's total quantity over every drawer.
+        """
+        self.loadAll()
+        return self.index.totals.get(name, 0)
+
+    def drawerCount(self, drawer):
+        """
+        Args:
+            drawer (str): The drawer name.
+
+        Returns:
+            int: The number of items in the drawer.
+        """
+        self._load(drawer)
+        return self.index.drawerCounts.get(drawer, 0)
+
+    def lowStock(self):
+        """
+        Returns:
+            list: (name, total, threshold) tuples for the items whose total is
+                below their threshold, by name.
+        """
+        self.loadAll()
+        return sorted((name, self.index.totals.get(name, 0), threshold)
+                      for name, threshold in self.thresholds.items()
+                      if self.index.totals.get(name, 0) < threshold)
+
+    @stats.timed("Inventory.search")
+    def search(self, query):
+        """
+        Find items by exact name, falling back to case-insensitive prefix and
+        then substring matches when nothing has exactly that name.
+
+        Args:
+            query (str): The text to search for.
+
+        Returns:
+            list: (name, drawer, quantity) tuples.
+        """
+        if not self.allLoaded and not self.pending and hasattr(self.store, 'findItem'):
+            # Stores with a name index answer exact matches without decrypting every drawer
+            with self.lock:
+                matches = [(query, drawer, quantity) for drawer, quantity in self.store.findItem(query)]
+            if matches:
+                return matches
+        self.loadAll()
+        matches = self.index.exact(query)
+        if not matches:
+            matches = self.index.prefix(query)
+            prefixNames = {match[0] for match in matches}
+            matches += [match for match in self.index.substring(query) if match[0] not in prefixNames]
+        return matches
+
+    @stats.timed("Inventory.suggest")
+    def suggest(self, query, limit=fuzzyLimit):
+        """
+        Find the items and drawers whose names are most like the query,
+        allowing for typos, for a "did you mean" list when a search finds
+        nothing.
+
+        Args:
+            query (str): The text to look for.
+            limit (int): The most item names, and the most drawers, to return.
+
+        Returns:
+            dict: 'items', (name, drawer, quantity) tuples for the closest item
+                names, and 'drawers', (drawer, number of items) tuples for the
+                closest drawer names, the closest first.
+        """
+        self.loadAll()
+        drawers = [(drawer, self.index.drawerCounts.get(drawer, 0))
+                   for _, names in self.drawerIndex.fuzzy(query, limit) for drawer in names]
+        return {'items': self.index.fuzzy(query, limit), 'drawers': drawers[:limit]}
+
+    def enableHistory(self, limit=None):
+        """
+        Start keeping versions for undo() and redo(). Each version only holds
+        the drawers that changed and shares the rest with the one before.
+
+        Args:
+            limit (int): The number of undo steps kept, historyLimit by default.
+        """
+        if self.history is None:
+            self.sync()
+            self.history = History(self.drawers) if limit is None else History(self.drawers, limit)
+
+    def restore(self, version):
+        """
+        Bring the drawers back to a version, through the usual edits, so the
+        change is journaled and reaches the store and listeners at the next
+        sync. The caller then moves the history to the version.
+
+        Args:
+            version (PersistentMap): Drawer name -> frozen items.
+        """
+        for drawer, now, then in self.history.current.diff(version):
+            if then is None:
+                self.removeDrawer(drawer)
+            elif now is None or contents(now) != contents(then):
+                self.newDrawer(drawer, thaw(then))
+        self.history.touched.clear()  # Not a new version
+
+    def undo(self):
+        """
+        Undo the edits made before the last sync, such as one GUI action.
+
+        Returns:
+            bool: False if there was nothing to undo.
+        """
+        self.sync()
+        if not self.history.undoStack:
+            return False
+        self.restore(self.history.undoStack[-1])
+        self.history.back()
+        self.sync()
+        return True
+
+    def redo(self):
+        """
+        Redo the edits the last undo() took back.
+
+        Returns:
+            bool: False if there was nothing to redo.
+        """
+        self.sync()
+        if not self.history.redoStack:
+            return False
+        self.restore(self.history.redoStack[-1])
+        self.history.forward()
+        self.sync()
+        return True
+
+    @stats.timed("Inventory.sync")
+    def sync(self):
+        """
+        Write the pending edits to the store, if there are any, and pass each
+        one on to the listeners. With history on, they become one undo step.
+        """
+        if self.history is not None:
+            self.history.commit(self.drawers)
+        if not self.pending:
+            return
+        with self.lock:
+            for edit in self.pending:
+                getattr(self.store, edit[0])(*edit[1:])
+                for listener in self.listeners:
+                    listener(edit)
+        self.pending = []
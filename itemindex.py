@@ -0,0 +1,395 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
+
+# Longest n-gram stored for substring queries. Queries shorter than this are
+# answered straight from the gram table, longer ones by intersecting grams.
+gramSize = 3
+
+# Names a fuzzy search returns, and the trigram similarity a name needs to be one
+fuzzyLimit = 5
+fuzzySimilarity = 0.3
+# Names a fuzzy search draws from its rarest grams' posting lists, and how many
+# of them are shortlisted by their shared gram count for an exact comparison.
+# Whole posting lists are drawn, so the last one can go far past the budget: a
+# query made only of grams most names have draws most names. Cutting that list
+# short at the budget instead misses many of the names a full scan finds.
+fuzzyBudget = 1000
+fuzzyShortlist = 50
+
+
+def nameGrams(name, size=gramSize):
+    """
+    Collect every n-gram of length 1 up to size that occurs in a name.
+
+    Args:
+        name (str): The lowercased item name.
+        size (int): The longest gram to collect.
+
+    Returns:
+        set: The grams found in the name.
+    """
+    grams = set()
+    for length in range(1, size + 1):
+        for start in range(len(name) - length + 1):
+            grams.add(name[start:start + length])
+    return grams
+
+
+def fuzzyGrams(key, size=gramSize):
+    """
+    Collect the grams of one length in a name, for fuzzy comparisons.
+
+    Args:
+        key (str): The lowercased name or query.
+        size (int): The gram length.
+
+    Returns:
+        set: The distinct grams of that length in the key.
+    """
+    return {key[start:start + size] for start in range(len(key) - size + 1)}
+
+
+def similarity(grams, otherGrams):
+    """
+    Measure how alike two names are by the grams they share.
+
+    Args:
+        grams (set): One name's grams, from fuzzyGrams().
+        otherGrams (set): The other name's grams, of the same length.
+
+    Returns:
+        float: The Dice coefficient of two gram sets, from 0 for nothing
+            shared to 1 for the same grams.
+    """
+    if not grams or not otherGrams:
+        return 0.0
+    return 2 * len(grams & otherGrams) / (len(grams) + len(otherGrams))
+
+
+class NameGrams:
+    """
+    An n-gram index over a changing set of names, for substring and
+    typo-tolerant searches that ignore case.
+
+    Attributes:
+        folded (dict): Maps a lowercased name to the set of exact names folding to it.
+        grams (dict): Maps an n-gram to the set of lowercased names containing it.
+    """
+    def __init__(self, names=()):
+        self.folded = {}
+        self.grams = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.folded)
+
+    def add(self, name):
+        """
+        Args:
+            name (str): The name to index.
+
+        Returns:
+            bool: Whether no name folding to the same lowercased one was indexed before.
+        """
+        key = name.lower()
+        added = key not in self.folded
+        if added:
+            self.folded[key] = set()
+            for gram in nameGrams(key):
+                self.grams.setdefault(gram, set()).add(key)
+        self.folded[key].add(name)
+        return added
+
+    def drop(self, name):
+        """
+        Args:
+            name (str): An indexed name.
+
+        Returns:
+            bool: Whether it was the last name folding to its lowercased one.
+        """
+        key = name.lower()
+        names = self.folded[key]
+        names.discard(name)
+        if names:
+            return False
+        del self.folded[key]
+        for gram in nameGrams(key):
+            keys = self.grams[gram]
+            keys.discard(key)
+            if not keys:
+                del self.grams[gram]
+        return True
+
+    def fuzzy(self, query, limit=fuzzyLimit, minimum=fuzzySimilarity):
+        """
+        Find the names most like the query, by the trigrams they share, so
+        that typos, missing words and swapped words still find them.
+
+        Queries are compared by trigrams, or by bigrams when they are too short
+        to have more than one. Candidates are drawn from the posting lists of
+        the query's rarest grams, whole lists at a time until about
+        fuzzyBudget names are drawn, since a gram found in a great many names
+        says little about which one was meant. Their grams shared with the
+        query, from every posting list, are then counted with set
+        intersections, and only the fuzzyShortlist most alike are compared
+        exactly. A query with a rare gram is cheap however many names there
+        are, but one whose grams are all common draws every name holding
+        them, so in the worst case it costs as much as reading every name.
+        Ties are broken by name, so the result does not depend on the order
+        sets are iterated in.
+
+        Args:
+            query (str): The text to look for.
+            limit (int): The most lowercased names to return.
+            minimum (float): The least similarity a name needs.
+
+        Returns:
+            list: (similarity, exact names) tuples, most similar first; the
+                exact names are those folding to one lowercased name, sorted.
+        """
+        query = query.lower()
+        size = gramSize if len(query) > gramSize else 2
+        grams = fuzzyGrams(query, size)
+        postings = [self.grams[gram] for gram in sorted(grams) if gram in self.grams]
+        postings.sort(key=len)
+        candidates = set()
+        for posting in postings:
+            if len(candidates) >= fuzzyBudget:
+                break
+            candidates |= posting
+        shared = Counter()
+        for posting in postings:
+            shared.update(candidates & posting)
+
+        def likeness(pair):
+            # A name's gram count is its length less size - 1, unless it repeats a gram
+            key, count = pair
+            return 2 * count / (len(grams) + max(len(key) - size + 1, 1)), key
+
+        ranked = []
+        for key, _ in heapq.nlargest(fuzzyShortlist, shared.items(), key=likeness):
+            score = similarity(grams, fuzzyGrams(key, size))
+            if score >= minimum:
+                ranked.append((-score, key))
+        return [(-score, sorted(self.folded[key])) for score, key in sorted(ranked)[:limit]]
+
+
+class ItemIndex:
+    """
+    An inverted index from item names to the drawers holding them.
+
+    Attributes:
+        locations (dict): Maps an item name to a dict of drawer name -> list of
+            quantities, in the same order as the items appear in the drawer.
+        names (NameGrams): The n-gram index over the item names.
+        sortedNames (list): The lowercased names in sorted order, for prefix queries.
+        totals (dict): Maps an item name to its total quantity over all drawers.
+        drawerCounts (dict): Maps a drawer name to its number of items, for
+            drawers that have any.
+        itemCount (int): The number of items over all drawers.
+        quantityTotal (int): The sum of every item's quantity.
+        bulkLoading (bool): True while addDrawers() runs, when sortedNames is
+            left alone until every name is in.
+    """
+    def __init__(self, data=None):
+        self.locations = {}
+        self.names = NameGrams()
+        self.sortedNames = []
+        self.totals = {}
+        self.drawerCounts = {}
+        self.itemCount = 0
+        self.quantityTotal = 0
+        self.bulkLoading = False
+        if data:
+            self.addDrawers(data)
+
+    def _addName(self, name):
+        if self.names.add(name) and not self.bulkLoading:
+            insort(self.sortedNames, name.lower())
+
+    def _dropName(self, name):
+        if self.names.drop(name):
+            del self.sortedNames[bisect_left(self.sortedNames, name.lower())]
+
+    def addItem(self, drawer, name, quantity):
+        """
+        Record an item appended to the end of a drawer.
+
+        Args:
+            drawer (str): The drawer the item was added to.
+            name (str): The item name.
+            quantity (int): The item quantity.
+        """
+        if name not in self.locations:
+            self.locations[name] = {}
+            self._addName(name)
+        self.locations[name].setdefault(drawer, []).append(quantity)
+        self._count(drawer, name, 1, quantity)
+
+    def _count(self, drawer, name, items, quantity):
+        self.totals[name] = self.totals.get(name, 0) + quantity
+        self.drawerCounts[drawer] = self.drawerCounts.get(drawer, 0) + items
+        if not self.drawerCounts[drawer]:
+            del self.drawerCounts[drawer]
+        self.itemCount += items
+        self.quantityTotal += quantity
+
+    def removeItem(self, drawer, name):
+        """
+        Forget the first item with this name in a drawer.
+
+        Args:
+            drawer (str): The drawer the item was removed from.
+            name (str): The item name.
+        """
+        drawers = self.locations.get(name)
+        if not drawers or drawer not in drawers:
+            return
+        quantities = drawers[drawer]
+        self._count(drawer, name, -1, -quantities.pop(0))
+        if not quantities:
+            del drawers[drawer]
+        if not drawers:
+            del self.locations[name]
+            del self.totals[name]
+            self._dropName(name)
+
+    def setQuantity(self, drawer, name, quantity):
+        """
+        Record a new quantity for the first item with this name in a drawer.
+
+        Args:
+            drawer (str): The drawer holding the item.
+            name (str): The item name.
+            quantity (int): The new quantity.
+        """
+        quantities = self.locations[name][drawer]
+        self._count(drawer, name, 0, quantity - quantities[0])
+        quantities[0] = quantity
+
+    def addDrawer(self, drawer, items):
+        """
+        Record every item of a newly created drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            items (list): The drawer's item dicts.
+        """
+        for item in items:
+            self.addItem(drawer, item['name'], item['quantity'])
+
+    def addDrawers(self, data):
+        """
+        Record many drawers at once, sorting the names once at the end instead
+        of inserting them one by one.
+
+        Args:
+            data (dict): Drawer name -> list of item dicts.
+        """
+        self.bulkLoading = True
+        for drawer, items in data.items():
+            self.addDrawer(drawer, items)
+        self.bulkLoading = False
+        self.sortedNames = sorted(self.names.folded)
+
+    def removeDrawer(self, drawer, items):
+        """
+        Forget every item of a drawer that is being removed or overwritten.
+
+        Args:
+            drawer (str): The drawer name.
+            items (list): The drawer's item dicts.
+        """
+        for item in items:
+            self.removeItem(drawer, item['name'])
+
+    def _matches(self, names):
+        matches = []
+        for name in names:
+            for drawer, quantities in self.locations[name].items():
+                for quantity in quantities:
+                    matches.append((name, drawer, quantity))
+        return matches
+
+    def exact(self, name):
+        """
+        Find every item with exactly this name.
+
+        Args:
+            name (str): The item name.
+
+        Returns:
+            list: (name, drawer, quantity) tuples.
+        """
+        if name not in self.locations:
+            return []
+        return self._matches([name])
+
+    def prefix(self, query):
+        """
+        Find every item whose name starts with the query, ignoring case.
+
+        Args:
+            query (str): The name prefix.
+
+        Returns:
+            list: (name, drawer, quantity) tuples, ordered by name.
+        """
+        key = query.lower()
+        names = []
+        for position in range(bisect_left(self.sortedNames, key), len(self.sortedNames)):
+            folded = self.sortedNames[position]
+            if not folded.startswith(key):
+                break
+            names.extend(sorted(self.names.folded[folded]))
+        return self._matches(names)
+
+    def substring(self, query):
+        """
+        Find every item whose name contains the query, ignoring case.
+
+        Args:
+            query (str): The text to look for.
+
+        Returns:
+            list: (name, drawer, quantity) tuples, ordered by name.
+        """
+        key = query.lower()
+        if not key:
+            return []
+        if len(key) <= gramSize:
+            candidates = self.names.grams.get(key, set())
+        else:
+            # Intersect the trigram posting lists, smallest first, then verify
+            postings = []
+            for start in range(len(key) - gramSize + 1):
+                posting = self.names.grams.get(key[start:start + gramSize])
+                if not posting:
+                    return []
+                postings.append(posting)
+            postings.sort(key=len)
+            candidates = {folded for folded in postings[0].intersection(*postings[1:]) if key in folded}
+        names = []
+        for folded in sorted(candidates):
+            names.extend(sorted(self.names.folded[folded]))
+        return self._matches(names)
+
+    def fuzzy(self, query, limit=fuzzyLimit):
+        """
+        Find the items whose names are most like the query, for a "did you
+        mean" list when nothing contains it.
+
+        Args:
+            query (str): The text to look for.
+            limit (int): The most names to return; every item with one is returned.
+
+        Returns:
+            list: (name, drawer, quantity) tuples, the closest names first.
+        """
+        names = []
+        for _, exact in self.names.fuzzy(query, limit):
+            names.extend(exact)
+        return self._matches(names)
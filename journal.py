@@ -0,0 +1,148 @@
+import json
+import os
+
+from cryptography.fernet import Fernet, InvalidToken
+
+import stats
+
+# Journal size in bytes past which it is folded into a new snapshot
+journalCompactBytes = 256 * 1024
+
+
+def readJournal(path, key):
+    """
+    Read the edits recorded in a journal file.
+
+    A final line that does not decrypt is a record torn by a crash and is
+    ignored. Any other line that does not decrypt means a wrong password or a
+    damaged file.
+
+    Args:
+        path (str): The journal file.
+        key (bytes): The encryption key.
+
+    Returns:
+        list: (seq, edit) pairs in the order they were written.
+
+    Raises:
+        InvalidToken: If a record other than the last one cannot be decrypted.
+    """
+    if not os.path.exists(path):
+        return []
+    fernet = Fernet(key)
+    with open(path, 'rb') as file:
+        lines = file.read().splitlines()
+    records = []
+    for number, line in enumerate(lines):
+        try:
+            record = json.loads(fernet.decrypt(line))
+        except (InvalidToken, ValueError):
+            if number == len(lines) - 1:
+                break
+            raise InvalidToken
+        records.append((record[0], record[1:]))
+    return records
+
+
+def removeJournal(path):
+    """
+    Delete a journal file and any copy of it moved aside by Journal.rotate().
+
+    Args:
+        path (str): The journal file.
+    """
+    for journalFile in (path + ".old", path):
+        if os.path.exists(journalFile):
+            os.remove(journalFile)
+
+
+def trimTornRecord(path):
+    """
+    Cut a record left half-written by a crash off the end of a journal file,
+    so new records are not appended after it.
+
+    Args:
+        path (str): The journal file.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as file:
+        data = file.read()
+        if data and not data.endswith(b"\n"):
+            file.truncate(data.rfind(b"\n") + 1)
+
+
+class Journal:
+    """
+    An append-only log of inventory edits kept next to the encrypted snapshot.
+
+    Every edit is its own Fernet token on its own line and is fsynced before
+    append() returns, so a crash loses at most the edit being written. Records
+    carry an increasing sequence number; the snapshot stores the last one it
+    contains so replay skips edits that are already in it.
+
+    Attributes:
+        path (str): The live journal file.
+        oldPath (str): Where the journal is moved while a snapshot is written.
+    """
+    def __init__(self, path, key):
+        self.path = path
+        self.oldPath = path + ".old"
+        self.fernet = Fernet(key)
+        trimTornRecord(self.oldPath)
+        trimTornRecord(path)
+        self.file = open(path, 'ab')
+
+    @stats.timed("Journal.append")
+    def append(self, seq, edit):
+        """
+        Durably record one edit.
+
+        Args:
+            seq (int): The edit's sequence number.
+            edit (list): A store method name followed by its arguments.
+        """
+        plaintext = json.dumps([seq] + edit).encode()
+        record = self.fernet.encrypt(plaintext) + b"\n"
+        stats.count("bytesEncrypted", len(plaintext))
+        stats.count("bytesWritten", len(record))
+        self.file.write(record)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def size(self):
+        return self.file.tell()
+
+    def rotate(self):
+        """
+        Move the journal aside before a snapshot is written, so records
+        appended meanwhile go to a fresh file. If an earlier snapshot did not
+        finish, the journal is added to the one already moved aside.
+        """
+        self.file.close()
+        if os.path.exists(self.oldPath):
+            with open(self.oldPath, 'ab') as old, open(self.path, 'rb') as current:
+                old.write(current.read())
+                old.flush()
+                os.fsync(old.fileno())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.oldPath)
+        self.file = open(self.path, 'ab')
+
+    def dropRotated(self):
+        """
+        Delete the journal moved aside by rotate() once the snapshot holding
+        its records has been written.
+        """
+        if os.path.exists(self.oldPath):
+            os.remove(self.oldPath)
+
+    def close(self):
+        self.file.close()
+
+    def clear(self):
+        """
+        Delete both journal files once a full snapshot has been saved.
+        """
+        removeJournal(self.path)
@@ -0,0 +1,152 @@
+import base64
+import functools
+import hashlib
+import json
+import os
+import struct
+
+from cryptography.fernet import Fernet
+
+# Key derivation used for new files. Raise the cost when hardware gets faster;
+# benchmarks/kdfbench.py shows what each setting costs at login.
+kdfParams = {'kdf': 'scrypt', 'n': 2 ** 15, 'r': 8, 'p': 1}
+
+# What files without a key header were encrypted with: one unsalted SHA-256
+legacyParams = {'kdf': 'sha256'}
+
+keyHeaderMagic = b"CMK"
+keyHeaderVersion = 1
+
+
+def deriveKey(password, params):
+    """
+    Derive a Fernet key from a password.
+
+    Args:
+        password (str): The password.
+        params (dict): The KDF name, its salt and its cost settings.
+
+    Returns:
+        bytes: The URL-safe base64 Fernet key.
+    """
+    if params['kdf'] == 'sha256':
+        digest = hashlib.sha256(password.encode()).digest()
+    elif params['kdf'] == 'pbkdf2':
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), base64.b64decode(params['salt']),
+                                     params['iterations'])
+    elif params['kdf'] == 'scrypt':
+        digest = hashlib.scrypt(password.encode(), salt=base64.b64decode(params['salt']), n=params['n'],
+                                r=params['r'], p=params['p'], maxmem=256 * params['r'] * params['n'] + (1 << 20),
+                                dklen=32)
+    else:
+        raise ValueError(f"Unknown key derivation '{params['kdf']}'")
+    return base64.urlsafe_b64encode(digest)
+
+
+@functools.lru_cache(maxsize=8)
+def fernetFor(key):
+    """
+    Get a Fernet instance for a key, reusing it instead of building one per call.
+
+    Args:
+        key (bytes): The Fernet key.
+
+    Returns:
+        Fernet: The Fernet instance.
+    """
+    return Fernet(key)
+
+
+def addKeyHeader(params, data):
+    """
+    Put the KDF parameters in front of the encrypted file contents. They are
+    not secret: the salt and cost only make guessing the password slower.
+
+    Args:
+        params (dict): The KDF parameters.
+        data (bytes): The file contents.
+
+    Returns:
+        bytes: The contents with the header in front.
+    """
+    header = json.dumps(params, separators=(',', ':')).encode()
+    return keyHeaderMagic + bytes([keyHeaderVersion]) + struct.pack(">H", len(header)) + header + data
+
+
+def splitKeyHeader(data):
+    """
+    Split the KDF parameters off the front of file contents.
+
+    Args:
+        data (bytes): The file contents.
+
+    Returns:
+        Tuple[dict, bytes]: The KDF parameters, legacyParams for files written
+            before the header existed, and the rest of the contents.
+    """
+    if not data.startswith(keyHeaderMagic):
+        return legacyParams, data
+    if data[3] != keyHeaderVersion:
+        raise ValueError(f"Unsupported key header version {data[3]}")
+    length = struct.unpack(">H", data[4:6])[0]
+    return json.loads(data[6:6 + length]), data[6 + length:]
+
+
+class KeyManager:
+    """
+    Derives each key once per session and caches it with its Fernet instance.
+
+    Attributes:
+        params (dict): The KDF parameters the session encrypts with.
+    """
+    def __init__(self, password):
+        self._password = password
+        self._keys = {}
+        self.params = None
+
+    def key(self, params=None):
+        """
+        Args:
+            params (dict): The KDF parameters, the session's by default.
+
+        Returns:
+            bytes: The derived key.
+        """
+        params = params or self.params
+        cacheKey = json.dumps(params, sort_keys=True)
+        if cacheKey not in self._keys:
+            self._keys[cacheKey] = deriveKey(self._password, params)
+        return self._keys[cacheKey]
+
+    def fernet(self, params=None):
+        """
+        Args:
+            params (dict): The KDF parameters, the session's by default.
+
+        Returns:
+            Fernet: The Fernet instance for the derived key.
+        """
+        return fernetFor(self.key(params))
+
+    @staticmethod
+    def newParams():
+        """
+        Returns:
+            dict: kdfParams with a fresh random salt.
+        """
+        return dict(kdfParams, salt=base64.b64encode(os.urandom(16)).decode())
+
+    @staticmethod
+    def needsUpgrade(params):
+        """
+        Check whether a file's key derivation is weaker than kdfParams.
+
+        Args:
+            params (dict): The file's KDF parameters.
+
+        Returns:
+            bool: True if the file should be re-encrypted with newParams().
+        """
+        if params['kdf'] != kdfParams['kdf']:
+            return True
+        return any(params[setting] < kdfParams[setting] for setting in kdfParams if setting != 'kdf')
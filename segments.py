@@ -0,0 +1,307 @@
+import os
+
+import stats
+from keymanager import addKeyHeader, splitKeyHeader
+from serialization import decodePayload, fileToToken, packPayload, serialize, tokenToFile
+
+
+@stats.timed("writeEncrypted")
+def writeEncrypted(fernet, path, plaintext, params=None):
+    """
+    Encrypt a payload and write it over a file through a temporary file, so a
+    crash never leaves the file half-written.
+
+    Args:
+        fernet (Fernet): The Fernet instance to encrypt with.
+        path (str): The file to replace.
+        plaintext (bytes): The framed payload to encrypt.
+        params (dict): KDF parameters to put in a key header, if any.
+    """
+    data = tokenToFile(fernet.encrypt(plaintext))
+    if params is not None:
+        data = addKeyHeader(params, data)
+    stats.count("bytesEncrypted", len(plaintext))
+    stats.count("bytesWritten", len(data))
+    tempPath = path + ".tmp"
+    with open(tempPath, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tempPath, path)
+
+
+@stats.timed("readEncrypted")
+def readEncrypted(fernet, path):
+    """
+    Read and decrypt a file written by writeEncrypted, or by older versions.
+
+    Args:
+        fernet (Fernet): The Fernet instance to decrypt with.
+        path (str): The file to read.
+
+    Returns:
+        The decoded value.
+    """
+    with open(path, 'rb') as file:
+        plaintext = fernet.decrypt(fileToToken(file.read()))
+    stats.count("bytesDecrypted", len(plaintext))
+    return decodePayload(plaintext)
+
+
+class SegmentedStore:
+    """
+    A user's drawers stored as one encrypted segment file per drawer plus an
+    encrypted manifest of drawer names.
+
+    The manifest carries the KDF parameters in its key header; segments are
+    encrypted with the same key. Opening the store only decrypts the manifest. A drawer's segment is
+    decrypted the first time it is loaded or edited, and capture() only
+    re-encrypts the drawers edited since the last capture. Edited drawers are
+    written to new segment files and the manifest is replaced last, so the
+    folder always holds a consistent state even if a write is interrupted.
+    If a write fails, the next capture writes its drawers again.
+
+    Attributes:
+        folder (str): The folder holding the manifest and segment files.
+        segments (dict): Drawer name -> segment number, None until first written.
+        nextSegment (int): The next unused segment number.
+        journalSeq (int): The last journaled edit contained in the saved state.
+        loaded (dict): Drawer name -> item list for the decrypted drawers.
+        dirty (set): Drawers edited since the last capture.
+        removed (list): Segment numbers to delete after the next capture.
+        failed (list): (drawer -> (old segment, new segment), removed segments)
+            for each write that failed, undone by the next capture.
+        serializer (str): The payload serializer used when writing.
+        compressor (str): The payload compressor used when writing.
+        params (dict): The KDF parameters the store is encrypted with.
+    """
+    def __init__(self, folder, keys, serializer='json', compressor='zlib'):
+        self.folder = folder
+        self.keys = keys
+        self.serializer = serializer
+        self.compressor = compressor
+        self.manifestPath = os.path.join(folder, "manifest")
+        self.loaded = {}
+        self.dirty = set()
+        self.removed = []
+        self.failed = []
+        if os.path.exists(self.manifestPath):
+            with open(self.manifestPath, 'rb') as file:
+                self.params, data = splitKeyHeader(file.read())
+            self.fernet = keys.fernet(self.params)
+            manifest = decodePayload(self.fernet.decrypt(fileToToken(data)))
+            self.segments = manifest['drawers']
+            self.nextSegment = manifest['nextSegment']
+            self.journalSeq = manifest['journalSeq']
+        else:
+            os.makedirs(folder, exist_ok=True)
+            self.params = keys.newParams()
+            self.fernet = keys.fernet(self.params)
+            self.segments = {}
+            self.nextSegment = 0
+            self.journalSeq = 0
+            # Put the KDF parameters on disk before anything is encrypted with them
+            self.capture(0)()
+
+    def segmentPath(self, segment):
+        return os.path.join(self.folder, f"{segment:06x}.seg")
+
+    def drawerNames(self):
+        """
+        Returns:
+            list: The drawer names, without decrypting any segment.
+        """
+        return list(self.segments)
+
+    def loadDrawer(self, drawer):
+        """
+        Decrypt a drawer's segment if it has not been loaded yet.
+
+        Args:
+            drawer (str): The drawer name.
+
+        Returns:
+            list: The drawer's item dicts.
+        """
+        if drawer not in self.loaded:
+            self.loaded[drawer] = readEncrypted(self.fernet, self.segmentPath(self.segments[drawer]))
+        return self.loaded[drawer]
+
+    def readAll(self):
+        """
+        Decrypt every drawer.
+
+        Returns:
+            dict: Drawer name -> list of item dicts.
+        """
+        return {drawer: self.loadDrawer(drawer) for drawer in self.segments}
+
+    def replaceAll(self, data):
+        """
+        Replace every drawer with the given drawers.
+
+        Args:
+            data (dict): Drawer name -> list of item dicts.
+        """
+        for drawer in list(self.segments):
+            self.deleteDrawer(drawer)
+        for drawer, items in data.items():
+            self.upsertDrawer(drawer, items)
+
+    def upsertDrawer(self, drawer, items):
+        """
+        Create a drawer, or overwrite its items if it already exists.
+
+        Args:
+            drawer (str): The drawer name.
+            items (list): The drawer's item dicts.
+        """
+        self.segments.setdefault(drawer, None)
+        self.loaded[drawer] = [dict(item) for item in items]
+        self.dirty.add(drawer)
+
+    def addItem(self, drawer, name, quantity):
+        """
+        Append an item to an existing drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            name (str): The item name.
+            quantity (int): The item quantity.
+        """
+        self.loadDrawer(drawer).append({'name': name, 'quantity': quantity})
+        self.dirty.add(drawer)
+
+    def removeItem(self, drawer, name):
+        """
+        Remove the first item with this name from a drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            name (str): The item name.
+
+        Returns:
+            bool: True if an item was removed.
+        """
+        items = self.loadDrawer(drawer)
+        for position, item in enumerate(items):
+            if item['name'] == name:
+                del items[position]
+                self.dirty.add(drawer)
+                return True
+        return False
+
+    def setQuantity(self, drawer, name, quantity):
+        """
+        Change the quantity of the first item with this name in a drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            name (str): The item name.
+            quantity (int): The new quantity.
+
+        Returns:
+            bool: True if the item was found.
+        """
+        for item in self.loadDrawer(drawer):
+            if item['name'] == name:
+                item['quantity'] = quantity
+                self.dirty.add(drawer)
+                return True
+        return False
+
+    def deleteDrawer(self, drawer):
+        """
+        Delete a drawer and all of its items.
+
+        Args:
+            drawer (str): The drawer name.
+        """
+        segment = self.segments.pop(drawer)
+        if segment is not None:
+            self.removed.append(segment)
+        self.loaded.pop(drawer, None)
+        self.dirty.discard(drawer)
+
+    def rekey(self):
+        """
+        Switch to freshly derived KDF parameters. Every drawer is marked dirty,
+        so the next capture re-encrypts the whole store under the new key.
+        """
+        for drawer in self.segments:
+            self.loadDrawer(drawer)
+            self.dirty.add(drawer)
+        self.params = self.keys.newParams()
+        self.fernet = self.keys.fernet(self.params)
+
+    def capture(self, journalSeq):
+        """
+        Serialize the drawers edited since the last capture and the manifest.
+
+        The returned function does the encryption and file writes, so it can
+        run on another thread while the store keeps being edited. If it
+        fails, the manifest on disk is left as it was and the next capture
+        writes the same drawers again, along with any edited since.
+
+        Args:
+            journalSeq (int): The last journaled edit contained in the store.
+
+        Returns:
+            callable: Writes the captured segments, then the manifest, then
+                deletes the segment files they replace.
+        """
+        while self.failed:
+            self._undoCapture(*self.failed.pop(0))
+        texts = []
+        captured = {}
+        for drawer in self.dirty:
+            if self.segments[drawer] is not None:
+                self.removed.append(self.segments[drawer])
+            captured[drawer] = (self.segments[drawer], self.nextSegment)
+            self.segments[drawer] = self.nextSegment
+            self.nextSegment += 1
+            texts.append((self.segments[drawer], serialize(self.loaded[drawer], self.serializer)))
+        self.journalSeq = journalSeq
+        manifestText = serialize({'drawers': self.segments, 'nextSegment': self.nextSegment,
+                                  'journalSeq': journalSeq}, self.serializer)
+        removed = self.removed
+        fernet = self.fernet
+        params = self.params
+        self.dirty = set()
+        self.removed = []
+
+        def write():
+            try:
+                for segment, text in texts:
+                    writeEncrypted(fernet, self.segmentPath(segment),
+                                   packPayload(text, self.serializer, self.compressor))
+                writeEncrypted(fernet, self.manifestPath,
+                               packPayload(manifestText, self.serializer, self.compressor), params)
+            except BaseException:
+                # Undone by the next capture, which runs under the caller's lock
+                self.failed.append((captured, removed))
+                raise
+            for segment in removed:
+                if os.path.exists(self.segmentPath(segment)):
+                    os.remove(self.segmentPath(segment))
+        return write
+
+    def _undoCapture(self, captured, removed):
+        """
+        Put back the drawers of a capture whose write failed, so the next
+        capture writes them again.
+
+        Args:
+            captured (dict): Drawer name -> (segment on disk, segment it was
+                to be written to).
+            removed (list): Segment numbers the write was to delete.
+        """
+        for drawer, (old, new) in captured.items():
+            if self.segments.get(drawer) != new:
+                continue  # Deleted or replaced since, which retired the new segment
+            # The manifest on disk still names the old segment, so keep it until
+            # a manifest that does not is written
+            self.segments[drawer] = old
+            self.dirty.add(drawer)
+            self.removed.append(new)  # May have been written before the failure
+        self.removed.extend(segment for segment in removed if segment not in self.segments.values())
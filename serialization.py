@@ -0,0 +1,260 @@
+import base64
+import json
+import lzma
+import struct
+import zlib
+
+# Plaintext that starts with this is a framed payload; anything else is the
+# plain JSON text written before payloads were framed
+payloadMagic = b"\x00CM"
+payloadVersion = 1
+
+serializerIds = {'json': 1, 'binary': 2}
+compressorIds = {'none': 0, 'zlib': 1, 'lzma': 2}
+
+
+def _writeVarint(out, number):
+    while number >= 0x80:
+        out.append((number & 0x7F) | 0x80)
+        number >>= 7
+    out.append(number)
+
+
+def _readVarint(data, position):
+    number = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, position
+        shift += 7
+
+
+def binaryDumps(value):
+    """
+    Encode a JSON-compatible value in a compact binary form.
+
+    Integers are zigzag varints and every distinct string is stored once,
+    later uses refer back to it by number, so repeated keys such as 'name' and
+    'quantity' and repeated item names cost a byte or two each.
+
+    Args:
+        value: None, bool, int, float, str, list or dict with str keys.
+
+    Returns:
+        bytes: The encoded value.
+    """
+    out = bytearray()
+    strings = {}
+
+    def writeString(text):
+        number = strings.get(text)
+        if number is not None:
+            out.append(6)
+            _writeVarint(out, number)
+        else:
+            strings[text] = len(strings)
+            encoded = text.encode()
+            out.append(5)
+            _writeVarint(out, len(encoded))
+            out.extend(encoded)
+
+    def write(value):
+        if value is None:
+            out.append(0)
+        elif value is False:
+            out.append(1)
+        elif value is True:
+            out.append(2)
+        elif isinstance(value, int):
+            out.append(3)
+            _writeVarint(out, value * 2 if value >= 0 else -value * 2 - 1)
+        elif isinstance(value, float):
+            out.append(4)
+            out.extend(struct.pack("<d", value))
+        elif isinstance(value, str):
+            writeString(value)
+        elif isinstance(value, (list, tuple)):
+            out.append(7)
+            _writeVarint(out, len(value))
+            for element in value:
+                write(element)
+        elif isinstance(value, dict):
+            out.append(8)
+            _writeVarint(out, len(value))
+            for key, element in value.items():
+                writeString(str(key))
+                write(element)
+        else:
+            raise TypeError(f"Cannot encode {type(value).__name__}")
+
+    write(value)
+    return bytes(out)
+
+
+def binaryLoads(data):
+    """
+    Decode a value encoded by binaryDumps.
+
+    Args:
+        data (bytes): The encoded value.
+
+    Returns:
+        The decoded value.
+    """
+    strings = []
+
+    def read(position):
+        tag = data[position]
+        position += 1
+        if tag == 0:
+            return None, position
+        if tag == 1:
+            return False, position
+        if tag == 2:
+            return True, position
+        if tag == 3:
+            number, position = _readVarint(data, position)
+            return (number >> 1) if not number & 1 else -((number + 1) >> 1), position
+        if tag == 4:
+            return struct.unpack_from("<d", data, position)[0], position + 8
+        if tag == 5:
+            length, position = _readVarint(data, position)
+            text = data[position:position + length].decode()
+            strings.append(text)
+            return text, position + length
+        if tag == 6:
+            number, position = _readVarint(data, position)
+            return strings[number], position
+        if tag == 7:
+            count, position = _readVarint(data, position)
+            values = []
+            for _ in range(count):
+                value, position = read(position)
+                values.append(value)
+            return values, position
+        if tag == 8:
+            count, position = _readVarint(data, position)
+            values = {}
+            for _ in range(count):
+                key, position = read(position)
+                values[key], position = read(position)
+            return values, position
+        raise ValueError(f"Unknown tag {tag} at byte {position - 1}")
+
+    return read(0)[0]
+
+
+def serialize(value, serializer):
+    """
+    Serialize a value. This is the part of saving that has to see a consistent
+    state, so it is kept apart from compression and encryption.
+
+    Args:
+        value: The JSON-compatible value.
+        serializer (str): 'json' or 'binary'.
+
+    Returns:
+        bytes: The serialized value.
+    """
+    if serializer == 'json':
+        return json.dumps(value, separators=(',', ':')).encode()
+    if serializer == 'binary':
+        return binaryDumps(value)
+    raise ValueError(f"Unknown serializer '{serializer}'")
+
+
+def packPayload(body, serializer, compressor):
+    """
+    Compress a serialized value and put the header in front of it.
+
+    Args:
+        body (bytes): The output of serialize().
+        serializer (str): The serializer that produced it.
+        compressor (str): 'none', 'zlib' or 'lzma'.
+
+    Returns:
+        bytes: The plaintext to encrypt.
+    """
+    if compressor == 'zlib':
+        body = zlib.compress(body, 6)
+    elif compressor == 'lzma':
+        body = lzma.compress(body)
+    elif compressor != 'none':
+        raise ValueError(f"Unknown compressor '{compressor}'")
+    header = payloadMagic + bytes([payloadVersion, serializerIds[serializer], compressorIds[compressor]])
+    return header + body
+
+
+def encodePayload(value, serializer, compressor):
+    """
+    Args:
+        value: The JSON-compatible value.
+        serializer (str): 'json' or 'binary'.
+        compressor (str): 'none', 'zlib' or 'lzma'.
+
+    Returns:
+        bytes: The plaintext to encrypt.
+    """
+    return packPayload(serialize(value, serializer), serializer, compressor)
+
+
+def decodePayload(plaintext):
+    """
+    Decode decrypted plaintext, whichever codec its header names. Plaintext
+    without a header is read as the plain JSON older versions wrote.
+
+    Args:
+        plaintext (bytes): The decrypted data.
+
+    Returns:
+        The decoded value.
+    """
+    if not plaintext.startswith(payloadMagic):
+        return json.loads(plaintext)
+    version, serializerId, compressorId = plaintext[3:6]
+    if version != payloadVersion:
+        raise ValueError(f"Unsupported payload version {version}")
+    body = plaintext[6:]
+    if compressorId == compressorIds['zlib']:
+        body = zlib.decompress(body)
+    elif compressorId == compressorIds['lzma']:
+        body = lzma.decompress(body)
+    elif compressorId != compressorIds['none']:
+        raise ValueError(f"Unknown compressor id {compressorId}")
+    if serializerId == serializerIds['json']:
+        return json.loads(body)
+    if serializerId == serializerIds['binary']:
+        return binaryLoads(body)
+    raise ValueError(f"Unknown serializer id {serializerId}")
+
+
+def tokenToFile(token):
+    """
+    Strip the base64 layer from a Fernet token so it is stored at its real size.
+
+    Args:
+        token (bytes): The Fernet token.
+
+    Returns:
+        bytes: The raw token bytes to write.
+    """
+    return base64.urlsafe_b64decode(token)
+
+
+def fileToToken(data):
+    """
+    Turn file contents back into a Fernet token. Raw tokens start with the
+    Fernet version byte 0x80; older files hold the base64 text itself.
+
+    Args:
+        data (bytes): The file contents.
+
+    Returns:
+        bytes: The Fernet token.
+    """
+    if data[:1] == b"\x80":
+        return base64.urlsafe_b64encode(data)
+    return data.strip()
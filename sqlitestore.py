@@ -0,0 +1,282 @@
+import hashlib
+import hmac
+import json
+import sqlite3
+
+import stats
+from serialization import fileToToken, tokenToFile
+
+schema = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB);
+CREATE TABLE IF NOT EXISTS drawers (id INTEGER PRIMARY KEY, tag BLOB NOT NULL UNIQUE, name BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, drawer INTEGER NOT NULL, tag BLOB NOT NULL,
+                                  item BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS itemsByDrawer ON items (drawer, tag, id);
+CREATE INDEX IF NOT EXISTS itemsByName ON items (tag);
+"""
+
+# Encrypted under the store's key, so a wrong password is caught even when
+# the store is empty
+checkText = b"closetman"
+
+
+class SQLiteStore:
+    """
+    A user's drawers in an SQLite file, one row per drawer and one per item.
+
+    Names and items are encrypted one value at a time with the session's
+    Fernet key. Each drawer and item row also holds a tag, a keyed HMAC of its
+    name, and the tags are indexed, so finding a drawer or the item an edit
+    touches is an index lookup that decrypts only the rows it returns. Tags
+    reveal which rows share a name, but not the name itself.
+
+    Edits go into an open transaction that capture() commits, so the file
+    always holds the state of the last capture.
+
+    Attributes:
+        path (str): The SQLite file.
+        connection (sqlite3.Connection): The open database.
+        drawerIds (dict): Drawer name -> row id, in creation order.
+        drawerNamesById (dict): Row id -> drawer name, kept in step with drawerIds.
+        journalSeq (int): The last journaled edit contained in the saved state.
+        params (dict): The KDF parameters the store is encrypted with.
+    """
+    def __init__(self, path, keys):
+        self.path = path
+        self.keys = keys
+        # The GUI thread and the autosave worker both use the connection,
+        # each holding the inventory lock while it does
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(schema)
+        meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+        if 'params' in meta:
+            self._useParams(json.loads(meta['params']))
+            self.fernet.decrypt(fileToToken(meta['check']))  # Raises InvalidToken for a wrong password
+            self.journalSeq = int(meta['journalSeq'])
+            self.drawerIds = {self._decrypt(name).decode(): drawerId for drawerId, name in
+                              self.connection.execute("SELECT id, name FROM drawers ORDER BY id")}
+            self.drawerNamesById = {drawerId: drawer for drawer, drawerId in self.drawerIds.items()}
+        else:
+            self._useParams(keys.newParams())
+            self.journalSeq = 0
+            self.drawerIds = {}
+            self.drawerNamesById = {}
+            # Put the KDF parameters on disk before anything is encrypted with them
+            self._writeMeta()
+            self.capture(0)()
+
+    def _useParams(self, params):
+        self.params = params
+        self.fernet = self.keys.fernet(params)
+        self.tagKey = hmac.new(self.keys.key(params), b"closetman tags", hashlib.sha256).digest()
+
+    def _writeMeta(self):
+        self.connection.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                    [('params', json.dumps(self.params)),
+                                     ('check', self._encrypt(checkText))])
+
+    def _tag(self, name):
+        return hmac.new(self.tagKey, name.encode(), hashlib.sha256).digest()[:16]
+
+    def _encrypt(self, data):
+        stats.count("bytesEncrypted", len(data))
+        return tokenToFile(self.fernet.encrypt(data))
+
+    def _decrypt(self, data):
+        plaintext = self.fernet.decrypt(fileToToken(data))
+        stats.count("bytesDecrypted", len(plaintext))
+        return plaintext
+
+    def _encryptItem(self, name, quantity):
+        return self._encrypt(json.dumps([name, quantity], separators=(',', ':')).encode())
+
+    def _decryptItem(self, data):
+        name, quantity = json.loads(self._decrypt(data))
+        return {'name': name, 'quantity': quantity}
+
+    def _findItem(self, drawer, name):
+        rows = self.connection.execute("SELECT id, item FROM items WHERE drawer = ? AND tag = ? ORDER BY id",
+                                       (self.drawerIds[drawer], self._tag(name)))
+        for itemId, item in rows:
+            item = self._decryptItem(item)
+            if item['name'] == name:  # Guards against a tag collision
+                return itemId, item
+        return None, None
+
+    def _insertItems(self, drawerId, items):
+        self.connection.executemany("INSERT INTO items (drawer, tag, item) VALUES (?, ?, ?)",
+                                    [(drawerId, self._tag(item['name']),
+                                      self._encryptItem(item['name'], item['quantity'])) for item in items])
+
+    def drawerNames(self):
+        """
+        Returns:
+            list: The drawer names, without decrypting any item.
+        """
+        return list(self.drawerIds)
+
+    def loadDrawer(self, drawer):
+        """
+        Args:
+            drawer (str): The drawer name.
+
+        Returns:
+            list: The drawer's item dicts.
+        """
+        rows = self.connection.execute("SELECT item FROM items WHERE drawer = ? ORDER BY id",
+                                       (self.drawerIds[drawer],))
+        return [self._decryptItem(item) for item, in rows]
+
+    def readAll(self):
+        """
+        Decrypt every drawer.
+
+        Returns:
+            dict: Drawer name -> list of item dicts.
+        """
+        return {drawer: self.loadDrawer(drawer) for drawer in self.drawerIds}
+
+    def replaceAll(self, data):
+        """
+        Replace every drawer with the given drawers.
+
+        Args:
+            data (dict): Drawer name -> list of item dicts.
+        """
+        self.connection.execute("DELETE FROM items")
+        self.connection.execute("DELETE FROM drawers")
+        self.drawerIds = {}
+        self.drawerNamesById = {}
+        for drawer, items in data.items():
+            self.upsertDrawer(drawer, items)
+
+    def upsertDrawer(self, drawer, items):
+        """
+        Create a drawer, or overwrite its items if it already exists.
+
+        Args:
+            drawer (str): The drawer name.
+            items (list): The drawer's item dicts.
+        """
+        if drawer in self.drawerIds:
+            self.connection.execute("DELETE FROM items WHERE drawer = ?", (self.drawerIds[drawer],))
+        else:
+            cursor = self.connection.execute("INSERT INTO drawers (tag, name) VALUES (?, ?)",
+                                             (self._tag(drawer), self._encrypt(drawer.encode())))
+            self.drawerIds[drawer] = cursor.lastrowid
+            self.drawerNamesById[cursor.lastrowid] = drawer
+        self._insertItems(self.drawerIds[drawer], items)
+
+    def addItem(self, drawer, name, quantity):
+        """
+        Append an item to an existing drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            name (str): The item name.
+            quantity (int): The item quantity.
+        """
+        self._insertItems(self.drawerIds[drawer], [{'name': name, 'quantity': quantity}])
+
+    def removeItem(self, drawer, name):
+        """
+        Remove the first item with this name from a drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            name (str): The item name.
+
+        Returns:
+            bool: True if an item was removed.
+        """
+        itemId, _ = self._findItem(drawer, name)
+        if itemId is None:
+            return False
+        self.connection.execute("DELETE FROM items WHERE id = ?", (itemId,))
+        return True
+
+    def setQuantity(self, drawer, name, quantity):
+        """
+        Change the quantity of the first item with this name in a drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            name (str): The item name.
+            quantity (int): The new quantity.
+
+        Returns:
+            bool: True if the item was found.
+        """
+        itemId, _ = self._findItem(drawer, name)
+        if itemId is None:
+            return False
+        self.connection.execute("UPDATE items SET item = ? WHERE id = ?", (self._encryptItem(name, quantity), itemId))
+        return True
+
+    def deleteDrawer(self, drawer):
+        """
+        Delete a drawer and all of its items.
+
+        Args:
+            drawer (str): The drawer name.
+        """
+        drawerId = self.drawerIds.pop(drawer)
+        del self.drawerNamesById[drawerId]
+        self.connection.execute("DELETE FROM items WHERE drawer = ?", (drawerId,))
+        self.connection.execute("DELETE FROM drawers WHERE id = ?", (drawerId,))
+
+    def findItem(self, name):
+        """
+        Find every item with exactly this name through the name index,
+        without decrypting any other item.
+
+        Args:
+            name (str): The item name.
+
+        Returns:
+            list: (drawer, quantity) tuples.
+        """
+        matches = []
+        for drawerId, item in self.connection.execute("SELECT drawer, item FROM items WHERE tag = ? ORDER BY id",
+                                                      (self._tag(name),)):
+            item = self._decryptItem(item)
+            if item['name'] == name:
+                matches.append((self.drawerNamesById[drawerId], item['quantity']))
+        return matches
+
+    def rekey(self):
+        """
+        Switch to freshly derived KDF parameters and re-encrypt every row
+        under the new key. The change is saved by the next capture.
+        """
+        data = self.readAll()
+        self._useParams(self.keys.newParams())
+        self._writeMeta()
+        self.replaceAll(data)
+
+    @stats.timed("SQLiteStore.capture")
+    def capture(self, journalSeq):
+        """
+        Commit the edits made since the last capture.
+
+        The rows are encrypted as they are edited, so all that is left is the
+        commit, which happens here while the caller holds the inventory lock.
+
+        Args:
+            journalSeq (int): The last journaled edit contained in the store.
+
+        Returns:
+            callable: Does nothing; the commit has already happened.
+        """
+        self.journalSeq = journalSeq
+        self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('journalSeq', ?)", (str(journalSeq),))
+        self.connection.commit()
+        return lambda: None
+
+    def close(self):
+        """
+        Discard uncommitted edits and close the database.
+        """
+        self.connection.close()
@@ -0,0 +1,149 @@
+import contextlib
+import functools
+import os
+import threading
+import time
+
+# Off unless CLOSETMAN_STATS=1 is set or it is switched on in the Stats
+# window. While off, each instrumented call only checks this flag.
+enabled = os.environ.get("CLOSETMAN_STATS") == "1"
+
+# Name -> [calls, total wall seconds, longest wall seconds, total CPU seconds]
+timings = {}
+# Name -> running total, e.g. bytes encrypted
+counters = {}
+# Set to profile the next action timed with timing()
+profileNext = False
+# The pstats report of the last profiled action
+lastProfile = None
+
+_lock = threading.Lock()
+
+
+def record(name, wall, cpu):
+    """
+    Add one call to a timing.
+
+    Args:
+        name (str): The timing's name.
+        wall (float): Wall-clock seconds.
+        cpu (float): CPU seconds used by the whole process meanwhile.
+    """
+    with _lock:
+        timing = timings.get(name)
+        if timing is None:
+            timings[name] = [1, wall, wall, cpu]
+        else:
+            timing[0] += 1
+            timing[1] += wall
+            timing[2] = max(timing[2], wall)
+            timing[3] += cpu
+
+
+def count(name, amount):
+    """
+    Add to a counter, if instrumentation is on.
+
+    Args:
+        name (str): The counter's name.
+        amount (int): The amount to add.
+    """
+    if enabled:
+        with _lock:
+            counters[name] = counters.get(name, 0) + amount
+
+
+def timed(name):
+    """
+    Decorate a function so each call is recorded under name while
+    instrumentation is on.
+
+    Args:
+        name (str): The timing's name.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - wall, time.process_time() - cpu)
+        return wrapper
+    return decorate
+
+
+@contextlib.contextmanager
+def timing(name):
+    """
+    Record the enclosed block under name while instrumentation is on, and
+    profile it with cProfile if profileNext is set.
+
+    Args:
+        name (str): The timing's name.
+    """
+    global profileNext, lastProfile
+    if not enabled:
+        yield
+        return
+    profiler = None
+    if profileNext:
+        import cProfile  # Only needed when profiling; it is slow to import
+        profileNext = False
+        profiler = cProfile.Profile()
+        profiler.enable()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - wall, time.process_time() - cpu)
+        if profiler is not None:
+            import io
+            import pstats
+            profiler.disable()
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(30)
+            lastProfile = f"{name}\n{report.getvalue()}"
+
+
+def rows():
+    """
+    Returns:
+        list: [name, calls, total ms, longest ms, CPU ms] rows, slowest total first.
+    """
+    with _lock:
+        items = sorted(timings.items(), key=lambda item: -item[1][1])
+        return [[name, calls, round(total * 1e3, 2), round(longest * 1e3, 2), round(cpu * 1e3, 2)]
+                for name, (calls, total, longest, cpu) in items]
+
+
+def reset():
+    """
+    Forget every timing, counter and profile.
+    """
+    global lastProfile
+    with _lock:
+        timings.clear()
+        counters.clear()
+        lastProfile = None
+
+
+def dump(path):
+    """
+    Write the timings, counters and last profile to a JSON file.
+
+    Args:
+        path (str): The file to write.
+    """
+    import json
+    with _lock:
+        counterCopy = dict(counters)
+    report = {'time': time.strftime("%Y-%m-%dT%H:%M:%S"), 'enabled': enabled,
+              'timings': [dict(zip(('name', 'calls', 'totalMs', 'longestMs', 'cpuMs'), row)) for row in rows()],
+              'counters': counterCopy, 'lastProfile': lastProfile}
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=1)
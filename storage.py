@@ -0,0 +1,133 @@
+class TinyDBStore:
+    """
+    Per-drawer mutations on the TinyDB drawers table.
+
+    Each drawer is one TinyDB document. The store remembers the doc_id of every
+    drawer so an edit only touches that drawer's document instead of truncating
+    and re-inserting the whole table.
+
+    Attributes:
+        table (Table): The TinyDB drawers table.
+        docIds (dict): Maps a drawer name to its TinyDB doc_id.
+    """
+    def __init__(self, table):
+        self.table = table
+        self.docIds = {doc['drawer']: doc.doc_id for doc in table.all()}
+
+    def drawerNames(self):
+        """
+        Returns:
+            list: The drawer names.
+        """
+        return list(self.docIds)
+
+    def loadDrawer(self, drawer):
+        """
+        Args:
+            drawer (str): The drawer name.
+
+        Returns:
+            list: The drawer's item dicts.
+        """
+        return self.table.get(doc_id=self.docIds[drawer])['items']
+
+    def readAll(self):
+        """
+        Read every drawer in the table.
+
+        Returns:
+            dict: Drawer name -> list of item dicts.
+        """
+        data = {}
+        for doc in self.table.all():
+            data[doc['drawer']] = doc['items']
+        return data
+
+    def replaceAll(self, data):
+        """
+        Replace the whole table with the given drawers.
+
+        Args:
+            data (dict): Drawer name -> list of item dicts.
+        """
+        self.table.truncate()
+        self.docIds = {}
+        for drawer, items in data.items():
+            self.docIds[drawer] = self.table.insert({'drawer': drawer, 'items': [dict(item) for item in items]})
+
+    def upsertDrawer(self, drawer, items):
+        """
+        Create a drawer, or overwrite its items if it already exists.
+
+        Args:
+            drawer (str): The drawer name.
+            items (list): The drawer's item dicts.
+        """
+        items = [dict(item) for item in items]
+        if drawer in self.docIds:
+            self.table.update({'items': items}, doc_ids=[self.docIds[drawer]])
+        else:
+            self.docIds[drawer] = self.table.insert({'drawer': drawer, 'items': items})
+
+    def addItem(self, drawer, name, quantity):
+        """
+        Append an item to an existing drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            name (str): The item name.
+            quantity (int): The item quantity.
+        """
+        def append(doc):
+            doc['items'].append({'name': name, 'quantity': quantity})
+        self.table.update(append, doc_ids=[self.docIds[drawer]])
+
+    def removeItem(self, drawer, name):
+        """
+        Remove the first item with this name from a drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            name (str): The item name.
+
+        Returns:
+            bool: True if an item was removed.
+        """
+        doc = self.table.get(doc_id=self.docIds[drawer])
+        for position, item in enumerate(doc['items']):
+            if item['name'] == name:
+                def remove(doc):
+                    del doc['items'][position]
+                self.table.update(remove, doc_ids=[self.docIds[drawer]])
+                return True
+        return False
+
+    def setQuantity(self, drawer, name, quantity):
+        """
+        Change the quantity of the first item with this name in a drawer.
+
+        Args:
+            drawer (str): The drawer name.
+            name (str): The item name.
+            quantity (int): The new quantity.
+
+        Returns:
+            bool: True if the item was found.
+        """
+        doc = self.table.get(doc_id=self.docIds[drawer])
+        for position, item in enumerate(doc['items']):
+            if item['name'] == name:
+                def update(doc):
+                    doc['items'][position]['quantity'] = quantity
+                self.table.update(update, doc_ids=[self.docIds[drawer]])
+                return True
+        return False
+
+    def deleteDrawer(self, drawer):
+        """
+        Delete a drawer and all of its items.
+
+        Args:
+            drawer (str): The drawer name.
+        """
+        self.table.remove(doc_ids=[self.docIds.pop(drawer)])